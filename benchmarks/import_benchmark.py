@@ -0,0 +1,63 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# The modules that take long to import and are only needed by some commands
+HEAVY_MODULES = ('z3', 'colorama', 'aenum', 'sqlite3', 'multiprocessing')
+
+# What every target may not import, because the commands that start with it don't need it
+TARGETS = {
+    'src.cli': HEAVY_MODULES,
+    'src.Analyzers.geode': HEAVY_MODULES,
+    'src.grid_reader': HEAVY_MODULES,
+    'src.batch_runner': HEAVY_MODULES,
+    'src.geode_volume': HEAVY_MODULES,
+    'src.seeded_sat_solver': (),
+}
+
+# Runs in a fresh interpreter, so modules that were imported by an earlier measurement don't count
+_MEASURE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def measure_import(module: str, repeats: int) -> dict:
+    """
+    Measures the import of a module in a new interpreter, like a short-lived solver process pays for it
+    :param module: The name of the module to import
+    :param repeats: The number of interpreters that import the module, of which the fastest is reported
+    :return: The seconds the import took, and which of HEAVY_MODULES it pulled in
+    """
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', _MEASURE.format(module=module, heavy=HEAVY_MODULES)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    return {'seconds': min(run['seconds'] for run in runs), 'heavy': runs[0]['heavy']}
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Measure how long the modules take to import in a new process')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='processes per module, the fastest counts')
+    parser.add_argument('-m', '--module', action='append', help='only measure this module')
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f'{"module":<24} {"seconds":>10}  heavy imports')
+    for module in args.module or TARGETS:
+        measured = measure_import(module, args.repeats)
+        print(f'{module:<24} {measured["seconds"]:>10.4f}  {", ".join(measured["heavy"]) or "-"}')
+        failures += [f'{module} imports {name}' for name in measured['heavy'] if name in TARGETS.get(module, ())]
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import gc
+import tracemalloc
+from collections import defaultdict
+
+from src.Enums.geode_enum import GeodeEnum
+from src.cell import Cell, link_neighbours
+from src.grid_reader import DEFAULT_GEODE_FILE, GeodeCorpus
+
+
+class DictCell:
+    """
+    The cell layout from before Cell got __slots__, kept to measure what that saved: every instance has a __dict__,
+    an empty distance dictionary and a list of its neighbours
+    """
+
+    def __init__(self, row: int, col: int, projected_block: GeodeEnum):
+        self.row = row
+        self.col = col
+        self.group_nr = -1
+        self.projected_block = projected_block
+        self.shortest_path_dict = defaultdict(lambda: float('inf'))
+        self.average_block_distance = float('inf')
+        self.reachable_pumpkins = 0
+        self._neighbours = None
+
+    def neighbours(self, grid: list[list['DictCell']]) -> list['DictCell']:
+        if not self._neighbours:
+            self._neighbours = [grid[self.row + row_][self.col + col_]
+                                for row_, col_ in [(-1, 0), (0, -1), (1, 0), (0, 1)]
+                                if 0 <= self.row + row_ < len(grid) and 0 <= self.col + col_ < len(grid[0])]
+        return self._neighbours
+
+
+def _cell_grid(lines: list[str], cell_class: type) -> list[list]:
+    # The same cells as parse_geode, with their neighbours linked like the heuristic used to do
+    grid = [[cell_class(row, col,
+                        GeodeEnum.OBSIDIAN if char == '#'
+                        else GeodeEnum.PUMPKIN if char == '.'
+                        else GeodeEnum.AIR)
+             for col, char in enumerate(line.rstrip('\r\n')[::2])]
+            for row, line in enumerate(lines)]
+    if cell_class is Cell:
+        link_neighbours(grid)
+    else:
+        for row in grid:
+            for cell in row:
+                cell.neighbours(grid)
+    return grid
+
+
+def bytes_per_geode(source: str, count: int, solve: bool) -> float:
+    """
+    Measures how much memory holding parsed geodes costs
+    :param source: The geode file
+    :param count: The number of geodes to hold in memory
+    :param solve: Whether the geodes are solved before they are measured
+    :return: The average number of bytes allocated per geode that is kept alive
+    """
+    with GeodeCorpus(source) as corpus:
+        # Parse one geode up front, so module level caches aren't counted
+        corpus[0].heuristic_placement()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            geodes = list(corpus.range(0, count))
+            if solve:
+                for geode in geodes:
+                    geode.heuristic_placement()
+            gc.collect()
+            return (tracemalloc.get_traced_memory()[0] - start) / len(geodes)
+        finally:
+            tracemalloc.stop()
+
+
+def cell_bytes_per_geode(source: str, count: int, cell_class: type) -> float:
+    """
+    Measures how much memory the cell grids of geodes cost with a cell layout
+    :param source: The geode file
+    :param count: The number of cell grids to hold in memory
+    :param cell_class: Cell, or DictCell for the layout from before Cell got __slots__
+    :return: The average number of bytes allocated per cell grid that is kept alive
+    """
+    with GeodeCorpus(source) as corpus:
+        raw_geodes = list(corpus.raw_range(0, count))
+    # Build one grid up front, so module level caches aren't counted
+    _cell_grid(raw_geodes[0], cell_class)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        grids = [_cell_grid(lines, cell_class) for lines in raw_geodes]
+        gc.collect()
+        return (tracemalloc.get_traced_memory()[0] - start) / len(grids)
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Measure the memory that is held per geode')
+    parser.add_argument('input', nargs='?', default=DEFAULT_GEODE_FILE, help='the geode file')
+    parser.add_argument('-n', '--count', type=int, default=200, help='number of geodes to hold in memory')
+    parser.add_argument('--cells', action='store_true',
+                        help='also compare the cell grids with the dict based cell layout of before')
+    args = parser.parse_args(argv)
+
+    print(f'Parsed: {bytes_per_geode(args.input, args.count, solve=False):10.0f} bytes per geode')
+    print(f'Solved: {bytes_per_geode(args.input, args.count, solve=True):10.0f} bytes per geode')
+    if args.cells:
+        legacy = cell_bytes_per_geode(args.input, args.count, DictCell)
+        slotted = cell_bytes_per_geode(args.input, args.count, Cell)
+        print(f'Cells, dict layout: {legacy:10.0f} bytes per geode')
+        print(f'Cells, slotted:     {slotted:10.0f} bytes per geode ({slotted / legacy - 1:+.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from src.Analyzers.geode import Geode
+from src.grid_reader import DEFAULT_GEODE_FILE, GeodeCorpus, parse_geode
+from src.machine_catalog import machine_fits
+
+# The baseline file holds the results of every subset that was saved, by the name of the subset
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+
+# Differences in wall time below this many seconds are noise, whatever the relative change
+MIN_SECONDS_DIFFERENCE = 0.005
+
+# Wall times are only compared if both runs took the fastest of at least this many repeats. The fastest of fewer runs
+# is too often a slow one
+MIN_COMPARE_REPEATS = 3
+
+# Fixed ranges of the geode file, so runs on different days measure the same geodes
+SUBSETS = {
+    'smoke': (0, 10),
+    'standard': (0, 100),
+    'tail': (900, 1000),
+}
+
+# A phase prepares its geodes without being measured, and then runs the measured part on them
+Phase = tuple[Callable[[list[list[str]]], list], Callable[[list], object]]
+
+
+def _parse(raw_geodes: list[list[str]]) -> list[Geode]:
+    return [parse_geode(lines) for lines in raw_geodes]
+
+
+def _each(method: Callable[[Geode], object]) -> Callable[[list[Geode]], None]:
+    def run(geodes: list[Geode]):
+        for geode in geodes:
+            method(geode)
+    return run
+
+
+def _compute_clusters(geode: Geode):
+    # Clusters are built lazily, so ask for them to be sure the work is done
+    geode.compute_clusters()
+    return geode.clusters
+
+
+def _place(raw_geodes: list[list[str]]) -> list[Geode]:
+    geodes = _parse(raw_geodes)
+    _each(Geode.heuristic_placement)(geodes)
+    return geodes
+
+
+def _machine_fits(geode: Geode):
+    return machine_fits(geode.block_grid, geode.group_grid)
+
+
+PHASES: dict[str, Phase] = {
+    'parse': (lambda raw_geodes: raw_geodes, _parse),
+    'populate_bridges': (_parse, _each(Geode.populate_bridges)),
+    'average_isolation': (_parse, _each(Geode.average_isolation)),
+    'compute_clusters': (_parse, _each(_compute_clusters)),
+    'heuristic_placement': (_parse, _each(Geode.heuristic_placement)),
+    'machine_fits': (_place, _each(_machine_fits)),
+}
+
+
+def measure_phase(phase: Phase, raw_geodes: list[list[str]], repeats: int) -> dict[str, float]:
+    """
+    Measures one phase of the pipeline
+    :param phase: The preparation and the measured part of the phase
+    :param raw_geodes: The lines of the geodes to run the phase on
+    :param repeats: The number of timed runs, of which the fastest is reported
+    :return: The wall time in seconds, the spread between the fastest and the slowest run, and the bytes that are
+             still allocated and the peak bytes allocated by the measured part
+    """
+    prepare, run = phase
+    timings = []
+    for _ in range(repeats):
+        prepared = prepare(raw_geodes)
+        gc.collect()
+        start = time.perf_counter()
+        run(prepared)
+        timings.append(time.perf_counter() - start)
+
+    # Memory is measured in a separate run, because tracing slows down the code
+    prepared = prepare(raw_geodes)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        result = run(prepared)
+        allocated_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        'seconds': min(timings),
+        'spread_seconds': max(timings) - min(timings),
+        'allocated_bytes': allocated_bytes - start_bytes,
+        'peak_bytes': peak_bytes - start_bytes,
+    }
+
+
+def run_suite(source: str, subset: str, repeats: int, phases: list[str] = None) -> dict:
+    """
+    Runs the phases of the pipeline over a fixed subset of the geode file
+    :param source: The geode file
+    :param subset: The name of the subset of geodes, see SUBSETS
+    :param repeats: The number of timed runs of each phase
+    :param phases: The names of the phases to run, defaults to all of them
+    :return: The results and the circumstances they were measured under, ready to be stored as JSON
+    """
+    with GeodeCorpus(source) as corpus:
+        raw_geodes = list(corpus.raw_range(*SUBSETS[subset]))
+    # Warm up caches such as the grid topology, so the first phase isn't penalised
+    _each(Geode.heuristic_placement)(_parse(raw_geodes[:1]))
+
+    return {
+        'subset': subset,
+        'geodes': len(raw_geodes),
+        'repeats': repeats,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'phases': {name: measure_phase(PHASES[name], raw_geodes, repeats) for name in phases or PHASES},
+    }
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> list[str]:
+    """
+    Compares results with a baseline. Wall times are only compared if both runs have at least MIN_COMPARE_REPEATS
+    repeats, and a slowdown only counts if it is larger than the spread between the runs of either of them
+    :param results: The results of this run
+    :param baseline: The stored results of an earlier run on the same subset
+    :param time_threshold: The fraction that a phase may become slower before it counts as a regression
+    :param memory_threshold: The fraction that the peak memory of a phase may grow before it counts as a regression
+    :return: A description of every regression
+    """
+    regressions = []
+    compare_time = min(results['repeats'], baseline['repeats']) >= MIN_COMPARE_REPEATS
+    for name, measured in results['phases'].items():
+        if name not in baseline['phases']:
+            continue
+        stored = baseline['phases'][name]
+        # Baselines from before the spread was stored only have the fixed noise floor
+        noise = max(MIN_SECONDS_DIFFERENCE, measured.get('spread_seconds', 0.0), stored.get('spread_seconds', 0.0))
+        for metric, threshold in [('seconds', time_threshold), ('peak_bytes', memory_threshold)]:
+            if metric == 'seconds' and (not compare_time or measured[metric] - stored[metric] < noise):
+                continue
+            if stored[metric] and measured[metric] > stored[metric] * (1 + threshold):
+                regressions.append(f'{name}: {metric} went from {stored[metric]:.4g} to {measured[metric]:.4g} '
+                                   f'({measured[metric] / stored[metric] - 1:+.0%}, threshold {threshold:+.0%})')
+    return regressions
+
+
+def print_results(results: dict, baseline: dict = None):
+    print(f'{results["geodes"]} geodes ({results["subset"]}), best of {results["repeats"]}')
+    print(f'{"phase":<20} {"seconds":>10} {"allocated":>12} {"peak":>12} {"vs baseline":>12}')
+    for name, measured in results['phases'].items():
+        change = ''
+        if baseline and name in baseline['phases'] and baseline['phases'][name]['seconds']:
+            change = f'{measured["seconds"] / baseline["phases"][name]["seconds"] - 1:+.1%}'
+        print(f'{name:<20} {measured["seconds"]:>10.4f} {measured["allocated_bytes"]:>12} '
+              f'{measured["peak_bytes"]:>12} {change:>12}')
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the phases of the placement pipeline')
+    parser.add_argument('input', nargs='?', default=DEFAULT_GEODE_FILE, help='the geode file')
+    parser.add_argument('-s', '--subset', choices=SUBSETS, default='standard', help='the geodes to run on')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='timed runs per phase, the fastest counts')
+    parser.add_argument('-p', '--phase', action='append', choices=PHASES, help='only run this phase')
+    parser.add_argument('-b', '--baseline', default=DEFAULT_BASELINE, help='the baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=0.25,
+                        help='allowed slowdown per phase before it is a regression, as a fraction')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='allowed growth of the peak memory per phase before it is a regression, as a fraction')
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+    baseline = None if args.save else baselines.get(args.subset)
+    # A comparison without a baseline would pass whatever the results, so refuse before spending time on the run
+    if baseline is None and not args.save:
+        parser.error(f'no baseline for {args.subset!r} in {args.baseline}, create one on an idle machine with '
+                     f'"python main.py bench placement --subset {args.subset} --save" and commit it')
+
+    results = run_suite(args.input, args.subset, args.repeats, args.phase)
+    print_results(results, baseline)
+
+    if args.save:
+        baselines[args.subset] = results
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2)
+        print(f'Saved the baseline of {args.subset!r} to {args.baseline}')
+    else:
+        if min(args.repeats, baseline['repeats']) < MIN_COMPARE_REPEATS:
+            print(f'Wall times are not compared with fewer than {MIN_COMPARE_REPEATS} repeats, only memory is')
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
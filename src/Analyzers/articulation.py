@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Container, Iterable
+
+
+class ArticulationAnalysis:
+    """
+    Finds the cells that hold the clusters of a geode together, with a single depth first search in the style of
+    Tarjan's articulation point algorithm, in O(V + E).
+
+    A cell splits its cluster if taking it out leaves at least two parts that have terminals, usually the pumpkins.
+    Such a cell is an articulation point, but not every articulation point splits the cluster: it can also cut off a
+    part with only bridges, which nobody needs. A bridge is necessary to connect the terminals of its cluster exactly
+    when it splits the cluster, and every other bridge can be left out on its own without losing a terminal.
+
+    The same search splits the clusters into blocks, the biconnected components, which form the block-cut tree of the
+    cluster.
+    """
+
+    def __init__(self,
+                 cells: Container[int],
+                 terminals: Container[int],
+                 neighbours: tuple[tuple[int, ...], ...],
+                 roots: Iterable[int] = None):
+        """
+        :param cells: The flat indices of the cells that can be traversed
+        :param terminals: The flat indices of the cells that have to stay connected, usually the pumpkins
+        :param neighbours: The flat neighbour table of the geode
+        :param roots: Cells to start the search from, every cluster with one of them is analysed. Defaults to cells,
+                      which then has to be iterable
+        """
+        self._cells = cells
+        self._terminals = terminals
+        self._neighbours = neighbours
+        # For every cell that splits its cluster, the number of parts with terminals that it leaves behind
+        self.splitting: dict[int, int] = {}
+        # Every block as the cell it hangs from in the search tree, the other cells of the block, and whether there
+        # are terminals among those cells or in the blocks below them. Children come before their parents
+        self.blocks: list[tuple[int, list[int], bool]] = []
+        # Counter of the work done, for instrumentation
+        self.cells_visited = 0
+
+        # The cells in the clusters of the roots
+        self.reached: set[int] = set()
+        for root in cells if roots is None else roots:
+            if root in cells and root not in self.reached:
+                self._search(root, self.reached)
+
+    def _search(self, root: int, visited: set[int]):
+        # Iterative depth first search, since clusters can be deeper than the recursion limit
+        neighbours = self._neighbours
+        cells = self._cells
+        terminals = self._terminals
+
+        discovery = {root: 0}
+        low = {root: 0}
+        # The terminals in the subtree of every cell of the search tree
+        subtree_terminals = {root: int(root in terminals)}
+        # The parts with terminals that each cell would cut off from the rest, and the terminals in those parts
+        cut_parts: dict[int, int] = {}
+        cut_terminals: dict[int, int] = {}
+        # The cells whose block hasn't been completed yet, in the order of discovery, and the position of every cell
+        # on that stack, which doesn't change while the cell is on it
+        block_stack = [root]
+        block_start = {root: 0}
+        stack = [(root, -1, iter(neighbours[root]))]
+        while stack:
+            idx, parent, remaining = stack[-1]
+            for neighbour in remaining:
+                if neighbour not in cells:
+                    continue
+                if neighbour not in discovery:
+                    discovery[neighbour] = low[neighbour] = len(discovery)
+                    subtree_terminals[neighbour] = int(neighbour in terminals)
+                    block_start[neighbour] = len(block_stack)
+                    block_stack.append(neighbour)
+                    stack.append((neighbour, idx, iter(neighbours[neighbour])))
+                    break
+                if neighbour != parent and discovery[neighbour] < low[idx]:
+                    low[idx] = discovery[neighbour]
+            else:
+                stack.pop()
+                if parent == -1:
+                    continue
+                subtree_terminals[parent] += subtree_terminals[idx]
+                if low[idx] < low[parent]:
+                    low[parent] = low[idx]
+                # The subtree of idx can only reach the rest of the cluster through its parent
+                if low[idx] >= discovery[parent]:
+                    # The cells discovered since idx that aren't in a block yet form a block with the parent
+                    self.blocks.append((parent, block_stack[block_start[idx]:], subtree_terminals[idx] > 0))
+                    del block_stack[block_start[idx]:]
+                    if subtree_terminals[idx]:
+                        cut_parts[parent] = cut_parts.get(parent, 0) + 1
+                        cut_terminals[parent] = cut_terminals.get(parent, 0) + subtree_terminals[idx]
+
+        self.cells_visited += len(discovery)
+        visited.update(discovery)
+        total_terminals = subtree_terminals[root]
+        for idx, parts in cut_parts.items():
+            # Besides the parts it cuts off, a cell leaves the rest of the cluster, unless it is the root of the search
+            if idx != root and total_terminals - cut_terminals[idx] - (idx in terminals) > 0:
+                parts += 1
+            if parts > 1:
+                self.splitting[idx] = parts
+
+    def splits_cluster(self, idx: int) -> bool:
+        # Whether taking the cell out leaves at least two parts of its cluster with terminals
+        return idx in self.splitting
+
+
+
+def connecting_cells(cells: set[int], terminals: set[int], neighbours: tuple[tuple[int, ...], ...]) -> set[int]:
+    """
+    Finds cells that connect the terminals, with a single articulation analysis. The search starts at a terminal,
+    so a block is needed exactly when terminals hang below it in the block-cut tree, and every other block can go.
+    Within a needed block, the terminals and the cells that the needed blocks below hang from are joined to the cell
+    that the block itself hangs from along shortest paths. Every cell and edge is visited a constant number of times.
+    :param cells: A connected set of flat indices that contains the terminals
+    :param terminals: The flat indices of the cells that have to stay connected
+    :param neighbours: The flat neighbour table of the geode
+    :return: A connected subset of cells that contains all terminals
+    """
+    root = min(terminals)
+    analysis = ArticulationAnalysis(cells, terminals, neighbours, roots=[root])
+    needed_blocks = [(top, block_cells) for top, block_cells, needed in analysis.blocks if needed]
+    # The cells that needed blocks hang from have to be reached from the block that contains them
+    attachments = {top for top, _ in needed_blocks}
+
+    kept = {root}
+    for top, block_cells in needed_blocks:
+        in_block = set(block_cells)
+        # Breadth first search from the cell the block hangs from, without leaving the block
+        parents = {top: top}
+        queue = deque([top])
+        while queue:
+            idx = queue.popleft()
+            for neighbour in neighbours[idx]:
+                if neighbour in in_block and neighbour not in parents:
+                    parents[neighbour] = idx
+                    queue.append(neighbour)
+        # Walk back to the top from every cell that has to be reached, until a path of the block that was already
+        # walked
+        joined = {top}
+        for idx in block_cells:
+            if idx in terminals or idx in attachments:
+                while idx not in joined:
+                    joined.add(idx)
+                    idx = parents[idx]
+        kept |= joined
+    return kept
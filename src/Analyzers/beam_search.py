@@ -0,0 +1,153 @@
+from math import ceil
+from typing import NamedTuple
+
+
+class BeamState(NamedTuple):
+    # The cells of the partial group, in the order they were added
+    cells: tuple[int, ...]
+    # The same cells as a set, and the cells that can be added next
+    members: frozenset[int]
+    frontier: frozenset[int]
+    # Lower is better, see GroupBeamSearch.score
+    score: tuple
+
+
+class GroupBeamSearch:
+    """
+    Builds one group with a beam search, as an alternative to the greedy populate_group.
+
+    The search keeps the best partial groups of every size and extends each of them with its most isolated frontier
+    cells. The grids of the geode are shared by all states and never copied: a state only holds the cells of its own
+    partial group, and the cells that it could add next, as small immutable sets. Extending a state creates new sets
+    for the child, and leaves the parent and its siblings untouched.
+    """
+
+    def __init__(self,
+                 pumpkins: list[bool],
+                 passable: list[bool],
+                 isolation: list[float],
+                 neighbours: tuple[tuple[int, ...], ...],
+                 max_group_size: int):
+        """
+        :param pumpkins: For each flat index, whether the cell is a pumpkin
+        :param passable: For each flat index, whether the cell is a pumpkin or a bridge without a group
+        :param isolation: For each flat index, the isolation metric of the cell
+        :param neighbours: The flat neighbour table of the geode
+        :param max_group_size: The number of blocks a group can have at most
+        """
+        self._pumpkins = pumpkins
+        self._passable = passable
+        self._isolation = isolation
+        self._neighbours = neighbours
+        self._max_group_size = max_group_size
+        # Counters of the work done, for instrumentation
+        self.states_scored = 0
+        self.cells_visited = 0
+
+    def _component(self, source: int) -> list[int]:
+        # Breadth first search over the passable cells
+        component = [source]
+        visited = {source}
+        for idx in component:
+            for neighbour in self._neighbours[idx]:
+                if self._passable[neighbour] and neighbour not in visited:
+                    visited.add(neighbour)
+                    component.append(neighbour)
+        return component
+
+    def score(self, members: frozenset[int], component: list[int]) -> tuple[int, int, int, float]:
+        """
+        Scores a partial group by what it leaves behind for the other groups. Taking the group out of its component
+        can split the component into parts, and every part needs its own groups. A part with fewer blocks than a full
+        group strands its pumpkins in a group that can't be filled.
+        :param members: The cells of the partial group
+        :param component: The component of passable cells that the group is part of
+        :return: From most to least important, and lower is better: the number of groups the rest of the component
+                 needs at least, the pumpkins stranded in parts smaller than a group, the pumpkins that are left,
+                 and the isolation of the group, negated so the most isolated pumpkins are taken first
+        """
+        self.states_scored += 1
+        neighbours = self._neighbours
+        passable = self._passable
+        pumpkins = self._pumpkins
+
+        groups_needed = stranded = pumpkins_left = 0
+        visited = set(members)
+        for start in component:
+            if start in visited:
+                continue
+            visited.add(start)
+            part = [start]
+            for idx in part:
+                for neighbour in neighbours[idx]:
+                    if passable[neighbour] and neighbour not in visited:
+                        visited.add(neighbour)
+                        part.append(neighbour)
+            self.cells_visited += len(part)
+            part_pumpkins = sum(pumpkins[idx] for idx in part)
+            if part_pumpkins:
+                groups_needed += ceil(part_pumpkins / self._max_group_size)
+                pumpkins_left += part_pumpkins
+                if len(part) < self._max_group_size:
+                    stranded += part_pumpkins
+        return (groups_needed,
+                stranded,
+                pumpkins_left,
+                -sum(self._isolation[idx] for idx in members if pumpkins[idx]))
+
+    def _candidates(self, state: BeamState, branching: int) -> list[int]:
+        # The most isolated cells of the frontier, with the same priority as populate_group: pumpkins by their own
+        # isolation, bridges by the isolation of their most isolated free pumpkin neighbour
+        neighbours = self._neighbours
+        last_block = len(state.cells) == self._max_group_size - 1
+        candidates = []
+        for idx in state.frontier:
+            if self._pumpkins[idx]:
+                candidates.append((-self._isolation[idx], False, idx))
+                continue
+            # A bridge as the last block doesn't connect anything, and neither does a bridge without free neighbours
+            outside = [neighbour for neighbour in neighbours[idx]
+                       if self._passable[neighbour] and neighbour not in state.members]
+            if last_block or not outside:
+                continue
+            candidates.append((-max((self._isolation[neighbour] for neighbour in outside if self._pumpkins[neighbour]),
+                                    default=self._isolation[idx]), True, idx))
+        candidates.sort()
+        return [idx for _, _, idx in candidates[:branching]]
+
+    def search(self, source: int, width: int, branching: int) -> list[int]:
+        """
+        Builds the group that starts at the source
+        :param source: The flat index of the first pumpkin of the group
+        :param width: The number of partial groups kept at every size
+        :param branching: The number of frontier cells every partial group is extended with
+        :return: The flat indices of the cells of the best group, in the order they were added
+        """
+        component = self._component(source)
+        members = frozenset((source,))
+        root = BeamState((source,),
+                         members,
+                         frozenset(neighbour for neighbour in self._neighbours[source] if self._passable[neighbour]),
+                         self.score(members, component))
+
+        best = root
+        beam = [root]
+        while beam:
+            children: dict[frozenset[int], BeamState] = {}
+            for state in beam:
+                if len(state.cells) == self._max_group_size:
+                    continue
+                for idx in self._candidates(state, branching):
+                    members = state.members | {idx}
+                    # Different orders of adding the same cells give the same group
+                    if members in children:
+                        continue
+                    frontier = (state.frontier | {neighbour for neighbour in self._neighbours[idx]
+                                                  if self._passable[neighbour]}) - members
+                    children[members] = BeamState(state.cells + (idx,), members, frontier,
+                                                  self.score(members, component))
+
+            beam = sorted(children.values(), key=lambda child: child.score)[:width]
+            if beam and beam[0].score < best.score:
+                best = beam[0]
+        return list(best.cells)
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import Iterator, Sequence
+
+import numpy as np
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    # Python before 3.10
+    def popcount(board: int) -> int:
+        return bin(board).count('1')
+
+# Boards with more cells than this are unpacked with numpy instead of bit by bit
+SPARSE_CELLS = 16
+
+
+class BitboardLayout:
+    """
+    Maps the cells of a grid to the bits of a single Python int, so that a set of cells is one int and set operations
+    on whole grids are a handful of big-int operations.
+
+    Cell (row, col) is bit row * stride + col. The stride is one more than the number of columns: the extra bit at the
+    end of every row is never set, so a shift by one to the left or the right can't wrap a cell around to the next row.
+    Shifting by the stride moves every cell a row down or up, and cells shifted past the first row disappear.
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.stride = cols + 1
+        # The bit of every flat index, and every valid bit of the board
+        self.bits: tuple[int, ...] = tuple(1 << (idx + idx // cols) for idx in range(self.size))
+        self.full = sum(self.bits)
+
+    def from_mask(self, mask: np.ndarray) -> int:
+        # A boolean value for every cell, in the shape of the grid or flat
+        padded = np.zeros((self.rows, self.stride), dtype=bool)
+        padded[:, :self.cols] = np.reshape(mask, (self.rows, self.cols))
+        return int.from_bytes(np.packbits(padded, bitorder='little').tobytes(), 'little')
+
+    def from_flags(self, flags: Sequence[bool]) -> int:
+        # A boolean value for every flat index
+        return self.from_mask(np.array(flags, dtype=bool))
+
+    def to_mask(self, board: int) -> np.ndarray:
+        # The cells of the board as a flat boolean array
+        data = np.frombuffer(board.to_bytes((self.rows * self.stride + 7) // 8, 'little'), dtype=np.uint8)
+        padded = np.unpackbits(data, count=self.rows * self.stride, bitorder='little').astype(bool)
+        return padded.reshape(self.rows, self.stride)[:, :self.cols].ravel()
+
+    def indices(self, board: int) -> Iterator[int]:
+        # The flat indices of the cells of the board, in increasing order
+        if popcount(board) > SPARSE_CELLS:
+            yield from np.flatnonzero(self.to_mask(board)).tolist()
+            return
+        stride = self.stride
+        while board:
+            low = board & -board
+            bit = low.bit_length() - 1
+            yield bit - bit // stride
+            board ^= low
+
+    def expand(self, board: int) -> int:
+        # The cells of the board and their neighbours
+        stride = self.stride
+        return (board | board << 1 | board >> 1 | board << stride | board >> stride) & self.full
+
+    def at_least_two_neighbours(self, board: int) -> int:
+        """
+        Counts bit-parallel for all cells at once
+        :return: The cells of the grid with at least two neighbours on the board
+        """
+        stride = self.stride
+        up, down, left, right = board << stride, board >> stride, board << 1, board >> 1
+        return ((up | down) & (left | right) | up & down | left & right) & self.full
+
+    def flood(self, seed: int, passable: int) -> int:
+        # The cells of passable that can be reached from the seed, including the seed
+        stride = self.stride
+        reached = seed
+        frontier = seed
+        while frontier:
+            frontier = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & passable & ~reached
+            reached |= frontier
+        return reached
+
+
+@lru_cache(maxsize=None)
+def bitboard_layout(rows: int, cols: int) -> BitboardLayout:
+    # Like the grid topology, the layout only depends on the shape of the grid
+    return BitboardLayout(rows, cols)
@@ -0,0 +1,181 @@
+from src.Analyzers.bitboard import BitboardLayout, popcount
+
+NO_CLUSTER = -1
+
+
+class ClusterTracker:
+    """
+    Keeps track of the clusters of a geode, i.e. the groups of pumpkins and bridges that can reach each other without
+    traversing obsidian, air or blocks that already have a group.
+
+    Every cluster has an id that stays the same while cells are removed from it. When a removed cell splits a cluster,
+    only the neighbourhood of the removed cell is explored: a search is started from every neighbour, searches that
+    meet are merged, and searches that run out of cells have found a separate part. As soon as a single search is
+    left, the rest of the cluster is known to be connected without visiting it, and it keeps the id of the old cluster.
+
+    The searches are flood fills on bitboards (see BitboardLayout), which add a whole layer of cells in a few big-int
+    operations.
+    """
+
+    def __init__(self,
+                 layout: BitboardLayout,
+                 pumpkins: list[bool],
+                 passable: list[bool],
+                 neighbours: tuple[tuple[int, ...], ...]):
+        """
+        :param layout: The bitboard layout of the geode
+        :param pumpkins: For each flat index, whether the cell is a pumpkin
+        :param passable: For each flat index, whether the cell can be traversed
+        :param neighbours: The flat neighbour table of the geode
+        """
+        self._layout = layout
+        self._neighbours = neighbours
+        self._pumpkins = pumpkins
+        self._pumpkin_board = layout.from_flags(pumpkins)
+        self._passable = list(passable)
+        self._passable_board = layout.from_flags(passable)
+        self._labels: list[int] = [NO_CLUSTER] * len(passable)
+        self._members: dict[int, set[int]] = {}
+        self._pumpkin_counts: dict[int, int] = {}
+        self._next_id = 0
+
+        # Counters of the work done, for instrumentation
+        self.splits = 0
+        self.cells_visited = 0
+
+        # Label every component of passable cells, including the ones without pumpkins, because those can still
+        # connect clusters again if a cell is given back
+        unlabelled = self._passable_board
+        while unlabelled:
+            # Flood fill over the passable cells from the first cell without a cluster
+            component = layout.flood(unlabelled & -unlabelled, self._passable_board)
+            self._new_cluster(component)
+            unlabelled &= ~component
+
+    def _new_cluster(self, board: int) -> int:
+        cluster_id = self._next_id
+        self._next_id += 1
+        cells = set(self._layout.indices(board))
+        self._members[cluster_id] = cells
+        self._pumpkin_counts[cluster_id] = popcount(board & self._pumpkin_board)
+        for idx in cells:
+            self._labels[idx] = cluster_id
+        return cluster_id
+
+    def cells(self, cluster_id: int) -> set[int]:
+        return self._members[cluster_id]
+
+    def pumpkin_count(self, cluster_id: int) -> int:
+        return self._pumpkin_counts[cluster_id]
+
+    def clusters(self) -> dict[int, set[int]]:
+        """
+        :return: The cells of every cluster that contains at least one pumpkin, by cluster id
+        """
+        return {cluster_id: cells
+                for cluster_id, cells in self._members.items()
+                if self._pumpkin_counts[cluster_id] > 0}
+
+    def remove_cell(self, idx: int) -> list[int]:
+        """
+        Removes a cell that joined a group, splitting its cluster if the cell held it together
+        :param idx: The flat index of the cell
+        :return: The ids of the clusters with pumpkins that the cluster of the cell was split into. If it contains
+                 less than two clusters, the cluster was not split up
+        """
+        cluster_id = self._labels[idx]
+        if cluster_id == NO_CLUSTER:
+            # The cell was already removed
+            return []
+        self._passable[idx] = False
+        self._passable_board &= ~self._layout.bits[idx]
+        self._labels[idx] = NO_CLUSTER
+        self._members[cluster_id].remove(idx)
+        self._pumpkin_counts[cluster_id] -= self._pumpkins[idx]
+
+        starts = [neighbour for neighbour in self._neighbours[idx] if self._passable[neighbour]]
+        if not starts:
+            # The cell was the last one of its cluster
+            del self._members[cluster_id]
+            del self._pumpkin_counts[cluster_id]
+            return []
+        if len(starts) == 1:
+            return [cluster_id] if self._pumpkin_counts[cluster_id] else []
+
+        parts = [cluster_id, *(self._new_cluster(part) for part in self._separated_parts(starts))]
+        for part_id in parts[1:]:
+            self._members[cluster_id] -= self._members[part_id]
+            self._pumpkin_counts[cluster_id] -= self._pumpkin_counts[part_id]
+        return [part_id for part_id in parts if self._pumpkin_counts[part_id]]
+
+    def _separated_parts(self, starts: list[int]) -> list[int]:
+        """
+        Floods from all the given cells in turns, until the floods that are still going are connected
+        :param starts: The passable neighbours of a removed cell
+        :return: The cells of every part that was separated from the rest, as bitboards
+        """
+        # Each flood has the cells it has found, its frontier and its size.
+        # Floods that meet are merged, the frontier of both keeps going
+        stride = self._layout.stride
+        passable = self._passable_board
+        found = [self._layout.bits[start] for start in starts]
+        frontiers = list(found)
+        sizes = [1] * len(starts)
+        active = set(range(len(starts)))
+        parts = []
+
+        while len(active) > 1:
+            # The smallest flood adds a layer, so the search effort is bounded by the smaller parts
+            search = min(active, key=sizes.__getitem__)
+            frontier = frontiers[search]
+            if not frontier:
+                # The flood ran out of cells, so it found a separate part
+                active.remove(search)
+                parts.append(found[search])
+                continue
+
+            frontier = (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) \
+                & passable & ~found[search]
+            found[search] |= frontier
+            frontiers[search] = frontier
+            added = popcount(frontier)
+            sizes[search] += added
+            self.cells_visited += added
+            for other in sorted(active):
+                if other != search and found[other] & frontier:
+                    # The floods met, so they are in the same part
+                    found[search] |= found[other]
+                    frontiers[search] |= frontiers[other]
+                    sizes[search] = popcount(found[search])
+                    active.remove(other)
+        if parts:
+            self.splits += 1
+        return parts
+
+    def add_cell(self, idx: int) -> int:
+        """
+        Gives a cell back that left its group, merging the clusters around it
+        :param idx: The flat index of the cell
+        :return: The id of the cluster the cell is now part of
+        """
+        self._passable[idx] = True
+        self._passable_board |= self._layout.bits[idx]
+        neighbour_ids = list(dict.fromkeys(self._labels[neighbour]
+                                           for neighbour in self._neighbours[idx]
+                                           if self._passable[neighbour]))
+        if not neighbour_ids:
+            return self._new_cluster(self._layout.bits[idx])
+
+        # The largest cluster absorbs the others, so the fewest cells have to be relabelled
+        cluster_id = max(neighbour_ids, key=lambda cluster_id_: len(self._members[cluster_id_]))
+        for other_id in neighbour_ids:
+            if other_id == cluster_id:
+                continue
+            for cell in self._members[other_id]:
+                self._labels[cell] = cluster_id
+            self._members[cluster_id] |= self._members.pop(other_id)
+            self._pumpkin_counts[cluster_id] += self._pumpkin_counts.pop(other_id)
+        self._members[cluster_id].add(idx)
+        self._pumpkin_counts[cluster_id] += self._pumpkins[idx]
+        self._labels[idx] = cluster_id
+        return cluster_id
@@ -1,147 +1,276 @@
-from typing import Callable, Iterator, Tuple
-
+import sys
+import time
+from random import Random
+from typing import Callable, Tuple
+
+import numpy as np
+
+from src.Analyzers.articulation import connecting_cells
+from src.Analyzers.beam_search import GroupBeamSearch
+from src.Analyzers.bitboard import BitboardLayout, bitboard_layout
+from src.Analyzers.cluster_tracker import ClusterTracker
+from src.Analyzers.geode_metrics import GeodeMetrics
+from src.Analyzers.grid_topology import GridTopology, grid_topology
+from src.Analyzers.isolation_engine import IsolationEngine
 from src.Enums.geode_enum import GeodeEnum
-from src.Utils.collections.queue_extensions import PrioritySet
+from src.Utils.collections.queue_extensions import IndexedPriorityQueue
 from src.cell import Cell
 from src.group import Group
+from src.renderer import GROUPS, MERGED, PROJECTION, render
 
 MAX_GROUP_SIZE = 12
 
+# How much randomized restarts may perturb the isolation of the pumpkins when they choose the source of a group,
+# as a fraction of the isolation
+SOURCE_NOISE = 0.1
+
+# Integer block types as stored in the block grid
+AIR = GeodeEnum.AIR.int_value
+PUMPKIN = GeodeEnum.PUMPKIN.int_value
+OBSIDIAN = GeodeEnum.OBSIDIAN.int_value
+BRIDGE = GeodeEnum.BRIDGE.int_value
+
+NO_GROUP = -1
+
 
 class Geode:
 
-    def __init__(self, geode_grid: list[list[GeodeEnum]]):
+    def __init__(self, geode_grid: list[list[Cell]], block_grid: np.ndarray = None):
+        """
+        :param geode_grid: The cells of the geode
+        :param block_grid: The integer block types of the cells, if they are already known
+        """
+        # The Cell grid is only a view for printing, all computations run on the arrays below
         self.grid: list[list[Cell]] = geode_grid
+        self.rows = len(geode_grid)
+        self.cols = len(geode_grid[0])
+        self._cells = tuple(self.grid[row][col]
+                            for row in range(self.rows)
+                            for col in range(self.cols))
+
+        if block_grid is None:
+            block_grid = [[cell.projected_block.int_value for cell in row] for row in geode_grid]
+        self.block_grid: np.ndarray = np.array(block_grid, dtype=np.int8)
+        self.group_grid: np.ndarray = np.full((self.rows, self.cols), NO_GROUP, dtype=np.int16)
+        self.isolation_grid: np.ndarray = np.full((self.rows, self.cols), float('inf'))
+        self.reachable_grid: np.ndarray = np.zeros((self.rows, self.cols), dtype=np.int16)
+        # Flat views on the grids above, indexed the same way as the neighbour table
+        self._blocks = self.block_grid.ravel()
+        self._groups = self.group_grid.ravel()
+        self._isolation = self.isolation_grid.ravel()
+        self._reachable = self.reachable_grid.ravel()
+        # The adjacency is shared by all geodes of the same shape
+        self.topology: GridTopology = grid_topology(self.rows, self.cols)
+        self._neighbours = self.topology.neighbours
+        # Sets of cells as bits of an int, for flood fills and neighbour counts over the whole grid at once
+        self.bitboard: BitboardLayout = bitboard_layout(self.rows, self.cols)
+        # Breaks ties between cells with the same score, by default in the order of the grid
+        self._tie_break = range(len(self._cells))
+
         self.groups: dict[int, Group] = {}
-        self.clusters: set[frozenset[Cell]] = set()
+        # Every cell that joined or left a group, in order, so priority queues know which cells to re-score
+        self._group_changes: list[int] = []
         self.populate_bridges()
-        self._cells = tuple(self.grid[row][col]
-                for row in range(len(self.grid))
-                for col in range(len(self.grid[0])))
+        # The distance and cluster structures are built when they are first needed, so geodes that are only parsed
+        # don't pay for them
+        self._isolation_engine_instance: IsolationEngine = None
+        self._cluster_tracker_instance: ClusterTracker = None
+        # Instrumentation is off unless it is enabled, every counter is behind a check for None
+        self.metrics: GeodeMetrics = None
+
+    def enable_metrics(self) -> GeodeMetrics:
+        """
+        Starts counting the work done while solving this geode
+        :return: The counters, which are filled in by later calls
+        """
+        self.metrics = GeodeMetrics(rows=self.rows,
+                                    cols=self.cols,
+                                    pumpkins=int(np.count_nonzero(self._blocks == PUMPKIN)))
+        return self.metrics
+
+    @classmethod
+    def from_blocks(cls, block_grid: np.ndarray) -> 'Geode':
+        """
+        Creates a geode from a grid of integer block types, without going through the text format
+        :param block_grid: A 2D array of the int values of GeodeEnum
+        """
+        block_types = {block.int_value: block for block in GeodeEnum}
+        return cls([[Cell(row, col, block_types[value]) for col, value in enumerate(row_values)]
+                    for row, row_values in enumerate(np.asarray(block_grid).tolist())],
+                   block_grid)
 
     def populate_bridges(self):
-        # Replace air blocks that connect to at least two pumpkins with a bridge
-        for cell in self.cells():
-            if (cell.projected_block == GeodeEnum.AIR and
-                sum((1
-                     for neighbour in cell.neighbours(self.grid)
-                     if neighbour.projected_block == GeodeEnum.PUMPKIN)) >= 2):
-                cell.projected_block = GeodeEnum.BRIDGE
+        # Replace air blocks that connect to at least two pumpkins with a bridge, counting the neighbours of all cells
+        # at once on bitboards
+        bridges = self.bitboard.at_least_two_neighbours(self.bitboard.from_mask(self._blocks == PUMPKIN))
+        self._blocks[self.bitboard.to_mask(bridges & self.bitboard.from_mask(self._blocks == AIR))] = BRIDGE
+
+        for idx in np.flatnonzero(self._blocks == BRIDGE):
+            self._cells[idx].projected_block = GeodeEnum.BRIDGE
 
     def reset_groups(self):
         # Reset groups
         for block in self.cells():
             block.group_nr = -1
+        self.group_grid.fill(NO_GROUP)
         self.groups.clear()
-
-    def compute_clusters(self):
-        # Returns a list of the clusters of pumpkins that already can naturally reach each other.
+        self._group_changes.clear()
+        self._isolation_engine_instance = None
+        self._cluster_tracker_instance = None
+
+    @property
+    def _isolation_engine(self) -> IsolationEngine:
+        if self._isolation_engine_instance is None:
+            self._isolation_engine_instance = IsolationEngine(self.bitboard,
+                                                              (self._blocks == PUMPKIN).tolist(),
+                                                              self._passable())
+        return self._isolation_engine_instance
+
+    @property
+    def _cluster_tracker(self) -> ClusterTracker:
+        if self._cluster_tracker_instance is None:
+            start = time.perf_counter()
+            self._cluster_tracker_instance = ClusterTracker(self.bitboard,
+                                                            (self._blocks == PUMPKIN).tolist(),
+                                                            self._passable(),
+                                                            self._neighbours)
+            if self.metrics is not None:
+                # Building the tracker is the full computation of the clusters
+                self.metrics.compute_clusters_calls += 1
+                self.metrics.compute_clusters_seconds += time.perf_counter() - start
+        return self._cluster_tracker_instance
+
+    def _add_to_group(self, idx: int, group: Group) -> list[int]:
+        # Returns the ids of the clusters with pumpkins that the cluster of the block was split into
+        self._groups[idx] = group.group_nr
+        self._group_changes.append(idx)
+        group.add_cell(self._cells[idx])
+        self._isolation_engine.block_grouped(idx)
+        if self.metrics is None:
+            return self._cluster_tracker.remove_cell(idx)
+
+        tracker = self._cluster_tracker
+        splits, cells_visited = tracker.splits, tracker.cells_visited
+        split_clusters = tracker.remove_cell(idx)
+        self.metrics.cells_placed += 1
+        self.metrics.cluster_splits += tracker.splits - splits
+        self.metrics.cluster_split_visits += tracker.cells_visited - cells_visited
+        return split_clusters
+
+    def _remove_from_group(self, idx: int, group: Group):
+        self._groups[idx] = NO_GROUP
+        self._group_changes.append(idx)
+        group.remove_cell(self._cells[idx])
+        self._isolation_engine.block_ungrouped(idx)
+        self._cluster_tracker.add_cell(idx)
+
+    def _passable(self) -> list[bool]:
+        # Pumpkins and bridges without a group can be traversed
+        return (((self.block_grid == PUMPKIN) | (self.block_grid == BRIDGE)) & (self.group_grid == NO_GROUP)) \
+            .ravel().tolist()
+
+    def _free_pumpkins(self) -> list[bool]:
+        return ((self.block_grid == PUMPKIN) & (self.group_grid == NO_GROUP)).ravel().tolist()
+
+    @property
+    def clusters(self) -> set[frozenset[int]]:
+        # The clusters of pumpkins that already can naturally reach each other.
         # If every pumpkin can reach every pumpkin, then there's only one cluster
         # If there's also a 1x1 group that can't reach any other pumpkin, then there are two, etc.
         # Each cluster has at least one pumpkin
-        undiscovered_pumpkins = set(cell for cell in self.cells()
-                                    if cell.projected_block == GeodeEnum.PUMPKIN and not cell.has_group)
-
-        clusters = set()
-
-        while len(undiscovered_pumpkins) > 0:
-            # Pick an arbitrary cell - can't be done in a for loop because we decrease it during the loop
-            source_cell = next(iter(undiscovered_pumpkins))
-            visited_cells = set()
-            current_cells = {source_cell}
-
-            while len(current_cells) > 0:
-                visited_cells |= current_cells
-
-                # BFS
-                current_cells = {cell
-                                 for edge in current_cells
-                                 for cell in edge.neighbours(self.grid)
-                                 if cell not in visited_cells
-                                 and cell.projected_block in [GeodeEnum.PUMPKIN, GeodeEnum.BRIDGE]
-                                 and not cell.has_group}
-            undiscovered_pumpkins -= visited_cells
-            clusters.add(frozenset(visited_cells))
-        self.clusters = clusters
-
-    def average_isolation(self, frontier: set[Cell] = None):
+        return {frozenset(cluster) for cluster in self._cluster_tracker.clusters().values()}
+
+    def compute_clusters(self):
+        # The cluster tracker is kept up to date as blocks join and leave groups, so this is only needed when the
+        # group grid was changed directly
+        self._cluster_tracker_instance = None
+
+    def average_isolation(self, frontier: set[int] = None) -> list[int]:
         """
         Computes the isolation metric for the frontier, which mostly comes down to the average distance to all other
         reachable pumpkins
-        :param frontier: The cells to compute the metric for. Defaults to all cells
+        :param frontier: The flat indices of the cells to compute the metric for. Defaults to all cells
+        :return: The flat indices of the cells whose metric changed
         """
+        neighbours = self._neighbours
+        blocks = self._blocks
+        passable = self._passable()
+        free_pumpkins = self._free_pumpkins()
+
         # The caller does not expect frontier to change, so we use cells to potentially modify the frontier
-        cells = set()
         if frontier is not None:
             extended_frontier = {neighbour
-                                 for cell in frontier
-                                 if cell.projected_block == GeodeEnum.BRIDGE
-                                 for neighbour in cell.neighbours(self.grid)
-                                 if neighbour.projected_block in [GeodeEnum.PUMPKIN] and not neighbour.has_group}
-            cells = frontier | extended_frontier
+                                 for idx in frontier
+                                 if blocks[idx] == BRIDGE
+                                 for neighbour in neighbours[idx]
+                                 if free_pumpkins[neighbour]}
+            cells = sorted(frontier | extended_frontier)
         else:
-            cells = set(self.cells())
-
-        for cell in cells:
-            if cell.projected_block in [GeodeEnum.OBSIDIAN, GeodeEnum.AIR] or cell.has_group:
-                cell.average_block_distance = float('inf')
-                continue
+            cells = range(len(blocks))
+
+        # The distances themselves are kept up to date by the isolation engine as blocks join groups
+        sources = [idx for idx in cells if passable[idx]]
+        engine = self._isolation_engine
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+            counters = engine.rows_computed, engine.rows_updated, engine.cells_visited
+        total_distance, reachable_pumpkins = engine.distance_sums(sources)
+        if metrics is not None:
+            metrics.average_isolation_calls += 1
+            metrics.average_isolation_seconds += time.perf_counter() - start
+            metrics.bfs_rows_computed += engine.rows_computed - counters[0]
+            metrics.bfs_rows_updated += engine.rows_updated - counters[1]
+            metrics.bfs_visits += engine.cells_visited - counters[2]
+        # If it only visited less than MAX range blocks, increase the score so the algorithm has to get it
+        isolation = [60 - reachable if reachable <= MAX_GROUP_SIZE else total / reachable
+                     for total, reachable in zip(total_distance, reachable_pumpkins)]
+
+        previous_isolation = self._isolation.copy()
+        self._isolation[[idx for idx in cells if not passable[idx]]] = float('inf')
+        self._isolation[sources] = isolation
+        self._reachable[sources] = reachable_pumpkins
+        return np.flatnonzero(self._isolation != previous_isolation).tolist()
+
+    def priority(self, idx: int) -> tuple[float, bool, int]:
+        """
+        Array counterpart of Cell.priority.
+        Given the same score, pumpkins are given priority over bridges and air. After that, the tie break order
+        decides, which prefers cells higher up in the grid over cells lower down unless it was shuffled
+        """
+        is_pumpkin = self._blocks[idx] == PUMPKIN
+        if is_pumpkin:
+            return -self._isolation[idx], False, self._tie_break[idx]
 
-            # Breadth first search, not storing any distances but just the average distance
-            total_distance = 0.0
-            visited_cells = set()
-            cell.reachable_pumpkins = 0
-
-            current_distance = 0
-            current_cells = {cell}
-
-            while len(current_cells) > 0:
-                total_distance += current_distance * len([cell for cell in current_cells
-                                                          if cell.projected_block == GeodeEnum.PUMPKIN
-                                                          and not cell.has_group])
-                cell.reachable_pumpkins += len([cell for cell in current_cells
-                                                if cell.projected_block == GeodeEnum.PUMPKIN
-                                                and not cell.has_group])
-                visited_cells |= current_cells
-
-                new_cells = {cell
-                             for edge in current_cells
-                             for cell in edge.neighbours(self.grid)
-                             if cell not in visited_cells
-                             and cell.projected_block not in [GeodeEnum.OBSIDIAN, GeodeEnum.AIR]
-                             and not cell.has_group}
-
-                current_cells = new_cells
-                current_distance += 1
-            try:
-                cell.average_block_distance = total_distance / cell.reachable_pumpkins
-            except ZeroDivisionError:
-                cell.average_block_distance = float('inf')
-            # If it only visited less than MAX range blocks, increase the score so the algorithm has to get it
-            if cell.reachable_pumpkins <= MAX_GROUP_SIZE:
-                cell.average_block_distance = 60 - cell.reachable_pumpkins
+        # Otherwise, return the maximum isolation score of all the neighbours
+        return -max((self._isolation[neighbour]
+                     for neighbour in self._neighbours[idx]
+                     if self._blocks[neighbour] == PUMPKIN
+                     and self._groups[neighbour] == NO_GROUP),
+                    default=self._isolation[idx]), True, self._tie_break[idx]
 
     def handle_cluster_splitting(self,
-                                 cell: Cell,
+                                 idx: int,
                                  group: Group,
-                                 old_clusters: set[frozenset[Cell]],
-                                 new_clusters: set[frozenset[Cell]],
-                                 visited_blocks: set[Cell]) -> bool:
-        # We take the difference between the old set of clusters and the new set of clusters:
-        # original - new = the cluster that was split up
-        # new - original = the clusters it was split up into
-        unchanged_clusters = old_clusters & new_clusters
-        changed_new_clusters = new_clusters - unchanged_clusters
+                                 changed_new_clusters: list[int],
+                                 visited_blocks: set[int]) -> bool:
+        # The cluster tracker tells which clusters the cluster of the block was split up into, by their ids.
+        # Only clusters with pumpkins are included
+        cluster_sizes = {cluster_id: len(self._cluster_tracker.cells(cluster_id))
+                         for cluster_id in changed_new_clusters}
 
         # There should be no scenario in which this method is called and there are not at least two clusters
-        largest_new_cluster = max(changed_new_clusters, key=lambda cluster: len(cluster))
-        second_largest_new_cluster = max(changed_new_clusters - {largest_new_cluster}, key=lambda cluster: len(cluster))
-        if len(largest_new_cluster) == len(second_largest_new_cluster):
+        largest_new_cluster = max(changed_new_clusters, key=cluster_sizes.get)
+        second_largest_new_cluster = max((cluster_id for cluster_id in changed_new_clusters
+                                          if cluster_id != largest_new_cluster),
+                                         key=cluster_sizes.get)
+        if cluster_sizes[largest_new_cluster] == cluster_sizes[second_largest_new_cluster]:
             # If the largest clusters are equally large, we don't exclude the largest cluster anymore.
             # For the block to end up being placed, it will have to absorb all clusters
             smallest_changed_new_clusters = changed_new_clusters
         else:
-            smallest_changed_new_clusters = changed_new_clusters - {largest_new_cluster}
+            smallest_changed_new_clusters = [cluster_id for cluster_id in changed_new_clusters
+                                             if cluster_id != largest_new_cluster]
 
         # For the neighbours of the newly added block, we check if entire clusters can be added to the
         # current group
@@ -149,34 +278,26 @@ class Geode:
         #   if the number of blocks that can still be added to the current group is larger than or equal
         #   to the total size of the smallest changed new clusters, then we commit to placing the block
         #   and all blocks in these clusters
-        if (MAX_GROUP_SIZE - len(group) >=
-                sum((len(cluster) for cluster in smallest_changed_new_clusters))):
-            # To add the cluster, we create frontier, i.e. the set of neighbours of the current group.
-            frontier = {neighbour
-                        for group_block in group.cells
-                        for neighbour in group_block.neighbours(self.grid)
-                        if neighbour not in group.cells}
+        remaining_size = MAX_GROUP_SIZE - len(group)
+        if remaining_size >= sum((cluster_sizes[cluster_id] for cluster_id in smallest_changed_new_clusters)):
             # We compute the set of blocks that should be absorbed
             absorption_target_set = {block
-                                     for cluster in smallest_changed_new_clusters
-                                     if any((True for block in cluster if block.projected_block == GeodeEnum.PUMPKIN))
-                                     for block in cluster}
-            self.populate_group(group, frontier, visited_blocks, absorption_target_set=absorption_target_set)
-            commit_block = True
+                                     for cluster_id in smallest_changed_new_clusters
+                                     for block in self._cluster_tracker.cells(cluster_id)}
+        elif remaining_size >= sum((self._cluster_tracker.pumpkin_count(cluster_id)
+                                    for cluster_id in smallest_changed_new_clusters)):
+            # If that's not the case, we check how many blocks it takes to reach all pumpkins in the clusters,
+            # since there may be bridges that are not needed to reach all pumpkins.
+            # A single articulation analysis tells which parts of the clusters connect their pumpkins, instead of
+            # running a BFS with every bridge disabled
+            absorption_target_set = self._connecting_blocks(idx, smallest_changed_new_clusters)
+            if remaining_size < len(absorption_target_set):
+                absorption_target_set = None
+        else:
+            absorption_target_set = None
 
         # Further possible algorithms to refine the check are listed below, but they are not the immediate priority
         # as there are more pressing issues with the heuristic to solve.
-
-        # If that's not the case, we have to check how many blocks it takes to reach all pumpkins in the clusters.
-        # This is because there may be bridges that are not needed to reach all pumpkins
-        # If all bridges in the new clusters are reachable within the remaining group size, we also commit
-        # to placing the block.
-
-        #
-        # If not all bridges can be reached, then the refined number of required blocks to reach all pumpkin
-        # blocks per cluster has to be considered.
-        # If the total number of required blocks is less than the group size, we decide not to place the block
-        # and instead make a group of the entire old cluster.
         # If the total number of required blocks is more than the group size, we determine whether it's possible
         # to add all pumpkins from a cluster to the current group such that the other cluster can form its own
         # group if its size is less than the MAX_GROUP_SIZE.
@@ -185,130 +306,168 @@ class Geode:
         # number of blocks to equal or below MAX_GROUP_SIZE
         # If none of these conditions apply, there is nothing that can be done to improve the situation
 
-        # To check how many blocks it takes to reach all pumpkins in a cluster, we have to eliminate useless
-        # bridges.
-        # To check if a bridge is useless (i.e. all pumpkins that were reachable are still reachable after
-        # disabling the bridge), we can run BFS with one bridge disabled each time and see if all pumpkins
-        # are still reachable
-        # Before running BFS for all bridges, we can instead make some optimizations that are faster to compute.
-
-        # 1. For all pumpkins with only one neighbour where the neighbour is a bridge, the bridge is mandatory
-        # 2. For all bridges with only one neighbour, the bridge is useless
-        # 3. For the newly created clusters, if only one of the neighbours of the added block is part of the
-        #    cluster, then trace a path from that neighbour until it branches or until all pumpkins are found.
-        #    All bridges on this path are mandatory.
-        #    # Optimization: For the 'forced' path, you can always explore pumpkins before bridges
-        #                    If BFS runs end up being necessary you run those starting from the first
-        #                    branching point.
-
-        # If there are still bridges for which the state is undetermined, then you first run a BFS from the
-        # final block of the mandatory path to determine the distances to all remaining pumpkins.
-        # Then, for all undetermined bridges, you mark the bridge as unnecessary, run the BFS again from the
-        # final block. If the distance to any of the pumpkins increases (possibly to infinite), the bridge
-        # is necessary.
-        # This doesn't necessarily achieve the optimal layout but can't massively mess up
-        # Over-optimization: You can make subclusters while determining the distance to the remaining
-        #                    pumpkins to decrease the BFS search space
+        if absorption_target_set is not None:
+            # To add the clusters, we create frontier, i.e. the set of neighbours of the current group.
+            group_blocks = set(np.flatnonzero(self._groups == group.group_nr).tolist())
+            frontier = {neighbour
+                        for group_block in group_blocks
+                        for neighbour in self._neighbours[group_block]
+                        if neighbour not in group_blocks}
+            self.populate_group(group, frontier, visited_blocks, absorption_target_set=absorption_target_set)
+            commit_block = True
 
         # Finally, if no other options are left, we roll back the block
         else:
-            group.remove_cell(cell)
+            self._remove_from_group(idx, group)
             commit_block = False
         return commit_block
 
+    def _connecting_blocks(self, idx: int, cluster_ids: list[int]) -> set[int]:
+        """
+        Finds the blocks that the group of a block needs to absorb to reach all pumpkins of the given clusters
+        :param idx: The block that split the clusters off, it is part of the group
+        :param cluster_ids: The clusters to absorb
+        :return: The pumpkins of the clusters, and the bridges needed to connect them to each other and to the block
+        """
+        required = set()
+        for cluster_id in cluster_ids:
+            cells = self._cluster_tracker.cells(cluster_id)
+            terminals = {cell for cell in cells if self._blocks[cell] == PUMPKIN}
+            # The group reaches the cluster through a neighbour of the block, a pumpkin if possible
+            terminals.add(min((neighbour for neighbour in self._neighbours[idx] if neighbour in cells),
+                              key=lambda neighbour: (self._blocks[neighbour] != PUMPKIN, neighbour)))
+            required |= connecting_cells(cells, terminals, self._neighbours)
+        return required
+
     def populate_group(self,
                        group: Group,
-                       frontier: set[Cell],
-                       visited_blocks: set[Cell], *,
-                       absorption_target_set: set[Cell] = None):
+                       frontier: set[int],
+                       visited_blocks: set[int], *,
+                       absorption_target_set: set[int] = None):
         """
         Populate a group until it is full or no more useful blocks can be added to it
         :param group: The group to populate
-        :param frontier: A set of cells that has yet to be explored
+        :param frontier: A set of flat cell indices that has yet to be explored
         :param visited_blocks: The blocks that have already been visited while adding blocks to this group
         :param absorption_target_set: The blocks that the group should attempt to absorb
         :return:
         """
         absorb_cluster_mode_enabled = absorption_target_set is not None
+        neighbours = self._neighbours
+        blocks = self._blocks
+        groups = self._groups
+        metrics = self.metrics
+
+        # The queue lives as long as the frontier, and is kept in sync with it.
+        # If absorb_cluster_mode_enabled is active, the blocks in the queue are not guaranteed to be neighbours
+        # of the current group, so we should only add blocks to the queue that are both in the frontier and in
+        # the set of blocks that is to be absorbed
+        q = IndexedPriorityQueue()
+        # Blocks that are scored at the start of the next iteration, when the isolation metric is up to date
+        unscored = frontier & absorption_target_set if absorb_cluster_mode_enabled else set(frontier)
+        seen_group_changes = len(self._group_changes)
 
         while len(group) < MAX_GROUP_SIZE:
             commit_block = True
-            q = PrioritySet()
-
-            if absorb_cluster_mode_enabled:
-                # If absorb_cluster_mode_enabled is active, the blocks in the queue are not guaranteed to be neighbours
-                # of the current group, so we should only add blocks to the queue that are both in the frontier and in
-                # the set of blocks that is to be absorbed
-                for cell in frontier & absorption_target_set:
-                    q.add(cell, cell.priority(self.grid))
-            else:
-                # absorb_cluster_mode_enabled is inactive, we need to recompute the isolation metric for the
-                # frontier, then add the blocks to the queue
-                self.average_isolation(frontier)
-                for cell in frontier:
-                    q.add(cell, cell.priority(self.grid))
+
+            # absorb_cluster_mode_enabled is inactive, we need to recompute the isolation metric for the frontier
+            changed_cells = [] if absorb_cluster_mode_enabled else self.average_isolation(frontier)
+            # The priority of a cell only depends on its own isolation, and on the isolation and group of its
+            # neighbours, so only the queued cells around the cells that changed have to be re-scored.
+            # This includes blocks that were added to or removed from a group while absorbing clusters
+            changed_cells += self._group_changes[seen_group_changes:]
+            seen_group_changes = len(self._group_changes)
+            unscored.update(cell
+                            for changed_cell in changed_cells
+                            for cell in (changed_cell, *neighbours[changed_cell])
+                            if cell in q)
+            for idx in unscored:
+                q.add(idx, self.priority(idx))
+            if metrics is not None:
+                metrics.queue_pushes += len(unscored)
+            unscored.clear()
 
             try:  # Select the cell for this iteration
-                cell: Cell = q.get()
+                idx: int = q.get()
+                if metrics is not None:
+                    metrics.queue_pops += 1
                 # If there's only one node left to add, don't add bridges
                 if MAX_GROUP_SIZE - len(group) == 1:
-                    while cell.projected_block == GeodeEnum.BRIDGE:
-                        visited_blocks.add(cell)
-                        frontier.remove(cell)
-                        cell = q.get()
+                    while blocks[idx] == BRIDGE:
+                        visited_blocks.add(idx)
+                        frontier.remove(idx)
+                        if metrics is not None:
+                            metrics.cells_skipped += 1
+                        idx = q.get()
+                        if metrics is not None:
+                            metrics.queue_pops += 1
             except IndexError:
                 break
 
             # If a bridge doesn't have any ungrouped pumpkins or bridges as neighbours, we skip the bridge
-            if (cell.projected_block == GeodeEnum.BRIDGE
-                    and not any((not neighbour.has_group
-                                 and neighbour.projected_block in [GeodeEnum.PUMPKIN, GeodeEnum.BRIDGE]
-                                 for neighbour in cell.neighbours(self.grid)))):
-                visited_blocks.add(cell)
-                frontier.remove(cell)
+            if (blocks[idx] == BRIDGE
+                    and not any((groups[neighbour] == NO_GROUP
+                                 and blocks[neighbour] in (PUMPKIN, BRIDGE)
+                                 for neighbour in neighbours[idx]))):
+                visited_blocks.add(idx)
+                frontier.remove(idx)
+                if metrics is not None:
+                    metrics.cells_skipped += 1
                 continue
 
-            group.add_cell(cell)
-            visited_blocks.add(cell)
-            frontier.remove(cell)
+            split_clusters = self._add_to_group(idx, group)
+            visited_blocks.add(idx)
+            frontier.remove(idx)
 
-            # During the computation of the isolation metric we also make a set of clusters consisting of blocks
-            # that can all reach each other without traversing bedrock and blocks with groups
-            # When placing a block, if it leads to n new clusters, we know that the block breaks up
-            # an existing cluster into 1 + n clusters
+            # The cluster tracker keeps the clusters of blocks that can all reach each other without traversing
+            # bedrock and blocks with groups up to date
+            # When placing a block splits its cluster into n clusters with pumpkins, we know that the block breaks up
+            # an existing cluster
             # Splitting up clusters like this is only possible when not absorbing clusters
-            if not absorb_cluster_mode_enabled:
-                # Store the old clusters before we recompute them
-                old_clusters = self.clusters
-                self.compute_clusters()
-                if len(self.clusters) > len(old_clusters):
-                    commit_block = self.handle_cluster_splitting(cell, group, old_clusters,
-                                                                 self.clusters, visited_blocks)
-                    # Regardless of whether the block was committed and more blocks were added, or if the block
-                    # is rolled back, we need to recompute the cluster so the next run has accurate clusters
-                    self.compute_clusters()
+            if not absorb_cluster_mode_enabled and len(split_clusters) > 1:
+                commit_block = self.handle_cluster_splitting(idx, group, split_clusters, visited_blocks)
+                if metrics is not None:
+                    if commit_block:
+                        metrics.cluster_split_commits += 1
+                    else:
+                        metrics.cluster_split_rollbacks += 1
 
             if commit_block:
                 # We add new neighbours to the frontier
-                frontier |= {neighbour for neighbour in cell.neighbours(self.grid)
-                             if neighbour.projected_block in [GeodeEnum.PUMPKIN, GeodeEnum.BRIDGE]
-                             and not neighbour.has_group
-                             and neighbour not in visited_blocks}
-
-    def heuristic_placement(self):
+                new_frontier = {neighbour for neighbour in neighbours[idx]
+                                if blocks[neighbour] in (PUMPKIN, BRIDGE)
+                                and groups[neighbour] == NO_GROUP
+                                and neighbour not in visited_blocks
+                                and neighbour not in frontier}
+                frontier |= new_frontier
+                unscored |= new_frontier & absorption_target_set if absorb_cluster_mode_enabled else new_frontier
+
+    def heuristic_placement(self, rng: Random = None, source_noise: float = SOURCE_NOISE):
+        """
+        Places groups greedily until every pumpkin is part of a group
+        :param rng: If given, ties are broken in a random order and the choice of the source of every group is
+                    perturbed, so every run can give a different placement. Without it the placement is deterministic
+        :param source_noise: How much the isolation of a pumpkin is perturbed when choosing a source, as a fraction
+        """
+        start = time.perf_counter()
         self.reset_groups()
+        if rng is None:
+            self._tie_break = range(len(self._cells))
+        else:
+            self._tie_break = list(range(len(self._cells)))
+            rng.shuffle(self._tie_break)
 
-        while any(not block.has_group
-                  for block in self.cells()
-                  if block.projected_block == GeodeEnum.PUMPKIN):
+        while (free_pumpkins := np.flatnonzero((self._blocks == PUMPKIN) & (self._groups == NO_GROUP))).size:
             # Before populating a new group, we should always update the isolation score for all blocks
-            # and compute clusters
             self.average_isolation()
-            self.compute_clusters()
 
-            source_block = min((block for block in self.cells()
-                                if block.projected_block == GeodeEnum.PUMPKIN and not block.has_group),
-                               key=lambda x: x.priority(self.grid))
+            # The most isolated pumpkin is the source, on ties the last one in the tie break order
+            if rng is None:
+                source_block = max(free_pumpkins.tolist(), key=lambda idx: (self._isolation[idx], idx))
+            else:
+                source_block = max(free_pumpkins.tolist(),
+                                   key=lambda idx: (self._isolation[idx] * (1 + rng.uniform(0, source_noise)),
+                                                    self._tie_break[idx]))
             frontier = {source_block}
             visited_blocks = set()
             # Instantiate the group (looks weird because of default dicts)
@@ -317,29 +476,136 @@ class Geode:
             self.groups[group.group_nr] = group
 
             self.populate_group(group, frontier, visited_blocks)
+            if not len(group):
+                # Every way of growing the group split off clusters it couldn't absorb, so even the source was rolled
+                # back. Choosing the same source again would do the same, so it gets a group of its own
+                self._add_to_group(source_block, group)
+
+        # The distance rows take up most of the memory of a solved geode. They are rebuilt from the grids if they are
+        # needed again
+        self._isolation_engine_instance = None
+
+        if self.metrics is not None:
+            self.metrics.groups = len(self.groups)
+            self.metrics.heuristic_placement_seconds += time.perf_counter() - start
+
+    def beam_placement(self, width: int = 4, branching: int = 3):
+        """
+        Places groups like heuristic_placement, but builds every group with a beam search instead of greedily.
+        The cost grows with width * branching, and width=1, branching=1 adds the most isolated frontier cell every
+        time, like the greedy placement without its handling of split clusters
+        :param width: The number of partial groups kept at every size
+        :param branching: The number of frontier cells every partial group is extended with
+        """
+        start = time.perf_counter()
+        self.reset_groups()
+        pumpkins = (self._blocks == PUMPKIN).tolist()
+
+        while (free_pumpkins := np.flatnonzero((self._blocks == PUMPKIN) & (self._groups == NO_GROUP))).size:
+            self.average_isolation()
+            # The same source as the greedy placement
+            source_block = max(free_pumpkins.tolist(), key=lambda idx: (self._isolation[idx], idx))
+            beam_search = GroupBeamSearch(pumpkins, self._passable(), self._isolation.tolist(), self._neighbours,
+                                          MAX_GROUP_SIZE)
+
+            group = Group()
+            group.group_nr = len(self.groups)
+            self.groups[group.group_nr] = group
+            for idx in beam_search.search(source_block, width, branching):
+                self._add_to_group(idx, group)
+            if self.metrics is not None:
+                self.metrics.beam_states_scored += beam_search.states_scored
+                self.metrics.beam_cells_visited += beam_search.cells_visited
+
+        self._isolation_engine_instance = None
+        if self.metrics is not None:
+            self.metrics.groups = len(self.groups)
+            self.metrics.heuristic_placement_seconds += time.perf_counter() - start
+
+    def anytime_placement(self,
+                          time_budget: float = None,
+                          iterations: int = None,
+                          seed: int = None,
+                          source_noise: float = SOURCE_NOISE) -> int:
+        """
+        Runs the greedy placement again and again with random tie breaking and perturbed sources, and keeps the best
+        placement: the fewest groups, and then the most pumpkins covered. The first run is the deterministic
+        heuristic, so the result is never worse than heuristic_placement. Stops when either budget runs out, and
+        after the first run if neither is given
+        :param time_budget: The wall clock time in seconds to spend at most, the run in progress is finished
+        :param iterations: The number of runs to do at most, including the first
+        :param seed: The seed of the random tie breaking, so that results can be reproduced
+        :param source_noise: How much the isolation of a pumpkin is perturbed when choosing a source, as a fraction
+        :return: The number of runs that were done
+        """
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        rng = Random(seed)
+        best_score = best_grid = None
+        runs = 0
+        while True:
+            self.heuristic_placement(rng if runs else None, source_noise)
+            runs += 1
+            covered = int(np.count_nonzero((self._blocks == PUMPKIN) & (self._groups != NO_GROUP)))
+            score = (len(self.groups), -covered)
+            if best_score is None or score < best_score:
+                best_score, best_grid = score, self.group_grid.copy()
+
+            if (iterations is None and deadline is None
+                    or iterations is not None and runs >= iterations
+                    or deadline is not None and time.perf_counter() >= deadline):
+                break
+
+        # The last run is not necessarily the best one
+        if not np.array_equal(best_grid, self.group_grid):
+            self.load_groups(best_grid)
+        if self.metrics is not None:
+            self.metrics.placement_runs += runs
+            self.metrics.groups = len(self.groups)
+        return runs
+
+    def load_groups(self, group_grid: np.ndarray):
+        """
+        Replaces the groups with a known assignment, e.g. from a cache, instead of running the heuristic
+        :param group_grid: The group number of every cell, NO_GROUP for cells without a group
+        """
+        self.reset_groups()
+        self.group_grid[...] = group_grid
+        for idx in np.flatnonzero(self._groups != NO_GROUP).tolist():
+            group_nr = int(self._groups[idx])
+            if group_nr not in self.groups:
+                group = Group()
+                group.group_nr = group_nr
+                self.groups[group_nr] = group
+            self.groups[group_nr].add_cell(self._cells[idx])
+        self.groups = dict(sorted(self.groups.items()))
 
     def cells(self) -> Tuple[Cell]:
         return self._cells
 
     def isolated_pumpkins(self) -> list[Cell]:
-        return [cell
-                for cell in self.cells()
-                if cell.average_block_distance >= 50
-                and cell.projected_block == GeodeEnum.PUMPKIN]
+        return [self._cells[idx]
+                for idx in np.flatnonzero((self._isolation >= 50) & (self._blocks == PUMPKIN))]
+
+    def _sync_cell_view(self):
+        # Copy the metrics from the arrays to the cells so they can be printed
+        for cell, isolation, reachable in zip(self._cells, self._isolation.tolist(), self._reachable.tolist()):
+            cell.average_block_distance = isolation
+            cell.reachable_pumpkins = reachable
 
     def _pretty_print_grid(self, str_func: Callable[[Cell], str]):
-        for row_val in self.grid:
-            print(''.join((str_func(cell))
-                          for cell in row_val))
+        self._sync_cell_view()
+        # One write for the whole grid instead of a print per row
+        sys.stdout.write(''.join(''.join(str_func(cell) for cell in row_val) + '\n' for row_val in self.grid))
 
     def pretty_print_group_grid(self):
-        self._pretty_print_grid(Cell.group_str)
+        # The groups and blocks are read straight from the grids, without going through the cells
+        sys.stdout.write(render(self.block_grid, self.group_grid, GROUPS))
 
     def pretty_print_projection(self):
-        self._pretty_print_grid(Cell.projected_str)
+        sys.stdout.write(render(self.block_grid, self.group_grid, PROJECTION))
 
     def pretty_print_merged(self):
-        self._pretty_print_grid(Cell.merged_str)
+        sys.stdout.write(render(self.block_grid, self.group_grid, MERGED))
 
     def pretty_print_shortest_distance(self, cell: Cell):
         self._pretty_print_grid(lambda cell2: cell.distance_str(cell2))
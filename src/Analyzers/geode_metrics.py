@@ -0,0 +1,88 @@
+import json
+from dataclasses import asdict, dataclass, fields
+from typing import IO, Iterable
+
+
+@dataclass
+class GeodeMetrics:
+    """
+    Counters of the work done while solving a geode. Geode only fills them in when metrics are enabled on it, so
+    they cost nothing otherwise
+    """
+    # Identifies the geode in a batch, filled in by the caller
+    index: int = -1
+    rows: int = 0
+    cols: int = 0
+    pumpkins: int = 0
+
+    # Isolation metric
+    average_isolation_calls: int = 0
+    average_isolation_seconds: float = 0.0
+    # Distance rows that were computed with a full breadth first search, and rows that were repaired incrementally
+    bfs_rows_computed: int = 0
+    bfs_rows_updated: int = 0
+    # Cells visited by the breadth first searches and by the repairs of rows
+    bfs_visits: int = 0
+
+    # Clusters
+    compute_clusters_calls: int = 0
+    compute_clusters_seconds: float = 0.0
+    cluster_splits: int = 0
+    # Cells visited while looking for the parts of a split cluster
+    cluster_split_visits: int = 0
+
+    # Priority queue of populate_group
+    queue_pushes: int = 0
+    queue_pops: int = 0
+
+    # Outcomes in populate_group
+    cells_placed: int = 0
+    cells_skipped: int = 0
+    cluster_split_commits: int = 0
+    cluster_split_rollbacks: int = 0
+
+    # Beam search placement: partial groups that were scored, and the cells visited to score them
+    beam_states_scored: int = 0
+    beam_cells_visited: int = 0
+
+    groups: int = 0
+    heuristic_placement_seconds: float = 0.0
+    # Runs of the greedy placement, more than one with randomized restarts
+    placement_runs: int = 0
+
+    # Choosing a flying machine for every group: branch and bound nodes, and the time it took
+    machine_assignment_nodes: int = 0
+    machine_assignment_seconds: float = 0.0
+
+    def as_record(self) -> dict:
+        return asdict(self)
+
+
+def write_jsonl(records: Iterable[GeodeMetrics], file: IO[str]):
+    # One JSON object per line, so the file can be appended to and read back in a stream
+    for record in records:
+        file.write(json.dumps(record.as_record()))
+        file.write('\n')
+
+
+def read_jsonl(file: IO[str]) -> list[GeodeMetrics]:
+    names = {field.name for field in fields(GeodeMetrics)}
+    return [GeodeMetrics(**{name: value for name, value in json.loads(line).items() if name in names})
+            for line in file
+            if line.strip()]
+
+
+def aggregate(records: Iterable[GeodeMetrics]) -> dict:
+    """
+    Sums the counters of a batch of geodes
+    :param records: The metrics of every geode
+    :return: The totals of every counter, and the number of geodes
+    """
+    totals = {field.name: 0 for field in fields(GeodeMetrics) if field.name not in ('index', 'rows', 'cols')}
+    geodes = 0
+    for record in records:
+        geodes += 1
+        for name in totals:
+            totals[name] += getattr(record, name)
+    totals['geodes'] = geodes
+    return totals
@@ -0,0 +1,52 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Offsets of the neighbours of a cell, in the order up, left, down, right
+NEIGHBOUR_OFFSETS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+
+class GridTopology:
+    """
+    The neighbours of every cell of a grid of a given shape, by flat index.
+
+    The adjacency is stored in compressed sparse row form: the neighbours of cell i are indices[indptr[i]:indptr[i+1]],
+    and sources holds the cell that every entry of indices belongs to. Vectorised code works on these arrays. Loops
+    in Python are faster over tuples of ints than over numpy arrays, so the same adjacency is also available as a
+    tuple per cell, built once from the arrays.
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+
+        row_idx, col_idx = np.divmod(np.arange(self.size), cols)
+        neighbour_rows = row_idx[:, None] + np.array([row_ for row_, _ in NEIGHBOUR_OFFSETS])
+        neighbour_cols = col_idx[:, None] + np.array([col_ for _, col_ in NEIGHBOUR_OFFSETS])
+        inside = (neighbour_rows >= 0) & (neighbour_rows < rows) & (neighbour_cols >= 0) & (neighbour_cols < cols)
+
+        # Row major order of the mask keeps the neighbours of a cell together and in the order of NEIGHBOUR_OFFSETS
+        self.degree: np.ndarray = inside.sum(axis=1).astype(np.int32)
+        self.indptr: np.ndarray = np.concatenate(([0], np.cumsum(self.degree))).astype(np.int32)
+        self.indices: np.ndarray = (neighbour_rows * cols + neighbour_cols)[inside].astype(np.int32)
+        self.sources: np.ndarray = np.repeat(np.arange(self.size, dtype=np.int32), self.degree)
+        for array in (self.degree, self.indptr, self.indices, self.sources):
+            # The topology is shared between geodes, so nobody may change it
+            array.flags.writeable = False
+
+        indices = self.indices.tolist()
+        indptr = self.indptr.tolist()
+        self.neighbours: tuple[tuple[int, ...], ...] = tuple(tuple(indices[indptr[idx]:indptr[idx + 1]])
+                                                             for idx in range(self.size))
+
+
+@lru_cache(maxsize=None)
+def grid_topology(rows: int, cols: int) -> GridTopology:
+    """
+    The topology only depends on the shape, so it is shared between all geodes with the same dimensions. A corpus
+    has few distinct shapes, so it is built once per shape
+    :param rows: The number of rows of the grid
+    :param cols: The number of columns of the grid
+    """
+    return GridTopology(rows, cols)
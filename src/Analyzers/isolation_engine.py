@@ -0,0 +1,180 @@
+from src.Analyzers.bitboard import BitboardLayout, popcount
+
+# Version of a row that has to be computed from scratch
+OUTDATED = -1
+
+
+class IsolationEngine:
+    """
+    Keeps track of the distances between all passable cells of a geode, such that the sum of the distances to all
+    reachable pumpkins can be looked up for any cell without running a breadth first search from it every time.
+
+    The cells are bitboards (see BitboardLayout), so a breadth first search from a source is a list of the cells up to
+    distance 0, 1, 2, ... from it. The next layer is the current one shifted in the four directions, masked with the
+    passable cells that weren't reached yet, and the pumpkins of a layer are counted with a single popcount.
+
+    Rows are computed the first time they are requested. After that, cells that join a group are only written to a
+    log, and every row remembers how much of the log it has seen. A path to a cell only runs through cells that are
+    closer to the source, so when an older row is requested again, the layers before the first layer with a removed
+    cell are still correct, and the search only continues from there. Rows that never reached a removed cell are
+    unaffected.
+    """
+
+    def __init__(self,
+                 layout: BitboardLayout,
+                 pumpkins: list[bool],
+                 passable: list[bool]):
+        """
+        :param layout: The bitboard layout of the geode
+        :param pumpkins: For each flat index, whether the cell is a pumpkin
+        :param passable: For each flat index, whether the cell can be traversed
+        """
+        size = len(passable)
+        self._layout = layout
+        self._pumpkins = layout.from_flags(pumpkins)
+        self._passable = layout.from_flags(passable)
+
+        # For every row and distance: the cells up to that distance, and the pumpkins and the sum of their distances
+        # up to that distance. The last entries are the cells, pumpkins and total distance of the whole row
+        self._reached: list[list[int]] = [None] * size
+        self._pumpkin_counts: list[list[int]] = [None] * size
+        self._distance_totals: list[list[int]] = [None] * size
+        # The cells that joined a group, in order, and for each row the length of the log when it was last updated
+        self._removed: list[int] = []
+        self._versions: list[int] = [OUTDATED] * size
+        # Rows of the same version share the cells that were removed since, which is cached until the next change
+        self._removed_since: dict[int, int] = {}
+
+        # Counters of the work done, for instrumentation
+        self.rows_computed = 0
+        self.rows_updated = 0
+        self.cells_visited = 0
+
+    def block_grouped(self, idx: int):
+        """
+        Removes a cell that joined a group from the distance structure
+        :param idx: The flat index of the cell
+        """
+        self._passable &= ~self._layout.bits[idx]
+        self._removed.append(idx)
+        self._versions[idx] = OUTDATED
+        self._removed_since.clear()
+
+    def block_ungrouped(self, idx: int):
+        """
+        Adds a cell that left a group back to the distance structure
+        :param idx: The flat index of the cell
+        """
+        bit = self._layout.bits[idx]
+        self._passable |= bit
+        self._removed_since.clear()
+
+        # Distances can only get shorter, and the components of the neighbours may merge, so every source that could
+        # reach one of the neighbours has to be computed from scratch.
+        # Sources that couldn't reach any of the neighbours are in a different component and are unaffected.
+        neighbourhood = self._layout.expand(bit) & self._passable
+        for source_idx, reached in enumerate(self._reached):
+            if reached is not None and reached[-1] & neighbourhood:
+                self._versions[source_idx] = OUTDATED
+
+    def _search(self, source_idx: int, frontier: int, reached: list[int], pumpkin_counts: list[int],
+                distance_totals: list[int]):
+        """
+        Continues the breadth first search of a row from its last layer, and sums up the distances
+        :param source_idx: The source of the row
+        :param frontier: The cells of the last layer that is known to be correct
+        :param reached: The cells up to every distance that is known to be correct
+        :param pumpkin_counts: The pumpkins up to every distance that is known to be correct
+        :param distance_totals: The sum of the distances of those pumpkins
+        """
+        stride = self._layout.stride
+        pumpkins = self._pumpkins
+        cells = reached[-1]
+        unvisited = self._passable & ~cells
+        distance = len(reached)
+        count = pumpkin_counts[-1]
+        total = distance_totals[-1]
+        while frontier := (frontier << 1 | frontier >> 1 | frontier << stride | frontier >> stride) & unvisited:
+            unvisited ^= frontier
+            cells |= frontier
+            if layer_pumpkins := popcount(frontier & pumpkins):
+                count += layer_pumpkins
+                total += distance * layer_pumpkins
+            reached.append(cells)
+            pumpkin_counts.append(count)
+            distance_totals.append(total)
+            distance += 1
+
+        self._reached[source_idx] = reached
+        self._pumpkin_counts[source_idx] = pumpkin_counts
+        self._distance_totals[source_idx] = distance_totals
+        self._versions[source_idx] = len(self._removed)
+
+    def _compute_row(self, source_idx: int):
+        # Breadth first search from the source over the passable cells
+        bit = self._layout.bits[source_idx]
+        self._search(source_idx, bit, [bit], [popcount(bit & self._pumpkins)], [0])
+        self.rows_computed += 1
+        self.cells_visited += popcount(self._reached[source_idx][-1])
+
+    def _removed_cells(self, version: int) -> int:
+        # The cells that were removed since a version of the log and weren't given back
+        if version not in self._removed_since:
+            bits = self._layout.bits
+            removed = 0
+            for idx in self._removed[version:]:
+                removed |= bits[idx]
+            self._removed_since[version] = removed & ~self._passable
+        return self._removed_since[version]
+
+    def _update_row(self, source_idx: int):
+        """
+        Brings a row up to date with the cells that were removed since it was last updated
+        :param source_idx: The source of the row
+        """
+        reached = self._reached[source_idx]
+        removed = self._removed_cells(self._versions[source_idx]) & reached[-1]
+        self.rows_updated += 1
+        if not removed:
+            self._versions[source_idx] = len(self._removed)
+            return
+
+        # The cells up to a distance only grow with the distance, so the first distance with a removed cell is found
+        # with a binary search
+        low, high = 0, len(reached) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if reached[middle] & removed:
+                high = middle
+            else:
+                low = middle + 1
+
+        # The layers before it keep their distances, and in its own layer only the removed cells drop out
+        before = reached[low - 1] if low else 0
+        layer = reached[low] & ~before & ~removed
+        layer_pumpkins = popcount(layer & self._pumpkins)
+        pumpkin_counts = self._pumpkin_counts[source_idx][:low]
+        distance_totals = self._distance_totals[source_idx][:low]
+        pumpkin_counts.append((pumpkin_counts[-1] if low else 0) + layer_pumpkins)
+        distance_totals.append((distance_totals[-1] if low else 0) + low * layer_pumpkins)
+        kept = reached[:low]
+        kept.append(before | layer)
+        self._search(source_idx, layer, kept, pumpkin_counts, distance_totals)
+        self.cells_visited += popcount(self._reached[source_idx][-1] & ~before)
+
+    def distance_sums(self, sources: list[int]) -> tuple[list[int], list[int]]:
+        """
+        Looks up the sum of the distances to all reachable pumpkins for each source
+        :param sources: The flat indices of passable cells
+        :return: The total distance and the number of reachable pumpkins for each of the sources
+        """
+        version = len(self._removed)
+        for source_idx in sources:
+            if self._versions[source_idx] == version:
+                continue
+            if self._versions[source_idx] == OUTDATED:
+                self._compute_row(source_idx)
+            else:
+                self._update_row(source_idx)
+        return ([self._distance_totals[source_idx][-1] for source_idx in sources],
+                [self._pumpkin_counts[source_idx][-1] for source_idx in sources])
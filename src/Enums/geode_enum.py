@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from aenum import Enum
-from colorama import Fore, Back, Style
+from enum import Enum
+from functools import cached_property
+from typing import Optional
 
 from src.Enums.data_annotations import DataPrimitive
 
@@ -9,32 +10,47 @@ class _GeodeDP(DataPrimitive):
 
     @staticmethod
     def new(int_value: int, *,
-            pretty_print: str):
+            symbol: str,
+            background: Optional[str]):
         return ()
 
 
 class GeodeEnum(Enum):
     @_GeodeDP
-    def __new__(cls, int_value: int, pretty_print: str):
+    def __new__(cls, int_value: int, symbol: str, background: Optional[str]):
         obj = object.__new__(cls)
         obj._value_ = int_value
         obj.int_value = int_value
-        obj.pretty_print = pretty_print
+        obj.symbol = symbol
+        # The name of the colorama background colour, None for the default background of the terminal
+        obj.background = background
         return obj
 
     AIR = _GeodeDP.new(
         int_value=0,
-        pretty_print=f'{Style.RESET_ALL}  ')
+        symbol='  ',
+        background=None)
     PUMPKIN = _GeodeDP.new(
         int_value=1,
-        pretty_print=f'{Back.YELLOW}..{Style.RESET_ALL}')
+        symbol='..',
+        background='YELLOW')
     OBSIDIAN = _GeodeDP.new(
         int_value=2,
-        pretty_print=f'{Back.BLACK}##{Style.RESET_ALL}')
+        symbol='##',
+        background='BLACK')
 
     BRIDGE = _GeodeDP.new(
         int_value=3,
-        pretty_print=f'{Back.LIGHTBLACK_EX}++{Style.RESET_ALL}')
+        symbol='++',
+        background='LIGHTBLACK_EX')
+
+    @cached_property
+    def pretty_print(self) -> str:
+        # Built on first use, so only code that prints to a terminal imports colorama
+        from colorama import Back, Style
+        if self.background is None:
+            return f'{Style.RESET_ALL}{self.symbol}'
+        return f'{getattr(Back, self.background)}{self.symbol}{Style.RESET_ALL}'
 
     def __str__(self):
         return self.pretty_print
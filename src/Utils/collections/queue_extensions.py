@@ -1,29 +1,88 @@
-import heapq
-from typing import Callable, Any
+from typing import Any
 
 
-class PrioritySet:
+class IndexedPriorityQueue:
+    """
+    A binary heap that keeps track of the position of every item, so the priority of an item can be changed and an
+    item can be removed without rebuilding the heap. Items with the lowest priority are returned first.
+    """
+
     def __init__(self):
-        self.heap = []
-        self.set = set()
+        self.heap: list[list] = []
+        self.positions: dict[Any, int] = {}
 
     def add(self, d, pri):
-        if d not in self.set:
-            heapq.heappush(self.heap, (pri, d))
-            self.set.add(d)
+        # Adds the item, or changes its priority if it is already queued
+        if d in self.positions:
+            self.update(d, pri)
+            return
+        self.positions[d] = len(self.heap)
+        self.heap.append([pri, d])
+        self._sift_up(len(self.heap) - 1)
+
+    def update(self, d, pri):
+        position = self.positions[d]
+        entry = self.heap[position]
+        old_pri = entry[0]
+        entry[0] = pri
+        if pri < old_pri:
+            self._sift_up(position)
+        elif old_pri < pri:
+            self._sift_down(position)
+
+    def remove(self, d):
+        self._pop_at(self.positions[d])
 
     def get(self):
-        pri, d = heapq.heappop(self.heap)
-        self.set.remove(d)
+        if not self.heap:
+            raise IndexError('get from an empty priority queue')
+        return self._pop_at(0)
+
+    def priority(self, d):
+        return self.heap[self.positions[d]][0]
+
+    def _pop_at(self, position: int):
+        # Move the last entry into the hole, and restore the heap from there
+        pri, d = self.heap[position]
+        del self.positions[d]
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.positions[last[1]] = position
+            self._sift_up(position)
+            self._sift_down(self.positions[last[1]])
         return d
 
-    def recompute_all(self, key: Callable[[Any], Any]):
-        old_set = self.set
-        self.heap = []
-        self.set = set()
+    def _sift_up(self, position: int):
+        heap = self.heap
+        entry = heap[position]
+        while position:
+            parent = (position - 1) >> 1
+            if not entry[0] < heap[parent][0]:
+                break
+            heap[position] = heap[parent]
+            self.positions[heap[position][1]] = position
+            position = parent
+        heap[position] = entry
+        self.positions[entry[1]] = position
+
+    def _sift_down(self, position: int):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        while (child := 2 * position + 1) < size:
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if not heap[child][0] < entry[0]:
+                break
+            heap[position] = heap[child]
+            self.positions[heap[position][1]] = position
+            position = child
+        heap[position] = entry
+        self.positions[entry[1]] = position
 
-        for item in old_set:
-            self.add(item, key(item))
+    def __contains__(self, d) -> bool:
+        return d in self.positions
 
     def __len__(self) -> int:
         return len(self.heap)
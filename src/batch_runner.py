@@ -0,0 +1,304 @@
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from src.Analyzers.geode import NO_GROUP, Geode
+from src.Analyzers.geode_metrics import GeodeMetrics, aggregate, write_jsonl
+from src.binary_corpus import blocks_from_lines, open_corpus
+from src.grid_reader import DEFAULT_GEODE_FILE, parse_geode, raw_geode_generator
+from src.machine_assignment import MachineAssigner
+from src.renderer import render_batch, style_for_path, with_bridges, write_rendered
+from src.result_writer import ResultWriter
+
+# z3, sqlite3 and multiprocessing take longer to import than most batches of the heuristic take to solve, so they are
+# only imported by the code paths that use them
+if TYPE_CHECKING:
+    from src.result_cache import ResultCache
+
+# A geode as it is sent to the workers: the lines of the text format, or the block grid of a binary corpus
+RawGeode = Union[list[str], np.ndarray]
+
+# The result caches opened by this process, by path and solve mode, so each worker opens a cache only once
+_caches: dict[tuple[str, str], 'ResultCache'] = {}
+
+
+@dataclass
+class GeodeResult:
+    # The position of the geode in the input
+    index: int
+    # The group number of every cell, NO_GROUP for cells without a group
+    group_grid: list[list[int]]
+    group_sizes: list[int]
+    # Time spent in the worker on parsing and solving the geode
+    seconds: float
+    # The instrumentation counters, if they were collected
+    metrics: Optional[GeodeMetrics] = None
+    # Whether the groups came from the result cache instead of the heuristic
+    cached: bool = False
+    # The flying machine of every group as (group, machine, axis, mirrored, row, column), None for a group that no
+    # machine fits. Only filled in if machines were assigned
+    machines: Optional[list[Optional[tuple]]] = None
+    machine_blocks: int = 0
+    # The exception that solving the geode raised, as text. The geode has no groups then
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+@dataclass
+class BatchReport:
+    results: list[GeodeResult] = field(default_factory=list)
+    # Wall clock time of the whole batch, including start up of the workers
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        # Geodes per second
+        return len(self.results) / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        timings = [result.seconds for result in self.results]
+        if not timings:
+            return 'Solved 0 geodes'
+        cached = sum(result.cached for result in self.results)
+        failed = sum(result.failed for result in self.results)
+        return (f'Solved {len(timings)} geodes in {self.seconds:.2f} seconds '
+                f'({self.throughput:.1f} geodes/s, '
+                f'mean {sum(timings) / len(timings):.3f}s, max {max(timings):.3f}s per geode'
+                f'{f", {cached} from the cache" if cached else ""}'
+                f'{f", {failed} failed" if failed else ""})')
+
+
+def solve_geode(job: tuple[int, RawGeode],
+                collect_metrics: bool = False,
+                cache_path: str = None,
+                sat_budget: float = None,
+                assign_machines: bool = False,
+                max_machine_length: int = None) -> GeodeResult:
+    """
+    Parses and solves a single geode. Runs in the worker processes, so it only receives and returns plain data
+    :param job: The index of the geode in the input and its lines or block grid
+    :param collect_metrics: Whether to count the work done while solving
+    :param cache_path: The result cache to look the geode up in and to store it in, if any
+    :param sat_budget: If given, the seconds per geode in which the SAT model tries to improve on the heuristic
+    :param assign_machines: Whether to choose a flying machine for every group after the groups are placed
+    :param max_machine_length: Flying machines longer than this aren't used, None for no limit
+    :return: The groups that the heuristic placed, or the best groups of the SAT search. If solving raised an
+             exception, a result without groups that holds the error
+    """
+    start = time.perf_counter()
+    try:
+        return _solve_geode(job, collect_metrics, cache_path, sat_budget, assign_machines, max_machine_length)
+    except Exception as error:
+        # A worker that raises ends the whole pool.imap, and the results of every other geode with it
+        return GeodeResult(job[0], [], [], time.perf_counter() - start, error=f'{type(error).__name__}: {error}')
+
+
+def _solve_geode(job: tuple[int, RawGeode],
+                 collect_metrics: bool,
+                 cache_path: Optional[str],
+                 sat_budget: Optional[float],
+                 assign_machines: bool,
+                 max_machine_length: Optional[int]) -> GeodeResult:
+    index, raw_geode = job
+    start = time.perf_counter()
+
+    cache = None
+    if cache_path is not None:
+        from src.result_cache import HEURISTIC, ResultCache, sat_mode
+        # SAT groups and heuristic groups are cached apart, so neither is returned for the other
+        mode = HEURISTIC if sat_budget is None else sat_mode(sat_budget)
+        if (cache_path, mode) not in _caches:
+            _caches[cache_path, mode] = ResultCache(cache_path, mode=mode)
+        cache = _caches[cache_path, mode]
+        # The cache only needs the block types, so a hit doesn't pay for creating cells
+        block_grid = raw_geode if isinstance(raw_geode, np.ndarray) else blocks_from_lines(raw_geode)
+        if (group_grid := cache.get(block_grid)) is not None:
+            group_sizes = np.bincount(group_grid[group_grid != NO_GROUP])
+            result = GeodeResult(index,
+                                 group_grid.tolist(),
+                                 group_sizes[group_sizes > 0].tolist(),
+                                 time.perf_counter() - start,
+                                 cached=True)
+            if assign_machines:
+                _assign_machines(result, block_grid, group_grid, max_machine_length)
+            return result
+
+    geode = Geode.from_blocks(raw_geode) if isinstance(raw_geode, np.ndarray) else parse_geode(raw_geode)
+    metrics = None
+    if collect_metrics:
+        metrics = geode.enable_metrics()
+        metrics.index = index
+    if sat_budget is None:
+        geode.heuristic_placement()
+    else:
+        # The geodes are already spread over the worker processes, so the clusters are solved in this one
+        from src.cluster_decomposition import solve_decomposed
+        solve_decomposed(geode, sat_budget, workers=1)
+    if cache is not None:
+        cache.put_geode(geode)
+    result = GeodeResult(index,
+                         geode.group_grid.tolist(),
+                         [len(group) for group in geode.groups.values()],
+                         time.perf_counter() - start,
+                         metrics)
+    if assign_machines:
+        _assign_machines(result, geode.block_grid, geode.group_grid, max_machine_length, metrics)
+    return result
+
+
+def _assign_machines(result: GeodeResult,
+                     block_grid: np.ndarray,
+                     group_grid: np.ndarray,
+                     max_machine_length: Optional[int],
+                     metrics: Optional[GeodeMetrics] = None):
+    # The pipeline stage after the placement: a flying machine for every group
+    start = time.perf_counter()
+    assignment = MachineAssigner(max_length=max_machine_length).assign(block_grid, group_grid)
+    seconds = time.perf_counter() - start
+    result.machines = assignment.as_records()
+    result.machine_blocks = assignment.blocks
+    result.seconds += seconds
+    if metrics is not None:
+        metrics.machine_assignment_nodes += assignment.nodes
+        metrics.machine_assignment_seconds += seconds
+
+
+def iter_batch(geodes: Iterable[RawGeode] = None,
+               workers: Optional[int] = None,
+               chunk_size: int = 8,
+               first_index: int = 0,
+               collect_metrics: bool = False,
+               cache_path: str = None,
+               sat_budget: float = None,
+               assign_machines: bool = False,
+               max_machine_length: int = None) -> Iterator[GeodeResult]:
+    """
+    Solves geodes in a pool of worker processes, yielding the results in input order as soon as they are available
+    :param geodes: The lines or block grid of each geode. Defaults to all geodes of the geode file
+    :param workers: The number of worker processes. Defaults to the number of cores, 1 solves in this process
+    :param chunk_size: The number of geodes that is sent to a worker at once
+    :param first_index: The index of the first geode in the file, used to number the results
+    :param collect_metrics: Whether to count the work done while solving each geode
+    :param cache_path: A result cache, geodes that are in it are not solved again
+    :param sat_budget: If given, the seconds per geode in which the SAT model tries to improve on the heuristic
+    :param assign_machines: Whether to choose a flying machine for every group after the groups are placed
+    :param max_machine_length: Flying machines longer than this aren't used, None for no limit
+    """
+    jobs = enumerate(raw_geode_generator() if geodes is None else geodes, first_index)
+    solve = partial(solve_geode, collect_metrics=collect_metrics, cache_path=cache_path, sat_budget=sat_budget,
+                    assign_machines=assign_machines, max_machine_length=max_machine_length)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        # No need to pay for starting and feeding a pool
+        yield from map(solve, jobs)
+        return
+
+    from multiprocessing import Pool
+    with Pool(workers) as pool:
+        # imap keeps the input order and only reads the input as fast as the workers consume it
+        yield from pool.imap(solve, jobs, chunksize=chunk_size)
+
+
+def run_batch(geodes: Iterable[RawGeode] = None,
+              workers: Optional[int] = None,
+              chunk_size: int = 8,
+              first_index: int = 0,
+              collect_metrics: bool = False,
+              cache_path: str = None,
+              sat_budget: float = None,
+              assign_machines: bool = False,
+              max_machine_length: int = None) -> BatchReport:
+    """
+    Solves geodes in a pool of worker processes and collects the results and timings
+    :param geodes: The lines or block grid of each geode. Defaults to all geodes of the geode file
+    :param workers: The number of worker processes. Defaults to the number of cores, 1 solves in this process
+    :param chunk_size: The number of geodes that is sent to a worker at once
+    :param first_index: The index of the first geode in the file, used to number the results
+    :param collect_metrics: Whether to count the work done while solving each geode
+    :param cache_path: A result cache, geodes that are in it are not solved again
+    :param sat_budget: If given, the seconds per geode in which the SAT model tries to improve on the heuristic
+    :param assign_machines: Whether to choose a flying machine for every group after the groups are placed
+    :param max_machine_length: Flying machines longer than this aren't used, None for no limit
+    :return: The results in input order, and the total time
+    """
+    report = BatchReport()
+    start = time.perf_counter()
+    report.results = list(iter_batch(geodes, workers, chunk_size, first_index, collect_metrics, cache_path,
+                                     sat_budget, assign_machines, max_machine_length))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Solve the geodes of the geode file in parallel')
+    parser.add_argument('input', nargs='?', default=DEFAULT_GEODE_FILE,
+                        help='the geode file, in the text or the binary format')
+    parser.add_argument('-s', '--start', type=int, default=0, help='the first geode to solve')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('-c', '--chunk-size', type=int, default=8, help='geodes sent to a worker at once')
+    parser.add_argument('-n', '--limit', type=int, default=None, help='only solve n geodes')
+    parser.add_argument('-m', '--metrics', default=None, help='write the counters of every geode to this JSONL file')
+    parser.add_argument('--cache', default=None, help='reuse and store solved geodes in this result cache')
+    parser.add_argument('-t', '--sat-budget', type=float, default=None,
+                        help='seconds per geode for the SAT model to improve on the heuristic')
+    parser.add_argument('-a', '--assign-machines', action='store_true',
+                        help='choose a flying machine for every group after the groups are placed')
+    parser.add_argument('--max-machine-length', type=int, default=None,
+                        help='only assign flying machines up to this length')
+    parser.add_argument('-o', '--output', default=None, help='write the groups to this .jsonl or binary file')
+    parser.add_argument('-r', '--render', default=None, help='render the solved geodes to this text or .html file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the timing of every geode')
+    args = parser.parse_args(argv)
+
+    with open_corpus(args.input) as corpus:
+        stop = None if args.limit is None else args.start + args.limit
+        report = run_batch(corpus.raw_range(args.start, stop), args.workers, args.chunk_size, args.start,
+                           collect_metrics=args.metrics is not None, cache_path=args.cache,
+                           sat_budget=args.sat_budget, assign_machines=args.assign_machines,
+                           max_machine_length=args.max_machine_length)
+        if args.render is not None:
+            # The workers only return the groups, so the blocks are read again from the corpus
+            blocks = (raw if isinstance(raw, np.ndarray) else blocks_from_lines(raw)
+                      for raw in corpus.raw_range(args.start, stop))
+            group_grids = (np.array(result.group_grid) for result in report.results)
+            grids = ((f'Geode {result.index}', with_bridges(block_grid, group_grid), group_grid)
+                     for result, block_grid, group_grid in zip(report.results, blocks, group_grids)
+                     if not result.failed)
+            with open(args.render, 'w') as render_file:
+                write_rendered(render_file, render_batch(grids, style=style_for_path(args.render)))
+    if args.output is not None:
+        with ResultWriter(args.output) as writer:
+            for result in report.results:
+                if result.failed:
+                    continue
+                writer.write(result.index, np.array(result.group_grid), result.group_sizes)
+    if args.verbose:
+        sys.stdout.write(''.join(f'Geode {result.index} took {result.seconds:3.2f} seconds, '
+                                 f'{len(result.group_sizes)} groups\n' for result in report.results))
+    sys.stdout.write(''.join(f'Geode {result.index} failed: {result.error}\n'
+                             for result in report.results if result.failed))
+    print(report.summary())
+    if args.assign_machines:
+        machines = [machine for result in report.results if not result.failed for machine in result.machines]
+        print(f'Assigned a flying machine to {sum(machine is not None for machine in machines)} of {len(machines)} '
+              f'groups, moving {sum(result.machine_blocks for result in report.results)} blocks')
+    if args.metrics is not None:
+        records = [result.metrics for result in report.results if result.metrics is not None]
+        with open(args.metrics, 'w') as metrics_file:
+            write_jsonl(records, metrics_file)
+        totals = aggregate(records)
+        print(', '.join(f'{name}: {value:.3f}' if isinstance(value, float) else f'{name}: {value}'
+                        for name, value in totals.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import io
+import mmap
+import os
+import struct
+from typing import BinaryIO, Iterable, Iterator, Union
+
+import numpy as np
+
+from src.Analyzers.geode import Geode
+from src.Enums.geode_enum import GeodeEnum
+from src.grid_reader import GeodeCorpus, GeodeSource
+
+# Layout of a binary corpus, all numbers little endian:
+#   header:       magic, format version, number of geodes
+#   offset table: for every geode the byte offset of its cells, and its number of rows and columns
+#   cells:        for every geode its block types in row major order, 2 bits per cell, 4 cells per byte with the
+#                 first cell in the lowest bits
+MAGIC = b'GEOD'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxI')
+OFFSET_TABLE_ENTRY = np.dtype([('offset', '<u8'), ('rows', '<u2'), ('cols', '<u2')])
+
+CELLS_PER_BYTE = 4
+BITS_PER_CELL = 2
+
+# Block type for every character of the text format, anything unknown is air
+_CHAR_TO_BLOCK = np.zeros(256, dtype=np.int8)
+_CHAR_TO_BLOCK[ord('.')] = GeodeEnum.PUMPKIN.int_value
+_CHAR_TO_BLOCK[ord('#')] = GeodeEnum.OBSIDIAN.int_value
+
+
+def blocks_from_lines(lines: list[str]) -> np.ndarray:
+    """
+    Converts the lines of a geode in the text format to a grid of integer block types, without creating cells
+    :param lines: The lines of one geode, every cell is two characters wide
+    :return: A 2D int8 array of the int values of GeodeEnum
+    """
+    rows = [line.rstrip('\r\n')[::2].encode() for line in lines]
+    block_grid = np.zeros((len(rows), max(map(len, rows))), dtype=np.int8)
+    for row, chars in enumerate(rows):
+        block_grid[row, :len(chars)] = _CHAR_TO_BLOCK[np.frombuffer(chars, dtype=np.uint8)]
+    return block_grid
+
+
+def pack_blocks(block_grid: np.ndarray) -> bytes:
+    # 4 cells per byte, padded with air
+    cells = np.asarray(block_grid, dtype=np.uint8).ravel()
+    cells = np.pad(cells, (0, -len(cells) % CELLS_PER_BYTE)).reshape(-1, CELLS_PER_BYTE)
+    packed = np.zeros(len(cells), dtype=np.uint8)
+    for position in range(CELLS_PER_BYTE):
+        packed |= cells[:, position] << (position * BITS_PER_CELL)
+    return packed.tobytes()
+
+
+def unpack_blocks(packed: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    cells = np.empty((len(packed), CELLS_PER_BYTE), dtype=np.int8)
+    for position in range(CELLS_PER_BYTE):
+        cells[:, position] = (packed >> (position * BITS_PER_CELL)) & 0b11
+    return cells.ravel()[:rows * cols].reshape(rows, cols)
+
+
+def write_binary_corpus(block_grids: Iterable[np.ndarray], destination: Union[str, os.PathLike, BinaryIO]):
+    """
+    Writes geodes to a binary corpus
+    :param block_grids: The integer block types of every geode
+    :param destination: A path, or a seekable file object opened in binary mode
+    """
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as file:
+            write_binary_corpus(block_grids, file)
+        return
+
+    block_grids = block_grids if isinstance(block_grids, (list, tuple)) else list(block_grids)
+    table = np.zeros(len(block_grids), dtype=OFFSET_TABLE_ENTRY)
+    start = destination.tell()
+    offset = HEADER.size + table.nbytes
+
+    # The offset table is written after the cells, once all offsets are known
+    destination.write(HEADER.pack(MAGIC, VERSION, len(block_grids)))
+    destination.write(table.tobytes())
+    for entry, block_grid in zip(table, block_grids):
+        packed = pack_blocks(block_grid)
+        entry['offset'] = offset
+        entry['rows'], entry['cols'] = np.shape(block_grid)
+        destination.write(packed)
+        offset += len(packed)
+    end = destination.tell()
+    destination.seek(start + HEADER.size)
+    destination.write(table.tobytes())
+    destination.seek(end)
+
+
+def convert_text_corpus(source: GeodeSource, destination: Union[str, os.PathLike, BinaryIO]):
+    """
+    Converts a geode file in the text format to a binary corpus
+    :param source: A path, or a file object of the text file
+    :param destination: A path, or a seekable file object opened in binary mode
+    """
+    with GeodeCorpus(source) as corpus:
+        write_binary_corpus([blocks_from_lines(lines) for lines in corpus.raw_range()], destination)
+
+
+def is_binary_corpus(path: Union[str, os.PathLike]) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class BinaryGeodeCorpus:
+    """
+    Random access to the geodes of a binary corpus.
+
+    The file is memory mapped, and only the header and the offset table are read when it is opened. The cells of a
+    geode are decoded straight into the block grid that Geode works on.
+    """
+
+    def __init__(self, source: Union[str, os.PathLike, BinaryIO]):
+        """
+        :param source: A path, or a file object opened in binary mode
+        """
+        self._file = None
+        self._mmap = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = source = open(source, 'rb')
+        try:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data = self._mmap
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # Not backed by a file on disk, e.g. a BytesIO
+            self._data = source.read()
+
+        if len(self._data) < HEADER.size:
+            raise ValueError('Not a binary geode corpus: the file is too short')
+        magic, version, count = HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError(f'Not a binary geode corpus: expected {MAGIC!r}, got {magic!r}')
+        if version != VERSION:
+            raise ValueError(f'Unsupported binary geode corpus version {version}, expected {VERSION}')
+        self._table = np.frombuffer(self._data, dtype=OFFSET_TABLE_ENTRY, count=count, offset=HEADER.size)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def shape(self, index: int) -> tuple[int, int]:
+        entry = self._table[index]
+        return int(entry['rows']), int(entry['cols'])
+
+    def blocks(self, index: int) -> np.ndarray:
+        """
+        :param index: The position of the geode in the corpus
+        :return: The integer block types of the geode
+        """
+        offset, rows, cols = self._table[index].tolist()
+        packed = np.frombuffer(self._data, dtype=np.uint8, count=-(-rows * cols // CELLS_PER_BYTE), offset=offset)
+        return unpack_blocks(packed, rows, cols)
+
+    def __getitem__(self, index: int) -> Geode:
+        return Geode.from_blocks(self.blocks(index))
+
+    def raw_range(self, start: int = 0, stop: int = None) -> Iterator[np.ndarray]:
+        # Yields the block grids of the geodes in the range, which are cheap to send to other processes
+        for index in range(*slice(start, stop).indices(len(self))):
+            yield self.blocks(index)
+
+    def range(self, start: int = 0, stop: int = None) -> Iterator[Geode]:
+        for block_grid in self.raw_range(start, stop):
+            yield Geode.from_blocks(block_grid)
+
+    def __iter__(self) -> Iterator[Geode]:
+        return self.range()
+
+    def close(self):
+        # The table is a view on the mapping, so it has to go first
+        self._table = self._table[:0].copy()
+        self._data = b''
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'BinaryGeodeCorpus':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_corpus(path: Union[str, os.PathLike]) -> Union[GeodeCorpus, BinaryGeodeCorpus]:
+    # Opens a geode file in either format
+    return BinaryGeodeCorpus(path) if is_binary_corpus(path) else GeodeCorpus(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a geode file in the text format to a binary corpus')
+    parser.add_argument('source', help='the geode file in the text format')
+    parser.add_argument('destination', help='the binary corpus to write')
+    args = parser.parse_args()
+    convert_text_corpus(args.source, args.destination)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,62 +3,84 @@ from __future__ import annotations
 from collections import defaultdict
 from typing import Union, Callable
 
+from src.Analyzers.grid_topology import grid_topology
 from src.Enums.geode_enum import GeodeEnum
+from src.renderer import ansi_palette
 
-import colorama
+# Shared by all cells, instead of a new float object per cell
+INF = float('inf')
 
-bad_colors = ['BLACK', 'WHITE', 'LIGHTBLACK_EX', 'RESET']
-codes = vars(colorama.Back)
-colors = [codes[color] for color in codes if color not in bad_colors]
+
+def _infinite_distance() -> float:
+    # Module level instead of a lambda, so cells with distances can still be pickled
+    return INF
+
+
+def link_neighbours(grid: list[list[Cell]]):
+    # Gives every cell of the grid its neighbours in one pass, in the order up, left, down, right
+    cells = [cell for row in grid for cell in row]
+    for cell, neighbours in zip(cells, grid_topology(len(grid), len(grid[0])).neighbours):
+        cell._neighbours = tuple(cells[neighbour] for neighbour in neighbours)
 
 
 class Cell:
+    # Geodes hold hundreds of cells, so they don't get a __dict__
+    __slots__ = ('row', 'col', 'group_nr', 'projected_block', 'average_block_distance', 'reachable_pumpkins',
+                 '_shortest_path_dict', '_neighbours')
 
     def __init__(self, row: int, col: int, projected_block: GeodeEnum):
         self.row = row
         self.col = col
         self.group_nr = -1
         self.projected_block = projected_block
-        self.shortest_path_dict: dict[Cell, Union[int, float]] = defaultdict(lambda: float('inf'))
-        self.average_block_distance: float = float('inf')
+        self.average_block_distance: float = INF
         self.reachable_pumpkins: int = 0
-        self._neighbours: list[Cell] = None
+        # Both are only allocated when they are used
+        self._shortest_path_dict: dict[Cell, Union[int, float]] = None
+        self._neighbours: tuple[Cell, ...] = None
 
-    def neighbours(self, grid: list[list[Cell]]):
-        if not self._neighbours:
-            row_len = len(grid)
-            col_len = len(grid[0])
-
-            self._neighbours = [grid[self.row + row_][self.col + col_]
-                    for row_, col_ in [(-1, 0), (0, -1), (1, 0), (0, 1)]
-                    if 0 <= self.row + row_ < row_len and 0 <= self.col + col_ < col_len]
+    @property
+    def shortest_path_dict(self) -> dict[Cell, Union[int, float]]:
+        if self._shortest_path_dict is None:
+            self._shortest_path_dict = defaultdict(_infinite_distance)
+        return self._shortest_path_dict
+
+    def neighbours(self, grid: list[list[Cell]]) -> tuple[Cell, ...]:
+        # A cell in a 1x1 grid has no neighbours, so check for None rather than for an empty tuple
+        if self._neighbours is None:
+            link_neighbours(grid)
         return self._neighbours
 
     def projected_str(self) -> str:
         return self.projected_block.pretty_print
 
     def group_str(self) -> str:
-        color = colorama.Back.RESET if self.group_nr == -1 else colors[self.group_nr % len(colors)]
+        palette = ansi_palette()
+        color = palette.reset if self.group_nr == -1 else palette.groups[self.group_nr % len(palette.groups)]
         val = self.group_nr if self.projected_block == GeodeEnum.PUMPKIN else '  '
-        return f'{color}{val:02}{colorama.Back.RESET}'
+        return f'{color}{val:02}{palette.reset}'
 
     def merged_str(self) -> str:
         return self.group_str() if self.group_nr != -1 else self.projected_str()
 
     def distance_str(self, cell: Cell) -> str:
-        color = colorama.Back.BLACK \
-            if self.shortest_path_dict[cell] == float('inf') \
-            else colors[self.shortest_path_dict[cell] % len(colors)]
-        return f'{color}{self.shortest_path_dict[cell]:03}{colorama.Back.RESET}'
+        # Unknown distances are not stored, so printing doesn't fill the dictionary
+        distance = self._shortest_path_dict.get(cell, INF) if self._shortest_path_dict else INF
+        palette = ansi_palette()
+        color = palette.black \
+            if distance == float('inf') \
+            else palette.groups[distance % len(palette.groups)]
+        return f'{color}{distance:03}{palette.reset}'
 
     def isolation_str(self) -> str:
         if self.projected_block in [GeodeEnum.AIR]:
             return '   '
-        color = colorama.Back.BLACK \
+        palette = ansi_palette()
+        color = palette.black \
             if self.average_block_distance == float('inf') \
-            else colors[int(self.average_block_distance) % len(colors)]
+            else palette.groups[int(self.average_block_distance) % len(palette.groups)]
         val = float('inf') if self.average_block_distance == float('inf') else int(self.average_block_distance)
-        return f'{color}{val:03}{colorama.Back.RESET}'
+        return f'{color}{val:03}{palette.reset}'
 
     @property
     def has_group(self):
@@ -0,0 +1,182 @@
+import argparse
+import sys
+import time
+
+# The commands are started as short-lived processes, so this module only imports what parsing the arguments needs.
+# Every command imports its own dependencies: numpy and the geode for every command that solves or renders, z3 and
+# colorama only for the commands that use them
+
+# Contains 93 pumpkins
+# This is the main direction in Ilmango's tutorial video
+TUTORIAL_GRID = '''00000000000000000
+00000000p00000000
+0000000pop0000000
+000000pooop0p0000
+00000ppoop0pop000
+000ppoppopppop000
+00popppoopoppp000
+00poooppp0p0pop00
+0poopppoppop0pop0
+0poopppp00p0pop00
+00ppooop0pp00p000
+00popppppooppp000
+000p00poppppoop00
+0000000ppoppop000
+000000ppppopop000
+00000poooopop0000
+000000ppoopp00000
+00000000pp0000000
+00000000000000000'''
+
+# The commands that pass their arguments on to the main function of another module
+DELEGATED = {
+    'batch': 'src.batch_runner',
+    'machines': 'src.machine_catalog',
+    'volumes': 'src.geode_volume',
+    'placement': 'benchmarks.placement_benchmark',
+    'memory': 'benchmarks.memory_benchmark',
+    'imports': 'benchmarks.import_benchmark',
+}
+
+
+def _tutorial_blocks():
+    import numpy as np
+    # The grid uses 0 for air, p for pumpkins and o for obsidian, in the order of the int values of GeodeEnum
+    return np.array([['0po'.index(char) for char in line] for line in TUTORIAL_GRID.splitlines()], dtype=np.int8)
+
+
+def solve(args: argparse.Namespace):
+    from src.binary_corpus import open_corpus
+    from src.grid_reader import DEFAULT_GEODE_FILE
+    from src.renderer import init_terminal, render_batch, style_for_path, write_rendered
+    from src.result_writer import ResultWriter
+
+    if args.print:
+        init_terminal()
+    writer = ResultWriter(args.output) if args.output is not None else None
+    rendered = []
+    with open_corpus(args.input or DEFAULT_GEODE_FILE) as corpus:
+        stop = None if args.limit is None else args.start + args.limit
+        for i, geode in enumerate(corpus.range(args.start, stop), args.start):
+            start = time.time()  # Doesn't include geode instantiation but that should be negligible
+            geode.heuristic_placement()
+            if writer is not None:
+                writer.write(i, geode.group_grid, [len(group.cells) for group in geode.groups.values()])
+            if args.render is not None:
+                rendered.append((f'Geode {i}', geode.block_grid.copy(), geode.group_grid.copy()))
+            if args.print:
+                sys.stdout.write(f'Geode {i} took {(time.time() - start):3.2f} seconds\n'
+                                 'Group sizes:\n'
+                                 + ''.join(f'{group.group_nr:02}: {len(group.cells)}\n'
+                                           for group in geode.groups.values()))
+                geode.pretty_print_merged()
+
+    if writer is not None:
+        writer.close()
+    if args.render is not None:
+        with open(args.render, 'w') as render_file:
+            write_rendered(render_file, render_batch(rendered, style=style_for_path(args.render)))
+
+
+def sat(args: argparse.Namespace):
+    from src.Analyzers.geode import Geode
+    from src.binary_corpus import open_corpus
+    from src.grid_reader import DEFAULT_GEODE_FILE
+    from src.seeded_sat_solver import solve_seeded
+
+    if args.index is None:
+        geode = Geode.from_blocks(_tutorial_blocks())
+    else:
+        with open_corpus(args.input or DEFAULT_GEODE_FILE) as corpus:
+            geode = corpus[args.index]
+    solution = solve_seeded(geode, args.budget)
+    print(f'{solution.groups} groups covering {solution.covered_pumpkins} pumpkins, from the {solution.source} '
+          f'{"(optimal) " if solution.optimal else ""}in {solution.seconds:.2f} seconds')
+    if args.print:
+        from src.renderer import init_terminal
+        init_terminal()
+        geode.pretty_print_merged()
+
+
+def render(args: argparse.Namespace):
+    import numpy as np
+    from src.binary_corpus import blocks_from_lines, open_corpus
+    from src.grid_reader import DEFAULT_GEODE_FILE
+    from src.renderer import ANSI, init_terminal, render_batch, style_for_path, with_bridges, write_rendered
+    from src.result_writer import read_results
+
+    grids = []
+    with open_corpus(args.input or DEFAULT_GEODE_FILE) as corpus:
+        for result in read_results(args.results):
+            raw = next(corpus.raw_range(result.index, result.index + 1))
+            block_grid = raw if isinstance(raw, np.ndarray) else blocks_from_lines(raw)
+            grids.append((f'Geode {result.index}', with_bridges(block_grid, result.group_grid), result.group_grid))
+
+    if args.output is None:
+        init_terminal()
+        write_rendered(sys.stdout, render_batch(grids, args.mode, ANSI))
+        return
+    with open(args.output, 'w') as render_file:
+        write_rendered(render_file, render_batch(grids, args.mode, style_for_path(args.output)))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Place the groups of pumpkin geodes')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = commands.add_parser('solve', help='place the groups with the heuristic')
+    solve_parser.add_argument('input', nargs='?', default=None,
+                              help='the geode file, in the text or the binary format. Defaults to geodes.txt')
+    solve_parser.add_argument('-s', '--start', type=int, default=0, help='the first geode to solve')
+    solve_parser.add_argument('-n', '--limit', type=int, default=None, help='only solve n geodes')
+    solve_parser.add_argument('-p', '--print', action='store_true', help='print the timings, group sizes and grids')
+    solve_parser.add_argument('-o', '--output', default=None, help='write the groups to this .jsonl or binary file')
+    solve_parser.add_argument('-r', '--render', default=None, help='render the geodes to this text or .html file')
+    solve_parser.set_defaults(run=solve)
+
+    sat_parser = commands.add_parser('sat', help='improve on the heuristic of one geode with the SAT model')
+    sat_parser.add_argument('index', nargs='?', type=int, default=None,
+                            help='the geode to solve, the geode of the tutorial if not given')
+    sat_parser.add_argument('-i', '--input', default=None, help='the geode file. Defaults to geodes.txt')
+    sat_parser.add_argument('-t', '--budget', type=float, default=10.0, help='seconds for the search')
+    sat_parser.add_argument('-p', '--print', action='store_true', help='print the best groups')
+    sat_parser.set_defaults(run=sat)
+
+    render_parser = commands.add_parser('render', help='render the groups of a result file')
+    render_parser.add_argument('results', help='the .jsonl or binary file with the groups')
+    render_parser.add_argument('-i', '--input', default=None,
+                               help='the geode file that was solved. Defaults to geodes.txt')
+    render_parser.add_argument('-o', '--output', default=None,
+                               help='the text or .html file to write, the terminal if not given')
+    render_parser.add_argument('-m', '--mode', choices=('merged', 'groups', 'projection'), default='merged',
+                               help='what to show of every geode')
+    render_parser.set_defaults(run=render)
+
+    # These commands parse their own arguments, so their modules are only imported when they run
+    commands.add_parser('batch', add_help=False, help='solve the geodes in parallel, see batch -h')
+    commands.add_parser('machines', add_help=False,
+                        help='count the flying machines that fit the groups of solved geodes, see machines -h')
+    commands.add_parser('volumes', add_help=False,
+                        help='solve 3D geodes along every axis and pick the best axis, see volumes -h')
+    bench_parser = commands.add_parser('bench', help='run a benchmark')
+    bench_parser.add_argument('benchmark', choices=('placement', 'memory', 'imports'),
+                              help='the benchmark to run, the other arguments are passed on to it')
+    return parser
+
+
+def main(argv: list[str] = None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    delegated = DELEGATED.get(args.benchmark if args.command == 'bench' else args.command)
+    if delegated is None:
+        if rest:
+            parser.error(f'unrecognized arguments: {" ".join(rest)}')
+        args.run(args)
+        return
+
+    from importlib import import_module
+    import_module(delegated).main(rest)
+
+
+if __name__ == '__main__':
+    main()
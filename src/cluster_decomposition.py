@@ -0,0 +1,154 @@
+import os
+import time
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import Pool
+from typing import Optional
+
+import numpy as np
+
+from src.Analyzers.geode import AIR, NO_GROUP, PUMPKIN, Geode
+from src.sat_pumpkin_solver import BooleanPumpkinModel
+from src.seeded_sat_solver import SeededSolution, _compact_groups, _covered_pumpkins, minimise_groups
+
+# Marks cells in the input of a cluster model that can't hold a blanket
+_NO_BLANKET = 'o'
+
+
+@dataclass
+class ClusterProblem:
+    # The position of the cluster in the list of clusters of the geode
+    index: int
+    # The part of the geode grid that holds the cluster and the air around it
+    rows: slice
+    cols: slice
+    # The input of the SAT model, with every cell that the cluster may not use marked as obsidian
+    input_: str
+    # The heuristic's groups inside the cluster, numbered from 0, in the coordinates of the input
+    hint_grid: np.ndarray
+    # The number of groups the heuristic used for the cluster
+    heuristic_groups: int
+
+
+@dataclass
+class ClusterSolution:
+    index: int
+    # The groups of the cluster in the coordinates of its input, or None if the solver didn't beat the heuristic
+    group_grid: Optional[np.ndarray]
+    # Whether it is proven that no solution with fewer groups exists
+    optimal: bool
+
+
+def split_clusters(geode: Geode, clusters: set[frozenset[int]]) -> list[ClusterProblem]:
+    """
+    Splits a geode into its clusters, the groups of pumpkins and bridges that can reach each other, and builds an
+    independent SAT problem for each. The geode must have the groups of the heuristic.
+
+    Besides its own pumpkins and bridges, a cluster may put blankets on the air next to its pumpkins, but only where
+    that air doesn't touch a cell that another cluster may use. Blankets of different clusters can then never touch
+    and stick together, so the solutions of the clusters can be combined without checking them again
+    :param geode: The geode, with the groups that the heuristic placed
+    :param clusters: The clusters of the geode before any groups were placed
+    :return: A problem for every cluster, in the order of their first cell
+    """
+    rows, cols = geode.rows, geode.cols
+    blocks = geode.block_grid.ravel()
+    # Every pair of neighbouring cells, as the cell and its neighbour
+    sources, indices = geode.topology.sources, geode.topology.indices
+
+    clusters = sorted((sorted(cluster) for cluster in clusters), key=lambda cluster: cluster[0])
+
+    # The cluster that can use each cell. Air next to a pumpkin touches only one cluster, since air that touches
+    # two pumpkins is a bridge, and a bridge joins the clusters of its pumpkins
+    owner = np.full(rows * cols, -1, dtype=np.int32)
+    for cluster_nr, cluster in enumerate(clusters):
+        owner[cluster] = cluster_nr
+    next_to_pumpkin = (blocks[sources] == PUMPKIN) & (owner[sources] != -1) & (blocks[indices] == AIR)
+    owner[indices[next_to_pumpkin]] = owner[sources[next_to_pumpkin]]
+
+    # Pumpkins and bridges of different clusters never touch, so only air can touch a cell of another cluster
+    foreign = (owner[indices] != -1) & (owner[indices] != owner[sources])
+    touches_foreign = np.bincount(sources, weights=foreign, minlength=rows * cols) > 0
+    usable = (owner != -1) & ((blocks != AIR) | ~touches_foreign)
+
+    problems = []
+    usable_grid = usable.reshape(rows, cols)
+    owner_grid = owner.reshape(rows, cols)
+    for cluster_nr in range(len(clusters)):
+        cells = usable_grid & (owner_grid == cluster_nr)
+        filled_rows = np.flatnonzero(cells.any(axis=1))
+        filled_cols = np.flatnonzero(cells.any(axis=0))
+        row_slice = slice(int(filled_rows[0]), int(filled_rows[-1]) + 1)
+        col_slice = slice(int(filled_cols[0]), int(filled_cols[-1]) + 1)
+
+        cropped_cells = cells[row_slice, col_slice]
+        cropped_blocks = geode.block_grid[row_slice, col_slice]
+        input_ = '\n'.join(''.join(('p' if block == PUMPKIN else '0') if usable_cell else _NO_BLANKET
+                                   for block, usable_cell in zip(block_row, cells_row))
+                           for block_row, cells_row in zip(cropped_blocks.tolist(), cropped_cells.tolist()))
+        hint_grid = _compact_groups(np.where(cropped_cells, geode.group_grid[row_slice, col_slice], NO_GROUP))
+        problems.append(ClusterProblem(cluster_nr, row_slice, col_slice, input_, hint_grid, int(hint_grid.max()) + 1))
+    return problems
+
+
+def solve_cluster(problem: ClusterProblem, deadline: float) -> ClusterSolution:
+    """
+    Searches for a solution of a cluster with fewer groups than the heuristic. Runs in the worker processes
+    :param problem: The cluster
+    :param deadline: The time.time() at which to stop
+    """
+    if problem.heuristic_groups <= 1:
+        # There is nothing to improve on, no solution of the cluster has fewer groups than one
+        return ClusterSolution(problem.index, None, True)
+    model = BooleanPumpkinModel(problem.input_, max_groups=problem.heuristic_groups - 1)
+    group_grid, proven = minimise_groups(model, deadline, problem.hint_grid)
+    # Without a solution of the solver the heuristic's groups are used, which the proof says nothing about
+    return ClusterSolution(problem.index, group_grid, proven and group_grid is not None)
+
+
+def solve_decomposed(geode: Geode, time_budget: float, workers: Optional[int] = None) -> SeededSolution:
+    """
+    Solves a geode with the heuristic, and then tries to improve on every cluster with a separate SAT model.
+    Solver time grows much faster than the size of the model, so several small models are solved much sooner than
+    one model of the whole geode. The clusters are solved in parallel, and their groups are numbered again in the
+    order of the clusters
+    :param geode: The geode to solve. Its groups are replaced with the best solution that was found
+    :param time_budget: The wall clock time in seconds for the heuristic and the SAT search together
+    :param workers: The number of worker processes. Defaults to the number of cores, 1 solves in this process
+    :return: The combined solution, which is optimal if the solution of every cluster is
+    """
+    start = time.perf_counter()
+    deadline = time.time() + time_budget
+    # The clusters are those of the geode without groups, the heuristic splits them up as it places groups
+    geode.reset_groups()
+    clusters = geode.clusters
+    geode.heuristic_placement()
+    problems = split_clusters(geode, clusters)
+
+    solve = partial(solve_cluster, deadline=deadline)
+    workers = min(workers or os.cpu_count() or 1, len(problems)) or 1
+    if workers == 1:
+        solutions = list(map(solve, problems))
+    else:
+        with Pool(workers) as pool:
+            # The largest clusters take the longest, so they go first
+            solutions = pool.map(solve, sorted(problems, key=lambda problem: -len(problem.input_)), chunksize=1)
+
+    group_grid = np.full((geode.rows, geode.cols), NO_GROUP, dtype=np.int16)
+    groups = 0
+    improved = False
+    for solution in sorted(solutions, key=lambda solution: solution.index):
+        problem = problems[solution.index]
+        cluster_grid = problem.hint_grid if solution.group_grid is None else solution.group_grid
+        improved |= solution.group_grid is not None
+        target = group_grid[problem.rows, problem.cols]
+        target[cluster_grid != NO_GROUP] = cluster_grid[cluster_grid != NO_GROUP] + groups
+        groups += int(cluster_grid.max()) + 1
+
+    geode.load_groups(group_grid)
+    return SeededSolution(group_grid,
+                          groups,
+                          _covered_pumpkins(geode.block_grid, group_grid),
+                          'sat' if improved else 'heuristic',
+                          all(solution.optimal for solution in solutions),
+                          time.perf_counter() - start)
@@ -3,34 +3,9 @@ from enum import Enum
 from src.Enums.data_annotations import DataPrimitive
 
 
-class _FlyingMachineDP(DataPrimitive):
-
-    @staticmethod
-    def new(footprint: list[list[bool]], *,
-            pretty_print: str):
-        return ()
-
-
-class FlyingMachineEnum(Enum):
-    @_FlyingMachineDP
-    def __new__(cls, footprint: list[list[bool]], pretty_print: str):
-        obj = object.__new__(cls)
-        obj._value_ = name
-        obj.canon_name = name
-        obj.footprint =
-        obj.int_value = int_value
-        obj.pretty_print = pretty_print
-        return obj
-
-    MANGO_MACHINE = _FlyingMachineDP(
-        footprint = [[True, True,]],
-        pushed_blocks
-    )
-
-
 class Axis(Enum):
-    Horizontal = 0,
-    Vertical = 1,
+    Horizontal = 0
+    Vertical = 1
 
 
 class FlyingMachine:
@@ -72,7 +47,7 @@ class FlyingMachine:
         self.pulled_blocks: dict[int, int] = pulled_blocks
 
 
-FlyingMachine(
+MANGO_MACHINE = FlyingMachine(
     name = 'MangoMachine',
     axes = [Axis.Horizontal, Axis.Vertical],
     uses_qc = False,
@@ -86,7 +61,7 @@ FlyingMachine(
     attached_blocks = {1: 6},
     )
 
-FlyingMachine(
+MANGO_MACHINE_ATTACHED = FlyingMachine(
     name = 'MangoMachineAttached',
     axes = [Axis.Horizontal, Axis.Vertical],
     uses_qc = False,
@@ -99,7 +74,7 @@ FlyingMachine(
     attached_blocks = {1: 2, 2: 6},
 )
 
-FlyingMachine(
+L_SHAPE_DOUBLE_PUSHER = FlyingMachine(
     name = 'LShapeDoublePusher',
     axes = [Axis.Horizontal, Axis.Vertical],
     uses_qc = True,
@@ -120,12 +95,13 @@ FlyingMachine(
     attached_blocks = {1: 6, 2: 1},
 )
 
-FlyingMachine(
+SINGLE_COLUMN_PUSHER = FlyingMachine(
     name = 'SingleColumnPusher',
     axes = [Axis.Horizontal],
     uses_qc = True,
     tileable = False,  # Technically it is tileable, but it's beyond stupid to use the machine in that scenario
     length = 10,
+    trigger_delay = 0,
     engine_footprint = [[True],
                         [True],
                         [False],
@@ -137,15 +113,45 @@ FlyingMachine(
     attached_blocks = {1: 2},
 )
 
-FlyingMachine(
+SINGLE_COLUMN_PUSHER_SIDEWAYS = FlyingMachine(
     name='SingleColumnPusherSideways',
     axes = [Axis.Horizontal],
     uses_qc = True,
     tileable = True,  # For this machine, if you mirror it, there are scenarios where tiling is not stupid
     length = 10,
+    trigger_delay = 0,
     engine_footprint = [[False, True, True],
                         [True, False, False]],
     attached_blocks_footprints = {1: [[False, False, True],
                                      [False, False, False]]},
     attached_blocks = {1: 2},
 )
+
+
+class _FlyingMachineDP(DataPrimitive):
+
+    @staticmethod
+    def new(machine: FlyingMachine):
+        return ()
+
+
+class FlyingMachineEnum(Enum):
+    @_FlyingMachineDP
+    def __new__(cls, machine: FlyingMachine):
+        obj = object.__new__(cls)
+        obj._value_ = machine.name
+        obj.canon_name = machine.name
+        obj.machine = machine
+        obj.footprint = machine.engine_footprint
+        return obj
+
+    MANGO_MACHINE = _FlyingMachineDP.new(
+        machine=MANGO_MACHINE)
+    MANGO_MACHINE_ATTACHED = _FlyingMachineDP.new(
+        machine=MANGO_MACHINE_ATTACHED)
+    L_SHAPE_DOUBLE_PUSHER = _FlyingMachineDP.new(
+        machine=L_SHAPE_DOUBLE_PUSHER)
+    SINGLE_COLUMN_PUSHER = _FlyingMachineDP.new(
+        machine=SINGLE_COLUMN_PUSHER)
+    SINGLE_COLUMN_PUSHER_SIDEWAYS = _FlyingMachineDP.new(
+        machine=SINGLE_COLUMN_PUSHER_SIDEWAYS)
@@ -0,0 +1,204 @@
+import argparse
+import os
+import sys
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from src.Analyzers.geode import AIR, NO_GROUP, OBSIDIAN, PUMPKIN
+
+# Block types of a volume. Everything that isn't air or budding amethyst, like amethyst blocks, calcite and basalt,
+# is solid: clusters don't grow into it
+VOLUME_AIR = 0
+BUDDING = 1
+SOLID = 2
+
+# The axes of a volume, in the order of its array dimensions. Every projection keeps the other two dimensions in order
+AXES = ('x', 'y', 'z')
+
+# Offsets of the six face neighbours of a cell, clusters can grow on every face of a budding amethyst
+_FACE_OFFSETS = ((-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1))
+
+
+class AxisResult(NamedTuple):
+    axis: str
+    # The projection along the axis, and the groups that were placed on it
+    block_grid: np.ndarray
+    group_grid: np.ndarray
+    group_sizes: list[int]
+    pumpkins: int
+    covered: int
+    seconds: float
+    # The exception that solving the projection raised, as text. The projection has no groups then
+    error: Optional[str] = None
+
+    @property
+    def groups(self) -> int:
+        return len(self.group_sizes)
+
+    @property
+    def coverage(self) -> float:
+        # The part of the pumpkins that is in a group, a projection without pumpkins needs nothing
+        return self.covered / self.pumpkins if self.pumpkins else 1.0
+
+    @property
+    def rank(self) -> tuple[bool, float, int]:
+        # Axes that failed last, then the most coverage first, and then the fewest groups. Ties keep the order of AXES
+        return self.error is not None, -self.coverage, self.groups
+
+
+def cluster_sites(volume: np.ndarray) -> np.ndarray:
+    """
+    :param volume: The block types of a geode, VOLUME_AIR, BUDDING or SOLID for every cell
+    :return: For every cell, whether an amethyst cluster can grow in it: air on a face of a budding amethyst
+    """
+    padded = np.pad(volume == BUDDING, 1)
+    shape = volume.shape
+    touches_budding = np.zeros(shape, dtype=bool)
+    for offset in _FACE_OFFSETS:
+        touches_budding |= padded[tuple(slice(1 + delta, 1 + delta + size) for delta, size in zip(offset, shape))]
+    return touches_budding & (volume == VOLUME_AIR)
+
+
+def _crop(block_grid: np.ndarray) -> np.ndarray:
+    # Only the part with blocks, with a border of air like the geodes of the geode file
+    filled_rows = np.flatnonzero((block_grid != AIR).any(axis=1))
+    filled_cols = np.flatnonzero((block_grid != AIR).any(axis=0))
+    if not filled_rows.size:
+        return np.zeros((1, 1), dtype=np.int8)
+    cropped = block_grid[filled_rows[0]:filled_rows[-1] + 1, filled_cols[0]:filled_cols[-1] + 1]
+    return np.pad(cropped, 1, constant_values=AIR)
+
+
+def projections(volume: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Projects a geode along each of its axes. A flying machine can't push budding amethyst, so a line with budding
+    amethyst on it is obsidian in the projection. Every other line with a cluster site on it needs to be covered,
+    which makes it a pumpkin
+    :param volume: The block types of a geode, VOLUME_AIR, BUDDING or SOLID for every cell
+    :return: The block grid of the projection along every axis, cropped to its blocks
+    """
+    volume = np.asarray(volume)
+    if volume.ndim != 3:
+        raise ValueError(f'A geode volume has 3 dimensions, not {volume.ndim}')
+    budding = volume == BUDDING
+    sites = cluster_sites(volume)
+    grids = {}
+    for axis_idx, axis in enumerate(AXES):
+        obsidian = budding.any(axis=axis_idx)
+        pumpkins = sites.any(axis=axis_idx) & ~obsidian
+        block_grid = np.full(obsidian.shape, AIR, dtype=np.int8)
+        block_grid[pumpkins] = PUMPKIN
+        block_grid[obsidian] = OBSIDIAN
+        grids[axis] = _crop(block_grid)
+    return grids
+
+
+def read_volumes(path: str) -> Iterator[tuple[str, np.ndarray]]:
+    """
+    Reads geode volumes from a numpy file: a .npy file with one volume or a stack of volumes of the same shape, or a
+    .npz file with a volume per array
+    :param path: The file to read
+    :return: The name and the block types of every volume, in the order of the file
+    """
+    if os.path.splitext(path)[1].lower() == '.npz':
+        with np.load(path) as volumes:
+            for name in volumes.files:
+                yield name, volumes[name]
+        return
+    volumes = np.load(path)
+    if volumes.ndim == 3:
+        volumes = volumes[None]
+    if volumes.ndim != 4:
+        raise ValueError(f'{path} should hold a volume or a stack of volumes, not an array of shape {volumes.shape}')
+    for index, volume in enumerate(volumes):
+        yield str(index), volume
+
+
+def solve_volumes(volumes: Iterable[np.ndarray],
+                  workers: Optional[int] = None,
+                  sat_budget: float = None) -> Iterator[list[AxisResult]]:
+    """
+    Places the groups on the projections along all three axes of every volume. The projections of all volumes are
+    solved by the same pool of worker processes, so the three axes of a volume are solved at the same time
+    :param volumes: The block types of every geode
+    :param workers: The number of worker processes. Defaults to the number of cores, 1 solves in this process
+    :param sat_budget: If given, the seconds per projection in which the SAT model tries to improve on the heuristic
+    :return: For every volume, the result of every axis from best to worst
+    """
+    from src.batch_runner import iter_batch
+
+    grids: list[np.ndarray] = []
+
+    def jobs() -> Iterator[np.ndarray]:
+        # The projections are computed as the workers ask for them, and kept to score the results
+        for volume in volumes:
+            for block_grid in projections(volume).values():
+                grids.append(block_grid)
+                yield block_grid
+
+    # Every projection is a job of its own, so the axes of a volume are spread over the workers
+    results = iter_batch(jobs(), workers, chunk_size=1, sat_budget=sat_budget)
+    axis_results = []
+    for result in results:
+        block_grid = grids[result.index]
+        if result.failed:
+            group_grid = np.full(block_grid.shape, NO_GROUP, dtype=np.int16)
+        else:
+            group_grid = np.array(result.group_grid, dtype=np.int16)
+        axis_results.append(AxisResult(AXES[len(axis_results)],
+                                       block_grid,
+                                       group_grid,
+                                       result.group_sizes,
+                                       int(np.count_nonzero(block_grid == PUMPKIN)),
+                                       int(np.count_nonzero((block_grid == PUMPKIN) & (group_grid != NO_GROUP))),
+                                       result.seconds,
+                                       result.error))
+        if len(axis_results) == len(AXES):
+            yield sorted(axis_results, key=lambda axis_result: axis_result.rank)
+            axis_results = []
+
+
+def main(argv: list[str] = None):
+    from src.renderer import render_batch, style_for_path, with_bridges, write_rendered
+    from src.result_writer import ResultWriter
+
+    parser = argparse.ArgumentParser(description='Project geode volumes along every axis and pick the best axis')
+    parser.add_argument('input', help='a .npy file with one or more volumes, or a .npz file with a volume per array')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('-t', '--sat-budget', type=float, default=None,
+                        help='seconds per projection for the SAT model to improve on the heuristic')
+    parser.add_argument('-o', '--output', default=None,
+                        help='write the groups of the best axis of every volume to this .jsonl or binary file')
+    parser.add_argument('-r', '--render', default=None,
+                        help='render the best axis of every volume to this text or .html file')
+    args = parser.parse_args(argv)
+
+    names, volumes = [], []
+    for name, volume in read_volumes(args.input):
+        names.append(name)
+        volumes.append(volume)
+    writer = ResultWriter(args.output) if args.output is not None else None
+    rendered = []
+    for index, axis_results in enumerate(solve_volumes(volumes, args.workers, args.sat_budget)):
+        best = axis_results[0]
+        sys.stdout.write(f'Volume {names[index]}: best axis {best.axis}\n'
+                         + ''.join(f'  {axis_result.axis}: failed, {axis_result.error}\n' if axis_result.error
+                                   else f'  {axis_result.axis}: {axis_result.groups} groups, {axis_result.covered} of '
+                                        f'{axis_result.pumpkins} pumpkins covered, {axis_result.seconds:.2f} seconds\n'
+                                   for axis_result in axis_results))
+        if writer is not None:
+            writer.write(index, best.group_grid, best.group_sizes)
+        if args.render is not None:
+            rendered.append((f'Volume {names[index]}, axis {best.axis}',
+                             with_bridges(best.block_grid, best.group_grid), best.group_grid))
+
+    if writer is not None:
+        writer.close()
+    if args.render is not None:
+        with open(args.render, 'w') as render_file:
+            write_rendered(render_file, render_batch(rendered, style=style_for_path(args.render)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,132 @@
-from typing import IO, Iterator
+import io
+import mmap
+import os
+import re
+from typing import IO, Iterator, Union
 
 from src.Analyzers.geode import Geode
 from src.Enums.geode_enum import GeodeEnum
 from src.cell import Cell
 
+DEFAULT_GEODE_FILE = 'geodes.txt'
 
-def geode_generator() -> Iterator[Geode]:
-    geode = []
-    row = 0
-    with open('geodes.txt', 'r') as geode_file:
-        while line := geode_file.readline():
-            if line == '\n':
-                yield Geode(geode)
-                geode = []
-                row = 0
-            else:
-                geode.append([Cell(row, col,
-                                   GeodeEnum.OBSIDIAN if char == '#'
-                                   else GeodeEnum.PUMPKIN if char == '.'
-                                   else GeodeEnum.AIR)
-                              for col, char in enumerate(line[:-1:2])])
-                row += 1
+# Geodes are separated by one or more blank lines
+_SEPARATOR = re.compile(rb'\r?\n(?:\r?\n)+')
+
+GeodeSource = Union[str, os.PathLike, IO]
+
+
+class GeodeCorpus:
+    """
+    Random access to the geodes of a geode file.
+
+    The file is memory mapped, and opening it only builds an index of the byte range of every geode. The lines of a
+    geode are decoded, and its cells are created, only when that geode is requested, so any geode or range of
+    geodes can be read without parsing the ones before it.
+    """
+
+    def __init__(self, source: GeodeSource = DEFAULT_GEODE_FILE):
+        """
+        :param source: A path, or a file object opened in text or binary mode
+        """
+        self._file = None
+        self._mmap = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, 'rb')
+            self._data = self._map(self._file)
+        else:
+            self._data = self._map(source)
+
+        # The start and end of every geode in the data
+        self._offsets: list[tuple[int, int]] = []
+        start = 0
+        for separator in _SEPARATOR.finditer(self._data):
+            self._add_geode(start, separator.start())
+            start = separator.end()
+        # The last geode doesn't need to be followed by a blank line
+        self._add_geode(start, len(self._data))
+
+    def _map(self, file: IO) -> Union[mmap.mmap, bytes]:
+        try:
+            if os.fstat(file.fileno()).st_size:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                return self._mmap
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # Not backed by a file on disk, e.g. a StringIO
+            pass
+        data = file.read()
+        return data.encode() if isinstance(data, str) else data
+
+    def _add_geode(self, start: int, end: int):
+        if self._data[start:end].strip():
+            self._offsets.append((start, end))
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def offsets(self, index: int) -> tuple[int, int]:
+        """
+        :param index: The position of the geode in the file
+        :return: The byte offsets of the start and end of the geode
+        """
+        return self._offsets[index]
+
+    def lines(self, index: int) -> list[str]:
+        """
+        :param index: The position of the geode in the file
+        :return: The lines of the geode, without parsing them
+        """
+        start, end = self._offsets[index]
+        return self._data[start:end].decode().splitlines()
+
+    def __getitem__(self, index: int) -> Geode:
+        return parse_geode(self.lines(index))
+
+    def raw_range(self, start: int = 0, stop: int = None) -> Iterator[list[str]]:
+        # Yields the lines of the geodes in the range, without parsing them
+        for index in range(*slice(start, stop).indices(len(self))):
+            yield self.lines(index)
+
+    def range(self, start: int = 0, stop: int = None) -> Iterator[Geode]:
+        for lines in self.raw_range(start, stop):
+            yield parse_geode(lines)
+
+    def __iter__(self) -> Iterator[Geode]:
+        return self.range()
+
+    def close(self):
+        # Release the mapping before the file it maps
+        self._data = b''
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'GeodeCorpus':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def raw_geode_generator(source: GeodeSource = DEFAULT_GEODE_FILE) -> Iterator[list[str]]:
+    # Yields the lines of each geode without parsing them, which is cheap to send to other processes
+    with GeodeCorpus(source) as corpus:
+        yield from corpus.raw_range()
+
+
+def parse_geode(lines: list[str]) -> Geode:
+    # Every cell is two characters wide
+    return Geode([[Cell(row, col,
+                        GeodeEnum.OBSIDIAN if char == '#'
+                        else GeodeEnum.PUMPKIN if char == '.'
+                        else GeodeEnum.AIR)
+                   for col, char in enumerate(line.rstrip('\r\n')[::2])]
+                  for row, line in enumerate(lines)])
+
+
+def geode_generator(source: GeodeSource = DEFAULT_GEODE_FILE) -> Iterator[Geode]:
+    for lines in raw_geode_generator(source):
+        yield parse_geode(lines)
@@ -0,0 +1,266 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from src.flying_machine import FlyingMachine
+from src.machine_catalog import MachineCatalog, MachineFits, MachineVariant, default_catalog, machine_fits
+
+# Costs are compared as one number: the blocks of a machine, with the trigger delay as the tie breaker
+DELAY_WEIGHT = 1
+BLOCK_WEIGHT = 1000
+
+# Search nodes per geode after which the best assignment so far is returned, and isn't known to be optimal
+DEFAULT_NODE_LIMIT = 100_000
+
+
+def block_cost(machine: FlyingMachine) -> int:
+    # The blocks that the machine moves besides its engine
+    return sum(machine.pushed_blocks.values()) + sum(machine.attached_blocks.values()) \
+        + sum(machine.pulled_blocks.values())
+
+
+class MachineOption(NamedTuple):
+    group_nr: int
+    variant: MachineVariant
+    row: int
+    col: int
+    cost: int
+    # The cells of the footprint as a bitboard, and the same cells with their neighbours
+    cells: int
+    halo: int
+
+    @property
+    def tileable(self) -> bool:
+        return self.variant.machine.machine.tileable
+
+
+@dataclass
+class MachineAssignment:
+    # The machine of every group, None for groups that no machine fits
+    placements: dict[int, Optional[MachineOption]] = field(default_factory=dict)
+    blocks: int = 0
+    trigger_delay: int = 0
+    # Whether the search finished, so no assignment with fewer groups without a machine, or fewer blocks, exists
+    optimal: bool = True
+    # Search nodes that were expanded
+    nodes: int = 0
+
+    @property
+    def unassigned(self) -> list[int]:
+        return [group_nr for group_nr, option in self.placements.items() if option is None]
+
+    def as_records(self) -> list[Optional[tuple]]:
+        # Plain data for every group, to send between processes or write to a file
+        return [None if option is None else (group_nr, option.variant.machine.canon_name, option.variant.axis.name,
+                                             option.variant.mirrored, option.row, option.col)
+                for group_nr, option in self.placements.items()]
+
+
+class MachineAssigner:
+    """
+    Chooses a flying machine and its anchor for every group of a solved geode, so that the machines don't overlap each
+    other, and machines that aren't tileable don't touch another machine. It first leaves as few groups without a
+    machine as possible, and then minimises the blocks the machines move, and then their trigger delays.
+
+    The candidates of every group come from machine_fits. Groups whose candidates can't interact are solved apart,
+    and every set of groups that can is solved with a depth first branch and bound: the groups with the fewest
+    candidates go first, candidates are tried from cheap to expensive, and a branch is cut when its cost plus the
+    cheapest machine of every group that is left can't beat the best assignment so far. Different choices for the
+    first groups often leave the same cells taken for the groups that are left, so the outcome of every subproblem
+    is memoised on those cells.
+    """
+
+    def __init__(self,
+                 catalog: MachineCatalog = None,
+                 max_length: int = None,
+                 max_trigger_delay: int = None,
+                 node_limit: int = DEFAULT_NODE_LIMIT):
+        """
+        :param catalog: The machines to choose from, defaults to all of them
+        :param max_length: Machines longer than this don't fit in the farm and aren't used. None for no limit
+        :param max_trigger_delay: Machines that take longer than this to trigger aren't used. None for no limit
+        :param node_limit: The search nodes per geode after which the best assignment so far is returned
+        """
+        self.catalog = catalog or default_catalog()
+        self.max_length = max_length
+        self.max_trigger_delay = max_trigger_delay
+        self.node_limit = node_limit
+        self._nodes = 0
+        self._truncated = False
+
+    def _allowed(self, machine: FlyingMachine) -> bool:
+        return ((self.max_length is None or machine.length <= self.max_length)
+                and (self.max_trigger_delay is None or machine.trigger_delay <= self.max_trigger_delay))
+
+    def options(self, fits: MachineFits, cols: int) -> dict[int, list[MachineOption]]:
+        """
+        :param fits: The anchors where every machine fits every group
+        :param cols: The number of columns of the geode
+        :return: The candidates of every group, from cheap to expensive
+        """
+        # A padding column between the rows of the bitboard keeps the neighbours of a cell from wrapping around
+        stride = cols + 1
+        options = {}
+        for group_nr in fits.group_nrs.tolist():
+            group_options = []
+            for variant, row, col in fits.placements(group_nr):
+                machine = variant.machine.machine
+                if not self._allowed(machine):
+                    continue
+                cells = 0
+                for cell_row, cell_col in variant.cells:
+                    cells |= 1 << ((row + cell_row) * stride + col + cell_col)
+                halo = cells | cells << 1 | cells >> 1 | cells << stride | cells >> stride
+                group_options.append(MachineOption(group_nr, variant, row, col,
+                                                   block_cost(machine) * BLOCK_WEIGHT
+                                                   + machine.trigger_delay * DELAY_WEIGHT,
+                                                   cells, halo))
+            group_options.sort(key=lambda option: (option.cost, option.row, option.col))
+            options[group_nr] = group_options
+        return options
+
+    @staticmethod
+    def _components(options: dict[int, list[MachineOption]]) -> list[list[int]]:
+        # Groups are connected when a candidate of one can touch a candidate of the other
+        halos = {group_nr: _union(option.halo for option in group_options)
+                 for group_nr, group_options in options.items()}
+        cells = {group_nr: _union(option.cells for option in group_options)
+                 for group_nr, group_options in options.items()}
+        components = []
+        for group_nr in options:
+            # Touching is symmetric, so the halo of one group and the cells of the other are enough
+            touching = [component for component in components
+                        if any(halos[group_nr] & cells[other] for other in component)]
+            merged = [group_nr]
+            for component in touching:
+                components.remove(component)
+                merged += component
+            components.append(merged)
+        return components
+
+    @staticmethod
+    def _compatible(option: MachineOption, taken: int, guarded: int) -> bool:
+        # Machines can't overlap, and machines that aren't tileable can't touch another machine
+        return not (option.cells & (taken | guarded) or not option.tileable and option.halo & taken)
+
+    def _greedy(self, groups: list[list[MachineOption]], skip_cost: int) -> tuple[int, list[Optional[MachineOption]]]:
+        # The cheapest candidate of every group that still fits, in order. The first bound of the search
+        taken = guarded = cost = 0
+        choices = []
+        for group_options in groups:
+            option = next((option for option in group_options if self._compatible(option, taken, guarded)), None)
+            choices.append(option)
+            if option is None:
+                cost += skip_cost
+                continue
+            cost += option.cost
+            taken |= option.cells
+            if not option.tileable:
+                guarded |= option.halo
+        return cost, choices
+
+    def _solve_component(self, groups: list[list[MachineOption]]) -> tuple[list[Optional[MachineOption]], bool]:
+        # Leaving a group without a machine costs more than the machines of all other groups together
+        skip_cost = 1 + sum(max((option.cost for option in group_options), default=0) for group_options in groups)
+        cheapest = [group_options[0].cost if group_options else skip_cost for group_options in groups]
+        # Lower bound of the groups from every depth on, and the cells that their candidates can see
+        bounds = [0] * (len(groups) + 1)
+        relevant = [0] * (len(groups) + 1)
+        for depth in range(len(groups) - 1, -1, -1):
+            bounds[depth] = bounds[depth + 1] + cheapest[depth]
+            relevant[depth] = relevant[depth + 1] | _union(option.halo for option in groups[depth])
+        # For every subproblem: True and the cheapest choices, or False and a cost that nothing in it gets below
+        memo: dict[tuple[int, int, int], tuple[bool, int, tuple]] = {}
+
+        def search(depth: int, taken: int, guarded: int, budget: int) -> Optional[tuple[int, tuple]]:
+            # The cheapest choices for the groups from depth on that cost less than the budget, if there are any
+            if depth == len(groups):
+                return 0, ()
+            if bounds[depth] >= budget:
+                return None
+            key = (depth, taken & relevant[depth], guarded & relevant[depth])
+            if (known := memo.get(key)) is not None:
+                exact, cost, choices = known
+                if exact:
+                    return (cost, choices) if cost < budget else None
+                if cost >= budget:
+                    return None
+
+            original_budget = budget
+            best = None
+            for option in groups[depth] + [None]:
+                cost = skip_cost if option is None else option.cost
+                if cost + bounds[depth + 1] >= budget:
+                    # The candidates are sorted by cost, only leaving the group without a machine can be cheaper
+                    if option is not None:
+                        continue
+                    break
+                if option is not None and not self._compatible(option, taken, guarded):
+                    continue
+                if self._nodes >= self.node_limit:
+                    self._truncated = True
+                    break
+                self._nodes += 1
+                if option is None:
+                    result = search(depth + 1, taken, guarded, budget - cost)
+                else:
+                    result = search(depth + 1,
+                                    taken | option.cells,
+                                    guarded if option.tileable else guarded | option.halo,
+                                    budget - cost)
+                if result is not None:
+                    best = cost + result[0], (option,) + result[1]
+                    budget = best[0]
+                    if budget == bounds[depth]:
+                        break
+
+            # A search that was cut off by the node limit proves nothing about the subproblem
+            if not self._truncated:
+                memo[key] = (True, *best) if best is not None else (False, original_budget, ())
+            return best
+
+        greedy_cost, greedy_choices = self._greedy(groups, skip_cost)
+        if greedy_cost == bounds[0]:
+            return greedy_choices, True
+        # Only look for assignments that are at least as cheap as the greedy one
+        result = search(0, 0, 0, greedy_cost + 1)
+        if result is None:
+            return greedy_choices, not self._truncated
+        return list(result[1]), not self._truncated
+
+    def assign(self, block_grid: np.ndarray, group_grid: np.ndarray) -> MachineAssignment:
+        """
+        :param block_grid: The integer block types of the geode
+        :param group_grid: The group number of every cell, NO_GROUP for cells without a group
+        :return: The machine and anchor of every group
+        """
+        self._nodes = 0
+        self._truncated = False
+        options = self.options(machine_fits(block_grid, group_grid, self.catalog), block_grid.shape[1])
+        assignment = MachineAssignment(placements=dict.fromkeys(options))
+        for component in self._components(options):
+            # The most constrained groups go first, so conflicts are found close to the root of the search
+            component.sort(key=lambda group_nr: (len(options[group_nr]), group_nr))
+            choices, optimal = self._solve_component([options[group_nr] for group_nr in component])
+            assignment.optimal &= optimal
+            for group_nr, option in zip(component, choices):
+                assignment.placements[group_nr] = option
+        for option in assignment.placements.values():
+            if option is not None:
+                assignment.blocks += block_cost(option.variant.machine.machine)
+                assignment.trigger_delay += option.variant.machine.machine.trigger_delay
+        assignment.nodes = self._nodes
+        return assignment
+
+
+def _union(masks) -> int:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return result
+
+
+def assign_machines(block_grid: np.ndarray, group_grid: np.ndarray, **kwargs) -> MachineAssignment:
+    # See MachineAssigner for the keyword arguments
+    return MachineAssigner(**kwargs).assign(block_grid, group_grid)
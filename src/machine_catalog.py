@@ -0,0 +1,207 @@
+import argparse
+import time
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from src.Analyzers.geode import NO_GROUP, OBSIDIAN
+from src.flying_machine import Axis, FlyingMachine, FlyingMachineEnum
+
+# Every row of a geode is a bitmask in a uint64, with bit c for column c
+MAX_COLS = 64
+
+
+class MachineVariant(NamedTuple):
+    machine: FlyingMachineEnum
+    axis: Axis
+    mirrored: bool
+    height: int
+    width: int
+    # The cells taken up by the engine and by every block it moves, as a bitmask per row of the footprint
+    rows: tuple[int, ...]
+    # The same cells as (row, column) offsets from the anchor, the top left corner of the footprint
+    cells: tuple[tuple[int, int], ...]
+
+
+def footprint_cells(machine: FlyingMachine) -> np.ndarray:
+    """
+    The blocks that are pushed, attached or pulled are in other layers than the engine, but in the projection of the
+    geode they all take up a cell
+    :return: The footprint of the engine and of every block it moves together, as a boolean grid
+    """
+    footprint = np.array(machine.engine_footprint, dtype=bool)
+    for footprints in (machine.pushed_blocks_footprints,
+                       machine.attached_blocks_footprints,
+                       machine.pulled_blocks_footprints):
+        for layer_footprint in footprints.values():
+            footprint |= np.array(layer_footprint, dtype=bool)
+    return footprint
+
+
+def orientations(footprint: np.ndarray, axes: Iterable[Axis]) -> Iterator[tuple[Axis, bool, np.ndarray]]:
+    # The footprints are defined for the horizontal axis, on the vertical axis the machine is turned a quarter. Either
+    # way, it can be mirrored
+    for axis in axes:
+        turned = footprint if axis == Axis.Horizontal else np.rot90(footprint)
+        yield axis, False, turned
+        yield axis, True, np.fliplr(turned)
+
+
+class MachineCatalog:
+    """
+    Every flying machine in every orientation it can be built in, compiled to row bitmasks once so that testing where
+    they fit is only bitwise operations. Orientations that give the same footprint, for example the mirror image of a
+    symmetric machine, are only kept once.
+    """
+
+    def __init__(self, machines: Iterable[FlyingMachineEnum] = FlyingMachineEnum):
+        self.variants: list[MachineVariant] = []
+        for machine in machines:
+            seen = set()
+            for axis, mirrored, footprint in orientations(footprint_cells(machine.machine), machine.machine.axes):
+                rows = tuple(sum(1 << col for col in np.flatnonzero(row).tolist()) for row in footprint)
+                if rows in seen:
+                    continue
+                seen.add(rows)
+                self.variants.append(MachineVariant(machine, axis, mirrored, *footprint.shape, rows,
+                                                    tuple(zip(*(indices.tolist()
+                                                                for indices in np.nonzero(footprint))))))
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+
+@lru_cache(maxsize=None)
+def default_catalog() -> MachineCatalog:
+    return MachineCatalog()
+
+
+def _pack_rows(mask: np.ndarray) -> np.ndarray:
+    # Sums distinct powers of two, which is the same as or-ing the bits of every row together
+    weights = np.left_shift(np.uint64(1), np.arange(mask.shape[-1], dtype=np.uint64))
+    return np.sum(mask * weights, axis=-1, dtype=np.uint64)
+
+
+class MachineFits(NamedTuple):
+    catalog: MachineCatalog
+    # The group number that goes with every index of the first axis of anchors
+    group_nrs: np.ndarray
+    # For every group, variant and row of the geode, the columns where the variant fits as a bitmask
+    anchors: np.ndarray
+
+    def counts(self) -> np.ndarray:
+        # The number of anchors of every variant, by group and variant
+        bits = np.unpackbits(self.anchors.astype('<u8').view(np.uint8), axis=-1)
+        return bits.reshape(*self.anchors.shape[:2], -1).sum(axis=-1)
+
+    def fitting_groups(self) -> list[int]:
+        # The group numbers for which at least one machine fits
+        return self.group_nrs[self.anchors.any(axis=(1, 2))].tolist()
+
+    def placements(self, group_nr: int) -> Iterator[tuple[MachineVariant, int, int]]:
+        """
+        :param group_nr: The group to place machines for
+        :return: Every variant that fits, with the row and column of its anchor
+        """
+        group_idx = int(np.searchsorted(self.group_nrs, group_nr))
+        for variant_idx, row in zip(*np.nonzero(self.anchors[group_idx])):
+            mask = int(self.anchors[group_idx, variant_idx, row])
+            while mask:
+                col = (mask & -mask).bit_length() - 1
+                mask &= mask - 1
+                yield self.catalog.variants[variant_idx], int(row), col
+
+
+def machine_fits(block_grid: np.ndarray, group_grid: np.ndarray, catalog: MachineCatalog = None) -> MachineFits:
+    """
+    Tests every machine of the catalog at every anchor for every group of a solved geode. A machine fits a group at
+    an anchor if its footprint stays inside the grid, covers at least one cell of the group, and doesn't cover
+    obsidian or a cell of another group.
+
+    The rows of the grids are bitmasks, so a footprint cell at (i, j) rules out the anchors of a whole row at once:
+    the anchors in row r that collide through it are the blocked cells of row r + i shifted right by j. Every group
+    is handled in the same numpy operation
+    :param block_grid: The integer block types of the geode
+    :param group_grid: The group number of every cell, NO_GROUP for cells without a group
+    :param catalog: The machines to test, defaults to all of them
+    """
+    catalog = catalog or default_catalog()
+    rows, cols = block_grid.shape
+    if cols > MAX_COLS:
+        raise ValueError(f'Geodes can be at most {MAX_COLS} columns wide to test machines on, not {cols}')
+
+    group_nrs = np.unique(group_grid[group_grid != NO_GROUP])
+    members = _pack_rows(group_grid[None] == group_nrs[:, None, None])
+    grouped = _pack_rows(group_grid != NO_GROUP)
+    # Per group: the cells that a machine for the group can't take up
+    blocked = _pack_rows(block_grid == OBSIDIAN)[None] | (grouped[None] & ~members)
+
+    anchors = np.zeros((len(group_nrs), len(catalog), rows), dtype=np.uint64)
+    for variant_idx, variant in enumerate(catalog.variants):
+        anchor_rows = rows - variant.height + 1
+        if anchor_rows <= 0 or variant.width > cols:
+            continue
+        collides = np.zeros((len(group_nrs), anchor_rows), dtype=np.uint64)
+        touches = np.zeros_like(collides)
+        for row, col in variant.cells:
+            shift = np.uint64(col)
+            collides |= blocked[:, row:row + anchor_rows] >> shift
+            touches |= members[:, row:row + anchor_rows] >> shift
+        # Anchors further right would put part of the footprint outside the grid
+        inside = np.uint64((1 << (cols - variant.width + 1)) - 1)
+        anchors[:, variant_idx, :anchor_rows] = touches & ~collides & inside
+    return MachineFits(catalog, group_nrs, anchors)
+
+
+def _solved_grids(corpus, results: str = None, limit: int = None) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    # The block and group grid of every geode, solved with the heuristic or read from a result file
+    from src.binary_corpus import blocks_from_lines
+    from src.result_writer import read_results
+
+    if results is None:
+        for geode in corpus.range(0, limit):
+            geode.heuristic_placement()
+            yield geode.block_grid, geode.group_grid
+        return
+    for result in islice(read_results(results), limit):
+        raw = next(corpus.raw_range(result.index, result.index + 1))
+        yield raw if isinstance(raw, np.ndarray) else blocks_from_lines(raw), result.group_grid
+
+
+def main(argv: list[str] = None):
+    from src.binary_corpus import open_corpus
+    from src.grid_reader import DEFAULT_GEODE_FILE
+
+    parser = argparse.ArgumentParser(description='Count the flying machines that fit the groups of solved geodes')
+    parser.add_argument('results', nargs='?', default=None,
+                        help='a .jsonl or binary file with the groups, the geodes are solved if not given')
+    parser.add_argument('-i', '--input', default=DEFAULT_GEODE_FILE, help='the geode file')
+    parser.add_argument('-n', '--limit', type=int, default=None, help='only check the first n geodes')
+    args = parser.parse_args(argv)
+
+    catalog = default_catalog()
+    variants_of = {machine: [idx for idx, variant in enumerate(catalog.variants) if variant.machine is machine]
+                   for machine in FlyingMachineEnum}
+    groups = fitting = 0
+    per_machine = dict.fromkeys(FlyingMachineEnum, 0)
+    seconds = 0.0
+    with open_corpus(args.input) as corpus:
+        for block_grid, group_grid in _solved_grids(corpus, args.results, args.limit):
+            start = time.perf_counter()
+            fits = machine_fits(block_grid, group_grid, catalog)
+            seconds += time.perf_counter() - start
+            groups += len(fits.group_nrs)
+            fitting += len(fits.fitting_groups())
+            variant_fits = fits.anchors.any(axis=2)
+            for machine, variant_indices in variants_of.items():
+                per_machine[machine] += int(variant_fits[:, variant_indices].any(axis=1).sum())
+
+    print(f'{fitting} of {groups} groups fit at least one machine, tested in {seconds:.3f} seconds')
+    for machine, count in per_machine.items():
+        print(f'{machine.canon_name:<28} fits {count} groups')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import os
+import queue
+import time
+from math import ceil
+from multiprocessing import Event, Process, Queue, Value
+from random import Random
+
+import numpy as np
+
+from src.Analyzers.geode import MAX_GROUP_SIZE, PUMPKIN, Geode
+from src.sat_pumpkin_solver import BooleanPumpkinModel
+from src.seeded_sat_solver import SeededSolution, _covered_pumpkins, input_from_blocks, minimise_groups
+
+GREEDY = 'greedy'
+SAT = 'sat'
+
+# How long to wait for the solution that goes with the best group count, after the search has stopped
+_RESULT_GRACE_SECONDS = 1.0
+
+
+def lower_bound(block_grid: np.ndarray) -> int:
+    # Every pumpkin has to be part of a group, and a group has at most MAX_GROUP_SIZE blocks
+    return ceil(np.count_nonzero(block_grid == PUMPKIN) / MAX_GROUP_SIZE)
+
+
+def _publish(best,
+             results: Queue,
+             strategy: str,
+             groups: int,
+             group_grid: np.ndarray,
+             block_grid: np.ndarray) -> bool:
+    # Shares a solution if it is better than the best one so far, and returns whether it was
+    with best.get_lock():
+        if groups >= best.value:
+            return False
+        best.value = groups
+        # Sent while holding the lock, so the solutions arrive in the order of the best count
+        results.put((strategy, groups, _covered_pumpkins(block_grid, group_grid), group_grid, False))
+    return True
+
+
+def _greedy_worker(block_grid: np.ndarray, seed: int, deadline: float, best, optimal_found, results: Queue):
+    """
+    Runs the greedy placement with random tie breaking until the deadline, or until a solution is known to be optimal
+    :param seed: The seed of the random tie breaking. The worker with seed 0 starts with the deterministic heuristic
+    """
+    geode = Geode.from_blocks(block_grid)
+    rng = Random(seed)
+    minimum = lower_bound(geode.block_grid)
+    runs = 0
+    while time.time() < deadline and not optimal_found.is_set():
+        geode.heuristic_placement(rng if runs or seed else None)
+        runs += 1
+        _publish(best, results, f'{GREEDY}:{seed}', len(geode.groups), geode.group_grid.copy(), geode.block_grid)
+        if best.value <= minimum:
+            optimal_found.set()
+
+
+def _sat_worker(block_grid: np.ndarray, deadline: float, best, optimal_found, results: Queue):
+    """
+    Searches for solutions with fewer groups than the best one of all workers with the SAT model, until the deadline
+    or until it proves that its own best solution is optimal. A proof says nothing about the greedy solutions, which
+    can have groups that the model doesn't allow, so it is only sent along with a solution of the model
+    """
+    geode = Geode.from_blocks(block_grid)
+    # The heuristic's groups are the start of the search
+    geode.heuristic_placement()
+    _publish(best, results, GREEDY, len(geode.groups), geode.group_grid.copy(), geode.block_grid)
+    max_groups = best.value - 1
+    if max_groups <= 0:
+        optimal_found.set()
+        return
+
+    model = BooleanPumpkinModel(input_from_blocks(geode.block_grid), max_groups=max_groups)
+    group_grid, proven = minimise_groups(model,
+                                         deadline,
+                                         geode.group_grid,
+                                         upper_bound=lambda: best.value,
+                                         on_solution=lambda solution: _publish(best, results, SAT,
+                                                                               int(solution.max()) + 1,
+                                                                               solution, geode.block_grid))
+    if proven and group_grid is not None:
+        # The solution is sent again with the proof, it wins over greedy solutions with as many groups
+        results.put((SAT, int(group_grid.max()) + 1, _covered_pumpkins(geode.block_grid, group_grid), group_grid, True))
+        optimal_found.set()
+
+
+def solve_portfolio(geode: Geode, time_budget: float, workers: int = None, sat: bool = True) -> SeededSolution:
+    """
+    Races several strategies for one geode in separate processes: the greedy placement with different seeds, and the
+    SAT model. The workers share the number of groups of the best solution so far. The greedy workers stop once it
+    can't get any lower, and the SAT worker only looks for solutions with fewer groups. The search ends when a
+    solution is proven to be optimal or at the deadline, and the best solution wins
+    :param geode: The geode to solve. Its groups are replaced with the best solution that was found
+    :param time_budget: The wall clock time in seconds for the search
+    :param workers: The number of worker processes. Defaults to the number of cores
+    :param sat: Whether one of the workers runs the SAT model, the others run the greedy placement
+    :return: The best solution, with the strategy that found it as its source
+    """
+    start = time.perf_counter()
+    deadline = time.time() + time_budget
+    workers = workers or os.cpu_count() or 1
+    block_grid = geode.block_grid.copy()
+
+    best = Value('i', np.iinfo(np.int32).max)
+    optimal_found = Event()
+    results = Queue()
+    processes = [Process(target=_sat_worker, args=(block_grid, deadline, best, optimal_found, results), daemon=True)
+                 ] if sat else []
+    processes += [Process(target=_greedy_worker,
+                          args=(block_grid, seed, deadline, best, optimal_found, results),
+                          daemon=True)
+                  for seed in range(workers - len(processes))]
+    for process in processes:
+        process.start()
+
+    best_solution = None
+
+    def receive(timeout: float) -> bool:
+        nonlocal best_solution
+        try:
+            strategy, groups, covered, group_grid, proven = results.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        # The fewest groups and the most coverage first, and a solution that is proven optimal over one that isn't
+        if best_solution is None or (groups, -covered, not proven) < (best_solution[1], -best_solution[2],
+                                                                      not best_solution[4]):
+            best_solution = strategy, groups, covered, group_grid, proven
+        return True
+
+    try:
+        while (time.time() < deadline
+               and not optimal_found.is_set()
+               and any(process.is_alive() for process in processes)):
+            receive(min(0.05, max(0.0, deadline - time.time())))
+        # Collect the solutions that are still on their way, at least the one that goes with the best count
+        grace_deadline = time.time() + _RESULT_GRACE_SECONDS
+        while receive(0):
+            pass
+        while (best_solution is None or best_solution[1] > best.value) and time.time() < grace_deadline:
+            receive(0.05)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+    if best_solution is None:
+        # None of the workers got to a solution in time, so fall back on the heuristic in this process
+        geode.heuristic_placement()
+        best_solution = GREEDY, len(geode.groups), _covered_pumpkins(geode.block_grid, geode.group_grid), \
+            geode.group_grid.copy(), False
+    # Only a solution of the SAT model can be proven optimal, a greedy solution at the lower bound doesn't have to
+    # satisfy the model's constraints
+    strategy, groups, covered, group_grid, optimal = best_solution
+    geode.load_groups(group_grid)
+    return SeededSolution(geode.group_grid.copy(), groups, covered, strategy, optimal, time.perf_counter() - start)
@@ -0,0 +1,153 @@
+import html
+import io
+from functools import lru_cache
+from typing import IO, Iterable, NamedTuple, Union
+
+import numpy as np
+
+from src.Enums.geode_enum import GeodeEnum
+
+# Output styles: escape codes for a terminal, plain text for files, or an HTML page
+ANSI = 'ansi'
+PLAIN = 'plain'
+HTML = 'html'
+
+# What to show: the groups on top of the blocks, only the groups, or only the blocks
+MERGED = 'merged'
+GROUPS = 'groups'
+PROJECTION = 'projection'
+
+NO_GROUP = -1
+
+# Two characters per cell, like the geode file. In plain text a grouped bridge or air block is shown as '==', since
+# there is no background colour to show its group
+_PLAIN_BLOCKS = {GeodeEnum.AIR.int_value: '  ',
+                 GeodeEnum.PUMPKIN.int_value: '..',
+                 GeodeEnum.OBSIDIAN.int_value: '##',
+                 GeodeEnum.BRIDGE.int_value: '++'}
+_PLAIN_GROUPED_BLOCK = '=='
+
+# Background colours that are hard to tell apart from the blocks or the terminal, and aren't used for groups
+_BAD_COLORS = ['BLACK', 'WHITE', 'LIGHTBLACK_EX', 'RESET']
+
+# Background colours of the HTML page, for the blocks and for the groups
+_HTML_BLOCKS = {GeodeEnum.AIR.int_value: '#ffffff',
+                GeodeEnum.PUMPKIN.int_value: '#e0c000',
+                GeodeEnum.OBSIDIAN.int_value: '#202020',
+                GeodeEnum.BRIDGE.int_value: '#909090'}
+_HTML_GROUPS = ['#e6194b', '#3cb44b', '#4363d8', '#f58231', '#911eb4', '#42d4f4', '#f032e6', '#bfef45',
+                '#fabed4', '#469990', '#dcbeff', '#9a6324', '#800000', '#aaffc3', '#808000', '#000075']
+_HTML_PAGE = ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<style>\n'
+              'pre {{ font-family: monospace; line-height: 1; }}\n'
+              'pre span {{ display: inline-block; width: 2ch; text-align: center; }}\n'
+              '</style>\n</head>\n<body>\n{body}</body>\n</html>\n')
+
+
+class AnsiPalette(NamedTuple):
+    # The escape codes of every block, by int value
+    blocks: dict[int, str]
+    # The background colours of the groups
+    groups: list[str]
+    black: str
+    reset: str
+
+
+@lru_cache(maxsize=None)
+def ansi_palette() -> AnsiPalette:
+    # colorama is only imported once something is printed to a terminal
+    from colorama import Back
+    codes = vars(Back)
+    return AnsiPalette({block.int_value: block.pretty_print for block in GeodeEnum},
+                       [codes[color] for color in codes if color not in _BAD_COLORS],
+                       Back.BLACK,
+                       Back.RESET)
+
+
+def init_terminal():
+    # Lets the escape codes work on Windows terminals as well
+    import colorama
+    colorama.init()
+
+
+def _ansi_cell(block: int, group_nr: int, mode: str) -> str:
+    # The same output as the printing methods of Cell
+    palette = ansi_palette()
+    if mode == PROJECTION or mode == MERGED and group_nr == NO_GROUP:
+        return palette.blocks[block]
+    color = palette.reset if group_nr == NO_GROUP else palette.groups[group_nr % len(palette.groups)]
+    value = group_nr if block == GeodeEnum.PUMPKIN.int_value else '  '
+    return f'{color}{value:02}{palette.reset}'
+
+
+def _plain_cell(block: int, group_nr: int, mode: str) -> str:
+    if mode == PROJECTION or mode == MERGED and group_nr == NO_GROUP:
+        return _PLAIN_BLOCKS[block]
+    if group_nr == NO_GROUP:
+        return '  '
+    return f'{group_nr % 100:02}' if block == GeodeEnum.PUMPKIN.int_value else _PLAIN_GROUPED_BLOCK
+
+
+def _html_cell(block: int, group_nr: int, mode: str) -> str:
+    if mode == PROJECTION or mode == MERGED and group_nr == NO_GROUP:
+        return f'<span style="background:{_HTML_BLOCKS[block]}">&nbsp;</span>'
+    if group_nr == NO_GROUP:
+        return '<span>&nbsp;</span>'
+    text = group_nr if block == GeodeEnum.PUMPKIN.int_value else '&nbsp;'
+    return f'<span style="background:{_HTML_GROUPS[group_nr % len(_HTML_GROUPS)]}">{text}</span>'
+
+
+_CELL_RENDERERS = {ANSI: _ansi_cell, PLAIN: _plain_cell, HTML: _html_cell}
+
+
+def render(block_grid: np.ndarray, group_grid: np.ndarray = None, mode: str = MERGED, style: str = ANSI) -> str:
+    """
+    Renders a geode as a single string, straight from its grids
+    :param block_grid: The integer block types of the geode
+    :param group_grid: The group number of every cell, NO_GROUP for cells without a group. Defaults to no groups
+    :param mode: MERGED, GROUPS or PROJECTION
+    :param style: ANSI, PLAIN or HTML. HTML gives a <pre> element, see render_batch for a page
+    :return: The rendered grid, every row ends with a newline
+    """
+    render_cell = _CELL_RENDERERS[style]
+    if group_grid is None:
+        group_grid = np.full(np.shape(block_grid), NO_GROUP)
+    rows = [''.join(render_cell(block, group_nr, mode) for block, group_nr in zip(block_row, group_row))
+            for block_row, group_row in zip(np.asarray(block_grid).tolist(), np.asarray(group_grid).tolist())]
+    if style == HTML:
+        return '<pre>' + '\n'.join(rows) + '</pre>\n'
+    return '\n'.join(rows) + '\n'
+
+
+def render_geode(geode, mode: str = MERGED, style: str = ANSI) -> str:
+    return render(geode.block_grid, geode.group_grid, mode, style)
+
+
+def render_batch(grids: Iterable[tuple[str, np.ndarray, np.ndarray]], mode: str = MERGED, style: str = ANSI) -> str:
+    """
+    Renders several geodes as one string, each after a title
+    :param grids: The title, block grid and group grid of every geode
+    :param mode: MERGED, GROUPS or PROJECTION
+    :param style: ANSI, PLAIN or HTML. HTML gives a complete page
+    """
+    parts = []
+    for title, block_grid, group_grid in grids:
+        parts.append(f'<h3>{html.escape(title)}</h3>\n' if style == HTML else f'{title}\n')
+        parts.append(render(block_grid, group_grid, mode, style))
+    body = ''.join(parts)
+    return _HTML_PAGE.format(body=body) if style == HTML else body
+
+
+def with_bridges(block_grid: np.ndarray, group_grid: np.ndarray) -> np.ndarray:
+    # Bridges aren't stored with the geodes, but every air block that is part of a group is one
+    air = GeodeEnum.AIR.int_value
+    return np.where((block_grid == air) & (group_grid != NO_GROUP), GeodeEnum.BRIDGE.int_value, block_grid)
+
+
+def style_for_path(path: str) -> str:
+    # Files get plain text unless they are HTML, escape codes are only useful in a terminal
+    return HTML if str(path).lower().endswith(('.html', '.htm')) else PLAIN
+
+
+def write_rendered(file: Union[IO[str], IO[bytes]], text: str):
+    # One write for the whole text, instead of one per row
+    file.write(text.encode() if isinstance(file, (io.RawIOBase, io.BufferedIOBase)) else text)
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+
+from src.Analyzers.geode import AIR, BRIDGE, NO_GROUP, Geode
+
+# Number of stores between two checks of the size limits
+EVICTION_INTERVAL = 64
+
+# Part of every key, so entries of an older solver are never returned. Bump it whenever a change to the heuristic or
+# the SAT model can change the groups of a geode
+SOLVER_VERSION = 2
+
+# The solve mode of the groups in a cache, also part of every key. SAT results depend on their time budget
+HEURISTIC = 'heuristic'
+
+
+def sat_mode(budget: float) -> str:
+    return f'sat-{budget:g}s'
+
+
+class CanonicalForm(NamedTuple):
+    # Hash of the canonical grid, the same for all geodes that only differ by a symmetry or a translation
+    key: str
+    # The symmetry that maps the trimmed grid onto the canonical grid: whether it is mirrored first, and the number
+    # of quarter turns after that
+    mirrored: bool
+    quarter_turns: int
+    # The part of the original grid that isn't empty border
+    rows: slice
+    cols: slice
+
+
+def _transform(grid: np.ndarray, mirrored: bool, quarter_turns: int) -> np.ndarray:
+    return np.rot90(np.fliplr(grid) if mirrored else grid, quarter_turns)
+
+
+def _inverse_transform(grid: np.ndarray, mirrored: bool, quarter_turns: int) -> np.ndarray:
+    grid = np.rot90(grid, -quarter_turns)
+    return np.fliplr(grid) if mirrored else grid
+
+
+def canonical_form(block_grid: np.ndarray) -> CanonicalForm:
+    """
+    Normalises a geode over translation and the 8 rotations and reflections of the grid
+    :param block_grid: The integer block types of the geode, with or without bridges
+    :return: The hash of the canonical grid, and how to get from the original grid to the canonical grid
+    """
+    # Bridges follow from the pumpkins, so they are left out to get the same key before and after populate_bridges
+    grid = np.where(block_grid == BRIDGE, AIR, block_grid).astype(np.int8)
+
+    # Trim the border of rows and columns that only hold air
+    filled_rows = np.flatnonzero((grid != AIR).any(axis=1))
+    filled_cols = np.flatnonzero((grid != AIR).any(axis=0))
+    if filled_rows.size:
+        rows = slice(int(filled_rows[0]), int(filled_rows[-1]) + 1)
+        cols = slice(int(filled_cols[0]), int(filled_cols[-1]) + 1)
+    else:
+        rows = cols = slice(0, 0)
+    trimmed = grid[rows, cols]
+
+    # The canonical grid is the smallest of the symmetries, first by shape and then by content
+    candidates = [(_transform(trimmed, mirrored, quarter_turns), mirrored, quarter_turns)
+                  for mirrored in (False, True)
+                  for quarter_turns in range(4)]
+    canonical, mirrored, quarter_turns = min(candidates, key=lambda candidate: (candidate[0].shape,
+                                                                                 candidate[0].tobytes()))
+    key = hashlib.sha256(np.array(canonical.shape, dtype='<u4').tobytes() + canonical.tobytes()).hexdigest()
+    return CanonicalForm(key, mirrored, quarter_turns, rows, cols)
+
+
+class ResultCache:
+    """
+    A persistent cache of solved geodes, stored in an SQLite database.
+
+    Geodes that only differ by a rotation, a reflection or their position inside the border of air share an entry.
+    The groups are stored in the orientation of the canonical grid, and mapped back onto the orientation of the
+    geode that is looked up. When the cache grows beyond its limits, the least recently used entries are evicted.
+
+    Groups of different solve modes and solver versions can share a database, but never an entry: both are part of
+    the key, so a lookup only finds groups that the same solver would have placed.
+    """
+
+    def __init__(self,
+                 path: Union[str, os.PathLike],
+                 max_entries: Optional[int] = 1_000_000,
+                 max_bytes: Optional[int] = 1 << 30,
+                 mode: str = HEURISTIC):
+        """
+        :param path: The database file, which is created if it doesn't exist
+        :param max_entries: The number of geodes to keep at most, None for no limit
+        :param max_bytes: The total size of the stored groups to keep at most, None for no limit
+        :param mode: How the groups were placed, HEURISTIC or the sat_mode of a time budget
+        """
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._stores = 0
+        # Several worker processes can use the same cache, so wait for each other's writes instead of failing
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS results (
+                                        key TEXT PRIMARY KEY,
+                                        rows INTEGER NOT NULL,
+                                        cols INTEGER NOT NULL,
+                                        groups BLOB NOT NULL,
+                                        size INTEGER NOT NULL,
+                                        last_used REAL NOT NULL)''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+    def _key(self, form: CanonicalForm) -> str:
+        return f'{SOLVER_VERSION}:{self.mode}:{form.key}'
+
+    def get(self, block_grid: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Looks up the groups of a geode
+        :param block_grid: The integer block types of the geode
+        :return: The group number of every cell in the orientation of the given grid, or None if it isn't cached
+        """
+        form = canonical_form(block_grid)
+        key = self._key(form)
+        row = self._connection.execute('SELECT rows, cols, groups FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+
+        rows, cols, groups = row
+        canonical_groups = np.frombuffer(groups, dtype='<i2').reshape(rows, cols)
+        group_grid = np.full(np.shape(block_grid), NO_GROUP, dtype=np.int16)
+        group_grid[form.rows, form.cols] = _inverse_transform(canonical_groups, form.mirrored, form.quarter_turns)
+        return group_grid
+
+    def put(self, block_grid: np.ndarray, group_grid: np.ndarray):
+        """
+        Stores the groups of a geode
+        :param block_grid: The integer block types of the geode
+        :param group_grid: The group number of every cell
+        """
+        form = canonical_form(block_grid)
+        canonical_groups = _transform(np.asarray(group_grid)[form.rows, form.cols], form.mirrored, form.quarter_turns)
+        groups = np.ascontiguousarray(canonical_groups, dtype='<i2').tobytes()
+        self._connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                 (self._key(form), *canonical_groups.shape, groups, len(groups), time.time()))
+        self._stores += 1
+        if self._stores % EVICTION_INTERVAL == 0:
+            self.evict()
+
+    def get_geode(self, geode: Geode) -> bool:
+        """
+        Loads the groups of a geode from the cache
+        :return: Whether the geode was cached
+        """
+        group_grid = self.get(geode.block_grid)
+        if group_grid is None:
+            return False
+        geode.load_groups(group_grid)
+        return True
+
+    def put_geode(self, geode: Geode):
+        self.put(geode.block_grid, geode.group_grid)
+
+    def solve(self, geode: Geode):
+        # Places the groups of the geode with the heuristic, from the cache if possible
+        if self.mode != HEURISTIC:
+            raise ValueError(f'Only a cache of the heuristic can solve geodes, not of {self.mode}')
+        if not self.get_geode(geode):
+            geode.heuristic_placement()
+            self.put_geode(geode)
+
+    def evict(self):
+        # Removes the least recently used entries until the cache is within its limits
+        with self._connection:
+            if self.max_entries is not None:
+                self._connection.execute('''DELETE FROM results WHERE key IN (
+                                                SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)''',
+                                         (self.max_entries,))
+            if self.max_bytes is not None:
+                total_bytes, = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+                if total_bytes > self.max_bytes:
+                    # Keep the most recently used entries whose cumulative size fits
+                    self._connection.execute('''DELETE FROM results WHERE key IN (
+                                                    SELECT key FROM (
+                                                        SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS kept
+                                                        FROM results)
+                                                    WHERE kept > ?)''',
+                                             (self.max_bytes,))
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self.evict()
+        self._connection.close()
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,133 @@
+import json
+import os
+import struct
+from typing import Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+
+from src.Analyzers.geode import NO_GROUP
+
+JSONL = 'jsonl'
+BINARY = 'binary'
+
+# The binary format starts with the magic and the version, followed by one record per geode: the index, the number of
+# rows and columns, and the group number of every cell in row major order as little endian int16
+_MAGIC = b'GRPS'
+_VERSION = 1
+_HEADER = struct.Struct('<4sH')
+_RECORD = struct.Struct('<IHH')
+
+# Bytes collected before they are written to the file
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+class StoredResult(NamedTuple):
+    index: int
+    group_grid: np.ndarray
+    group_sizes: list[int]
+
+
+def format_for_path(path: Union[str, os.PathLike]) -> str:
+    # JSON lines for .jsonl and .json files, the binary format for everything else
+    return JSONL if str(path).lower().endswith(('.jsonl', '.json')) else BINARY
+
+
+def _group_sizes(group_grid: np.ndarray) -> list[int]:
+    group_sizes = np.bincount(group_grid[group_grid != NO_GROUP])
+    return group_sizes[group_sizes > 0].tolist()
+
+
+class ResultWriter:
+    """
+    Writes the groups of solved geodes to a file, as compact JSON lines or in a binary format.
+
+    The records are collected in one buffer that is written to the file whenever it is full, so a batch of geodes
+    costs a few large writes instead of several small ones per geode.
+    """
+
+    def __init__(self,
+                 path: Union[str, os.PathLike],
+                 file_format: str = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        :param path: The file to write to, it is overwritten if it exists
+        :param file_format: JSONL or BINARY. Defaults to the format that goes with the suffix of the path
+        :param buffer_size: The number of bytes to collect before writing them to the file
+        """
+        self.format = file_format or format_for_path(path)
+        self.buffer_size = buffer_size
+        self.records = 0
+        self._buffer = bytearray()
+        self._file = open(path, 'wb')
+        if self.format == BINARY:
+            self._buffer += _HEADER.pack(_MAGIC, _VERSION)
+
+    def write(self, index: int, group_grid: np.ndarray, group_sizes: list[int] = None):
+        """
+        Adds the groups of one geode
+        :param index: The position of the geode in the input
+        :param group_grid: The group number of every cell, NO_GROUP for cells without a group
+        :param group_sizes: The number of blocks of every group, computed from the group grid if not given
+        """
+        group_grid = np.asarray(group_grid, dtype=np.int16)
+        rows, cols = group_grid.shape
+        if self.format == BINARY:
+            self._buffer += _RECORD.pack(index, rows, cols)
+            self._buffer += group_grid.astype('<i2').tobytes()
+        else:
+            record = {'index': index,
+                      'rows': rows,
+                      'cols': cols,
+                      'group_sizes': _group_sizes(group_grid) if group_sizes is None else list(group_sizes),
+                      'groups': group_grid.ravel().tolist()}
+            self._buffer += json.dumps(record, separators=(',', ':')).encode()
+            self._buffer += b'\n'
+        self.records += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._buffer.clear()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_results(path: Union[str, os.PathLike], file_format: Optional[str] = None) -> Iterator[StoredResult]:
+    """
+    Reads the groups that a ResultWriter wrote
+    :param path: The file that was written
+    :param file_format: JSONL or BINARY. Defaults to the format that goes with the suffix of the path
+    :return: The results in the order they were written
+    """
+    if (file_format or format_for_path(path)) == JSONL:
+        with open(path) as file:
+            for line in file:
+                record = json.loads(line)
+                group_grid = np.array(record['groups'], dtype=np.int16).reshape(record['rows'], record['cols'])
+                yield StoredResult(record['index'], group_grid, record['group_sizes'])
+        return
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f'{path} is not a group file of version {_VERSION}')
+    offset = _HEADER.size
+    while offset < len(data):
+        index, rows, cols = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        group_grid = np.frombuffer(data, dtype='<i2', count=rows * cols, offset=offset).reshape(rows, cols)
+        offset += rows * cols * 2
+        group_grid = group_grid.astype(np.int16)
+        yield StoredResult(index, group_grid, _group_sizes(group_grid))
@@ -1,4 +1,19 @@
-from z3 import Int, Solver, IntVector, And, If, Implies, Sum, ForAll, Or
+from math import ceil
+from typing import Optional
+
+from z3 import Int, Solver, SolverFor, IntVector, And, If, Implies, Sum, ForAll, Or, Bool, PbLe, sat, is_true
+
+# Blanket kinds in the solutions of the Boolean model, the same values as the blanket grid of parse_input
+EMPTY = 0
+SLIME = 1
+HONEY = 2
+
+MIN_GROUP_SIZE = 4
+MAX_GROUP_SIZE = 12
+
+# Seconds it takes to build the Boolean model and to parse it into a solver, per cell that can hold a blanket. Between
+# 2 and 3.5 ms on the geode file, with a margin
+BUILD_SECONDS_PER_CELL = 0.005
 
 
 def flatten(grid: list[IntVector]):
@@ -180,3 +195,262 @@ def parse_input(input_: str):
     print(s.check())
     model = s.model()
     print(model)
+
+
+class BooleanPumpkinModel:
+    """
+    An alternative encoding of the model of parse_input that only uses Bool variables and no quantifiers.
+
+    Every cell that can hold a blanket gets one-hot variables for its blanket kind (empty, slime, honey). Instead of a
+    group number, a cell with a blanket points at the first cell of its group in row major order, its owner. A group
+    of at most MAX_GROUP_SIZE blocks reaches at most MAX_GROUP_SIZE - 1 steps from its first cell, so a cell only has
+    the owners near it to choose from, and there are no group numbers that the solver could shuffle. The size of every
+    group is a pseudo-boolean cardinality constraint over the cells that point at its owner. Connectivity is encoded
+    with a Bool per cell and step that says it can be reached from its owner within that many steps.
+
+    The constraints are written as SMT-LIB text and parsed in one go. Building tens of thousands of expressions with
+    the z3 Python API took seconds, parsing them takes a fraction of that.
+    """
+
+    def __init__(self,
+                 input_: str,
+                 max_groups: Optional[int] = None,
+                 min_coverage: Optional[int] = None,
+                 air_reach: int = 1):
+        """
+        :param input_: The grid, with 'p' for pumpkins, 'o' for obsidian and '0' for empty cells
+        :param max_groups: The largest number of groups of a solution. Defaults to an upper bound that follows from the
+                           input
+        :param min_coverage: The number of pumpkins that must be covered. Defaults to all pumpkins in the input
+        :param air_reach: Empty cells further than this from the nearest pumpkin can't hold a blanket. A blanket on an
+                          empty cell only helps if it connects pumpkins or fills up a group, so far away cells only
+                          make the model larger
+        """
+        rows = input_.splitlines()
+        self.height = len(rows)
+        self.width = len(rows[0])
+        self.pumpkins = [(row, col) for row in range(self.height) for col in range(self.width) if rows[row][col] == 'p']
+        self.cells = blanket_cells(input_, air_reach)
+        self.min_coverage = len(self.pumpkins) if min_coverage is None else min_coverage
+        # Every group has at least MIN_GROUP_SIZE blocks, and at least one group is needed per MAX_GROUP_SIZE pumpkins
+        self.max_groups = max_groups or max(ceil(self.min_coverage / MAX_GROUP_SIZE), len(self.cells) // MIN_GROUP_SIZE)
+
+        # The neighbours of every cell that can hold a blanket themselves, and the owners every cell can point at
+        usable = set(self.cells)
+        self.cell_neighbours = {cell: [neighbour for neighbour in _neighbours(cell, self.height, self.width)
+                                       if neighbour in usable]
+                                for cell in self.cells}
+        self.owners = self._candidate_owners()
+
+        # One-hot blanket kind of every cell, and the owner of every cell with a blanket
+        self.empty = {cell: Bool(_name('empty', cell)) for cell in self.cells}
+        self.slime = {cell: Bool(_name('slime', cell)) for cell in self.cells}
+        self.honey = {cell: Bool(_name('honey', cell)) for cell in self.cells}
+        self.owner = {cell: {owner: Bool(_name('owner', cell, owner)) for owner in self.owners[cell]}
+                      for cell in self.cells}
+        # A cell that owns itself is the first cell of a group
+        self.root = {cell: self.owner[cell][cell] for cell in self.cells}
+
+        self.constraints = '\n'.join(self._declarations()
+                                     + self._blanket_constraints()
+                                     + self._group_constraints()
+                                     + self._connectivity_constraints()
+                                     + self._coverage_constraints()
+                                     + [f'(assert {_at_most(self.max_groups, self._roots())})'])
+
+    def _candidate_owners(self) -> dict[tuple[int, int], list[tuple[int, int]]]:
+        # A group only holds cells after its first cell, and it is connected, so every cell of the group is at most
+        # MAX_GROUP_SIZE - 1 steps from the first cell over cells that come after it
+        order = {cell: idx for idx, cell in enumerate(self.cells)}
+        owners = {cell: [] for cell in self.cells}
+        for owner in self.cells:
+            reached = {owner}
+            layer = [owner]
+            for _ in range(MAX_GROUP_SIZE - 1):
+                layer = [neighbour
+                         for cell in layer
+                         for neighbour in self.cell_neighbours[cell]
+                         if neighbour not in reached and order[neighbour] > order[owner]]
+                reached.update(layer)
+            for cell in reached:
+                owners[cell].append(owner)
+        return owners
+
+    def _roots(self) -> list[str]:
+        return [_name('owner', cell, cell) for cell in self.cells]
+
+    def _declarations(self) -> list[str]:
+        names = [_name(kind, cell) for cell in self.cells for kind in ('empty', 'slime', 'honey')]
+        names += [_name('owner', cell, owner) for cell in self.cells for owner in self.owners[cell]]
+        names += [_name('same', cell, neighbour) for cell in self.cells for neighbour in self.cell_neighbours[cell]
+                  if cell < neighbour]
+        names += [_name('reached', cell, step) for cell in self.cells for step in range(MAX_GROUP_SIZE)]
+        return [f'(declare-const {name} Bool)' for name in names]
+
+    def _blanket_constraints(self) -> list[str]:
+        # Each cell is either empty, slime or honey
+        return [f'(assert {_exactly_one([_name(kind, cell) for kind in ("empty", "slime", "honey")])})'
+                for cell in self.cells]
+
+    def _group_constraints(self) -> list[str]:
+        constraints = []
+        members = {owner: [] for owner in self.cells}
+        for cell in self.cells:
+            owners = [_name('owner', cell, owner) for owner in self.owners[cell]]
+            # A cell with a blanket has exactly one owner, an empty cell has none
+            constraints.append(f'(assert {_exactly_one([_name("empty", cell)] + owners)})')
+            for owner, owner_name in zip(self.owners[cell], owners):
+                members[owner].append(owner_name)
+                if owner != cell:
+                    # The owner is the first cell of a group, and the blanket of a cell is the kind of its group
+                    constraints.append(f'(assert (=> {owner_name} (and {_name("owner", owner, owner)} '
+                                       f'(= {_name("slime", cell)} {_name("slime", owner)}))))')
+
+        for owner in self.cells:
+            # Each group can only consist of 4 to 12 slime or honey blocks
+            root = _name('owner', owner, owner)
+            constraints.append(f'(assert {_at_most(MAX_GROUP_SIZE, members[owner])})')
+            constraints.append(f'(assert ((_ pbge {MIN_GROUP_SIZE} {" ".join(["1"] * len(members[owner]))} '
+                               f'{MIN_GROUP_SIZE}) {" ".join(members[owner])} (not {root})))')
+
+        # Neighbouring blankets of the same kind stick together, so they are part of the same group.
+        # Since the kind of a cell is the kind of its group, neighbours of a different kind are in different groups
+        for cell in self.cells:
+            for neighbour in self.cell_neighbours[cell]:
+                if neighbour < cell:
+                    continue
+                same = _name('same', cell, neighbour)
+                constraints.append(f'(assert (= {same} (or (and {_name("slime", cell)} {_name("slime", neighbour)}) '
+                                   f'(and {_name("honey", cell)} {_name("honey", neighbour)}))))')
+                for owner in sorted(set(self.owners[cell]) | set(self.owners[neighbour])):
+                    in_cell = owner in self.owner[cell]
+                    in_neighbour = owner in self.owner[neighbour]
+                    if in_cell and in_neighbour:
+                        constraints.append(f'(assert (=> {same} (= {_name("owner", cell, owner)} '
+                                           f'{_name("owner", neighbour, owner)})))')
+                    else:
+                        # Only one of them can have this owner, so it isn't the owner of either
+                        outside = cell if in_cell else neighbour
+                        constraints.append(f'(assert (=> {same} (not {_name("owner", outside, owner)})))')
+        return constraints
+
+    def _connectivity_constraints(self) -> list[str]:
+        constraints = []
+        for cell in self.cells:
+            # A cell is reached in 0 steps if it owns itself.
+            # It is reached in n steps if it was reached in fewer steps, or if a neighbour of the same kind was reached
+            # in one step less, since neighbours of the same kind are part of the same group
+            constraints.append(f'(assert (= {_name("reached", cell, 0)} {_name("owner", cell, cell)}))')
+            for step in range(1, MAX_GROUP_SIZE):
+                earlier = [_name('reached', cell, step - 1)]
+                earlier += [f'(and {_name("reached", neighbour, step - 1)} {_name("same", *sorted((cell, neighbour)))})'
+                            for neighbour in self.cell_neighbours[cell]]
+                constraints.append(f'(assert (=> {_name("reached", cell, step)} (or {" ".join(earlier)})))')
+            # A group has at most MAX_GROUP_SIZE blocks, so every block is reached within MAX_GROUP_SIZE - 1 steps
+            constraints.append(f'(assert (or {_name("empty", cell)} {_name("reached", cell, MAX_GROUP_SIZE - 1)}))')
+        return constraints
+
+    def _coverage_constraints(self) -> list[str]:
+        covered = [f'(not {_name("empty", cell)})' for cell in self.pumpkins]
+        if self.min_coverage >= len(self.pumpkins):
+            # Covering every pumpkin is a unit clause per pumpkin, which is much easier on the solver than a sum
+            return [f'(assert {pumpkin})' for pumpkin in covered]
+        return [f'(assert ((_ at-least {self.min_coverage}) {" ".join(covered)}))'] if covered else []
+
+    def at_most(self, groups: int):
+        """
+        :return: A constraint that allows at most the given number of groups, to add to a solver of the model, e.g.
+                 behind a literal that is passed as an assumption
+        """
+        return PbLe([(root, 1) for root in self.root.values()], groups)
+
+    def solver(self) -> Solver:
+        # The model is purely Boolean with cardinality constraints, which the finite domain solver handles with a
+        # SAT core instead of going through arithmetic
+        solver = SolverFor('QF_FD')
+        solver.from_string(self.constraints)
+        # Most variables are false in a solution: all owners but one, and every step before a cell is reached. Trying
+        # false first finds the first solution much sooner than the default phase caching
+        solver.set('phase', 'always_false')
+        return solver
+
+    def solve(self, timeout_ms: Optional[int] = None) -> Optional[tuple[list[list[int]], list[list[int]]]]:
+        """
+        :param timeout_ms: The time the solver gets, no limit by default
+        :return: The blanket kind and the group number of every cell, with -1 for cells without a group,
+                 or None if there is no solution with the given coverage within the time
+        """
+        solver = self.solver()
+        if timeout_ms is not None:
+            solver.set('timeout', timeout_ms)
+        if solver.check() != sat:
+            return None
+        return self.decode(solver.model())
+
+    def decode(self, model) -> tuple[list[list[int]], list[list[int]]]:
+        """
+        :return: The blanket kind and the group number of every cell. The groups are numbered in the order of their
+                 first cell, with -1 for cells without a group
+        """
+        blanket_grid = [[EMPTY] * self.width for _ in range(self.height)]
+        group_grid = [[-1] * self.width for _ in range(self.height)]
+        group_numbers = {}
+        for cell in self.cells:
+            row, col = cell
+            if is_true(model.eval(self.slime[cell], model_completion=True)):
+                blanket_grid[row][col] = SLIME
+            elif is_true(model.eval(self.honey[cell], model_completion=True)):
+                blanket_grid[row][col] = HONEY
+            else:
+                continue
+            owner = next(owner for owner, variable in self.owner[cell].items()
+                         if is_true(model.eval(variable, model_completion=True)))
+            # The owner comes before the cell, so it already has a number
+            group_grid[row][col] = group_numbers.setdefault(owner, len(group_numbers))
+        return blanket_grid, group_grid
+
+
+def blanket_cells(input_: str, air_reach: int = 1) -> list[tuple[int, int]]:
+    """
+    :param input_: The grid, with 'p' for pumpkins, 'o' for obsidian and '0' for empty cells
+    :param air_reach: See BooleanPumpkinModel
+    :return: The cells that can hold a blanket in the Boolean model: pumpkins, and empty cells close enough to a
+             pumpkin, in row major order
+    """
+    rows = input_.splitlines()
+    height, width = len(rows), len(rows[0])
+    pumpkins = [(row, col) for row in range(height) for col in range(width) if rows[row][col] == 'p']
+    reached = set(pumpkins)
+    layer = pumpkins
+    for _ in range(air_reach):
+        layer = [neighbour
+                 for cell in layer
+                 for neighbour in _neighbours(cell, height, width)
+                 if neighbour not in reached and rows[neighbour[0]][neighbour[1]] != 'o']
+        reached.update(layer)
+    return sorted(reached)
+
+
+def estimated_build_seconds(input_: str, air_reach: int = 1) -> float:
+    # Building the model and its solver can't be interrupted, so callers with a deadline check this first
+    return len(blanket_cells(input_, air_reach)) * BUILD_SECONDS_PER_CELL
+
+
+def _neighbours(cell: tuple[int, int], height: int, width: int) -> list[tuple[int, int]]:
+    row, col = cell
+    return [(row + row_, col + col_)
+            for row_, col_ in [(-1, 0), (0, -1), (1, 0), (0, 1)]
+            if 0 <= row + row_ < height and 0 <= col + col_ < width]
+
+
+def _name(kind: str, *parts) -> str:
+    # The name of a variable of the Boolean model, from cells and numbers
+    return '__'.join([kind] + ['_'.join(map(str, part)) if isinstance(part, tuple) else str(part) for part in parts])
+
+
+def _exactly_one(names: list[str]) -> str:
+    return f'((_ pbeq 1 {" ".join(["1"] * len(names))}) {" ".join(names)})'
+
+
+def _at_most(limit: int, names: list[str]) -> str:
+    return f'((_ at-most {limit}) {" ".join(names)})' if names else 'true'
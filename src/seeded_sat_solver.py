@@ -0,0 +1,199 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from z3 import Bool, Implies, sat, unsat
+
+from src.Analyzers.geode import AIR, BRIDGE, NO_GROUP, OBSIDIAN, PUMPKIN, Geode
+from src.sat_pumpkin_solver import BooleanPumpkinModel, estimated_build_seconds
+
+# Characters of the input format of the SAT models for every block type. Bridges are air that the model may use
+_BLOCK_TO_CHAR = {AIR: '0', PUMPKIN: 'p', OBSIDIAN: 'o', BRIDGE: '0'}
+
+# Seconds between two looks at an upper bound that is shared with other searches
+UPPER_BOUND_INTERVAL = 1.0
+
+
+@dataclass
+class SeededSolution:
+    # The group number of every cell, NO_GROUP for cells without a group
+    group_grid: np.ndarray
+    groups: int
+    covered_pumpkins: int
+    # 'heuristic' if the SAT search didn't improve on the heuristic, 'sat' otherwise
+    source: str
+    # Whether the SAT search found this solution and proved that the model has no solution with fewer groups. The
+    # heuristic can place groups that the model doesn't allow, like groups of less than MIN_GROUP_SIZE blocks, so a
+    # proof never extends to the heuristic's solution
+    optimal: bool
+    # Wall clock time of the heuristic and the SAT search together
+    seconds: float
+
+
+def input_from_blocks(block_grid: np.ndarray) -> str:
+    # Converts a block grid to the input format of the SAT models
+    return '\n'.join(''.join(_BLOCK_TO_CHAR[block] for block in row) for row in np.asarray(block_grid).tolist())
+
+
+def _covered_pumpkins(block_grid: np.ndarray, group_grid: np.ndarray) -> int:
+    return int(np.count_nonzero((block_grid == PUMPKIN) & (group_grid != NO_GROUP)))
+
+
+def _compact_groups(group_grid: np.ndarray) -> np.ndarray:
+    # Renumbers the groups as 0..n-1 in the order they first appear in the grid
+    numbers, first_seen, inverse = np.unique(group_grid, return_index=True, return_inverse=True)
+    order = np.argsort(first_seen[numbers != NO_GROUP])
+    renumbered = np.full(len(numbers), NO_GROUP, dtype=np.int16)
+    renumbered[np.flatnonzero(numbers != NO_GROUP)[order]] = np.arange(len(order))
+    return renumbered[inverse].reshape(group_grid.shape)
+
+
+def _heuristic_kinds(group_grid: np.ndarray) -> dict[int, bool]:
+    """
+    Guesses a blanket kind for every group of the heuristic, which only decides the groups.
+    Neighbouring groups get different kinds where possible, by colouring the groups breadth first
+    :return: For every group number, whether it is made of slime
+    """
+    adjacent: dict[int, set[int]] = {int(group_nr): set() for group_nr in np.unique(group_grid) if group_nr != NO_GROUP}
+    for first, second in [(group_grid[:-1, :], group_grid[1:, :]), (group_grid[:, :-1], group_grid[:, 1:])]:
+        touching = (first != second) & (first != NO_GROUP) & (second != NO_GROUP)
+        for group_nr, other in zip(first[touching].tolist(), second[touching].tolist()):
+            adjacent[group_nr].add(other)
+            adjacent[other].add(group_nr)
+
+    slime = {}
+    for start in adjacent:
+        if start in slime:
+            continue
+        slime[start] = True
+        queue = [start]
+        while queue:
+            group_nr = queue.pop()
+            for other in adjacent[group_nr]:
+                if other not in slime:
+                    slime[other] = not slime[group_nr]
+                    queue.append(other)
+    return slime
+
+
+def _hint_heuristic(solver, model: BooleanPumpkinModel, group_grid: np.ndarray):
+    # Start the search from the groups of the heuristic, so the solver begins close to a good assignment. Every cell
+    # of a group points at the first cell of the group, if the model lets it
+    kinds = _heuristic_kinds(group_grid)
+    first_cells = {}
+    for cell in model.cells:
+        group_nr = int(group_grid[cell])
+        if group_nr == NO_GROUP:
+            solver.set_initial_value(model.empty[cell], True)
+            continue
+        first_cell = first_cells.setdefault(group_nr, cell)
+        solver.set_initial_value(model.empty[cell], False)
+        solver.set_initial_value(model.slime[cell], kinds[group_nr])
+        solver.set_initial_value(model.honey[cell], not kinds[group_nr])
+        if first_cell in model.owner[cell]:
+            solver.set_initial_value(model.owner[cell][first_cell], True)
+
+
+def minimise_groups(model: BooleanPumpkinModel,
+                    deadline: float,
+                    hint_grid: np.ndarray = None,
+                    upper_bound: Callable[[], int] = None,
+                    on_solution: Callable[[np.ndarray], None] = None) -> tuple[Optional[np.ndarray], bool]:
+    """
+    Searches for solutions of the model with fewer and fewer groups until the deadline.
+    Every time the solver finds a solution, the bound is lowered to one group less than that solution, until the
+    solver runs out of time or proves that no solution with fewer groups exists
+    :param model: The model, its max_groups is the first upper bound
+    :param deadline: The time.time() at which to stop. It is a wall clock time so that it can be shared with worker
+                     processes
+    :param hint_grid: A group grid with the shape of the input of the model to start the search from, if any
+    :param upper_bound: The number of groups of the best solution found elsewhere, e.g. by other processes. If it is
+                        given, the search only looks for solutions with fewer groups than that, and checks it again
+                        every UPPER_BOUND_INTERVAL seconds
+    :param on_solution: Called with the group grid of every solution that is found
+    :return: The group grid of the best solution, numbered from 0, or None if no solution was found, and whether it
+             is proven that the model has no solution with fewer groups than the best one, including those found
+             elsewhere. Solutions found elsewhere, like the hint, need not be solutions of the model
+    """
+    solver = model.solver()
+    if hint_grid is not None:
+        _hint_heuristic(solver, model, hint_grid)
+
+    # The bounds are passed as assumptions, so the solver keeps what it learned between the checks
+    limits = {model.max_groups: []}
+    best_grid = None
+    bound = model.max_groups
+    while (remaining := deadline - time.time()) > 0:
+        if upper_bound is not None:
+            bound = min(bound, upper_bound() - 1)
+            remaining = min(remaining, UPPER_BOUND_INTERVAL)
+        if bound <= 0:
+            # No solution can have less than one group
+            return best_grid, True
+
+        if bound not in limits:
+            limit = Bool(f'at_most__{bound}')
+            solver.add(Implies(limit, model.at_most(bound)))
+            limits[bound] = [limit]
+        solver.set('timeout', max(1, int(remaining * 1000)))
+        result = solver.check(*limits[bound])
+        if result == unsat:
+            return best_grid, True
+        if result != sat:
+            # Out of time, unless the time was only cut short to check the upper bound again
+            continue
+
+        _, group_grid = model.decode(solver.model())
+        best_grid = _compact_groups(np.array(group_grid, dtype=np.int16))
+        bound = int(best_grid.max())
+        if on_solution is not None:
+            on_solution(best_grid)
+    return best_grid, False
+
+
+def solve_seeded(geode: Geode,
+                 time_budget: float,
+                 min_coverage: Optional[int] = None,
+                 air_reach: int = 1) -> SeededSolution:
+    """
+    Solves a geode with the heuristic first, and then searches for a solution with fewer groups with the SAT model
+    until the time runs out. The heuristic gives an answer quickly, so there is always a solution to return, and the
+    exact search can only improve on it. The heuristic's number of groups is the upper bound of the search
+    :param geode: The geode to solve. Its groups are replaced with the best solution that was found
+    :param time_budget: The wall clock time in seconds for the heuristic and the SAT search together. Building the
+                        model can't be interrupted, so the SAT search is skipped if the time that is left wouldn't
+                        cover an estimate of how long that takes
+    :param min_coverage: The number of pumpkins that a SAT solution must cover. Defaults to the coverage of the
+                         heuristic, which covers every pumpkin
+    :param air_reach: Passed on to BooleanPumpkinModel
+    :return: The best solution that was found
+    """
+    start = time.perf_counter()
+    deadline = time.time() + time_budget
+
+    geode.heuristic_placement()
+    best_grid = geode.group_grid.copy()
+    best_groups = len(geode.groups)
+    covered = _covered_pumpkins(geode.block_grid, best_grid)
+    source = 'heuristic'
+    optimal = False
+
+    # A solution with as many groups as the heuristic is no improvement
+    input_ = input_from_blocks(geode.block_grid)
+    if best_groups > 1 and deadline - time.time() > estimated_build_seconds(input_, air_reach):
+        model = BooleanPumpkinModel(input_,
+                                    max_groups=best_groups - 1,
+                                    min_coverage=covered if min_coverage is None else min_coverage,
+                                    air_reach=air_reach)
+        sat_grid, proven = minimise_groups(model, deadline, best_grid)
+        # The heuristic's groups aren't necessarily a solution of the model, so a proof only counts for the solver's
+        optimal = proven and sat_grid is not None
+        if sat_grid is not None:
+            best_grid = sat_grid
+            best_groups = int(best_grid.max()) + 1
+            covered = _covered_pumpkins(geode.block_grid, best_grid)
+            source = 'sat'
+            geode.load_groups(best_grid)
+
+    return SeededSolution(best_grid, best_groups, covered, source, optimal, time.perf_counter() - start)
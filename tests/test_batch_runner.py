@@ -0,0 +1,16 @@
+import numpy as np
+
+from src.batch_runner import run_batch
+from src.cli import _tutorial_blocks
+
+
+def test_a_failing_geode_is_reported_and_the_batch_goes_on():
+    # A block grid without rows and columns can't be made into a geode
+    geodes = [_tutorial_blocks(), np.zeros(3, dtype=np.int8), _tutorial_blocks()]
+    report = run_batch(geodes, workers=2, chunk_size=1)
+
+    assert [result.index for result in report.results] == [0, 1, 2]
+    assert [result.failed for result in report.results] == [False, True, False]
+    assert report.results[1].group_grid == [] and report.results[1].error
+    assert report.results[0].group_sizes == report.results[2].group_sizes
+    assert '1 failed' in report.summary()
@@ -0,0 +1,75 @@
+import random
+from pathlib import Path
+
+import numpy as np
+
+from src.Analyzers.beam_search import GroupBeamSearch
+from src.Analyzers.geode import MAX_GROUP_SIZE, NO_GROUP, PUMPKIN
+from src.Analyzers.grid_topology import grid_topology
+from src.grid_reader import GeodeCorpus
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+
+def _connected_groups(source: int, passable: list[bool], neighbours, max_size: int) -> set[frozenset[int]]:
+    # Every connected set of passable cells with the source, grown one neighbour at a time
+    groups = {frozenset((source,))}
+    layer = set(groups)
+    for _ in range(max_size - 1):
+        layer = {group | {neighbour}
+                 for group in layer
+                 for idx in group
+                 for neighbour in neighbours[idx]
+                 if passable[neighbour] and neighbour not in group}
+        groups |= layer
+    return groups
+
+
+def test_scores_count_the_groups_and_stranded_pumpkins_left_behind():
+    # A row of 5 pumpkins, taking the middle one leaves two parts of 2 that can't fill a group of 3
+    search = GroupBeamSearch([True] * 5, [True] * 5, [0.0] * 5, grid_topology(1, 5).neighbours, 3)
+    assert search.score(frozenset((2,)), list(range(5)))[:3] == (2, 4, 4)
+    assert search.score(frozenset((0, 1)), list(range(5)))[:3] == (1, 0, 3)
+
+
+def test_an_unbounded_beam_finds_the_best_group():
+    rng = random.Random(17)
+    for _ in range(30):
+        rows, cols = rng.randint(2, 4), rng.randint(2, 4)
+        neighbours = grid_topology(rows, cols).neighbours
+        # Only pumpkins, so every frontier cell is a candidate
+        pumpkins = [rng.random() < 0.7 for _ in range(rows * cols)]
+        if not any(pumpkins):
+            continue
+        isolation = [float(rng.randrange(10)) for _ in range(rows * cols)]
+        max_size = rng.randint(2, 5)
+        search = GroupBeamSearch(pumpkins, pumpkins, isolation, neighbours, max_size)
+        source = rng.choice([idx for idx in range(rows * cols) if pumpkins[idx]])
+
+        # Wide enough to keep every partial group, and to extend it with its whole frontier
+        cells = search.search(source, width=10_000, branching=rows * cols)
+        component = sorted(_connected_groups(source, pumpkins, neighbours, rows * cols), key=len)[-1]
+        best = min(search.score(group, component)
+                   for group in _connected_groups(source, pumpkins, neighbours, max_size))
+        assert cells[0] == source and len(set(cells)) == len(cells) <= max_size
+        assert frozenset(cells) in _connected_groups(source, pumpkins, neighbours, max_size)
+        assert search.score(frozenset(cells), component) == best
+
+
+def test_beam_placement_covers_every_pumpkin_with_connected_groups():
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        geodes = [corpus[index] for index in range(0, len(corpus), 100)]
+    for geode in geodes:
+        geode.beam_placement()
+        assert not np.any((geode.block_grid == PUMPKIN) & (geode.group_grid == NO_GROUP))
+        for group_nr in range(len(geode.groups)):
+            cells = set(np.flatnonzero(geode.group_grid.ravel() == group_nr).tolist())
+            assert 0 < len(cells) <= MAX_GROUP_SIZE
+            reached = {min(cells)}
+            frontier = [min(cells)]
+            for idx in frontier:
+                for neighbour in geode.topology.neighbours[idx]:
+                    if neighbour in cells and neighbour not in reached:
+                        reached.add(neighbour)
+                        frontier.append(neighbour)
+            assert reached == cells
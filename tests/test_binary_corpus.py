@@ -0,0 +1,45 @@
+import io
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.binary_corpus import BinaryGeodeCorpus, convert_text_corpus, open_corpus, write_binary_corpus
+from src.grid_reader import GeodeCorpus
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+
+def test_converted_geodes_have_the_same_blocks_and_groups(tmp_path):
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        text = b'\n\n'.join('\n'.join(lines).encode() for lines in corpus.raw_range(0, 20))
+        geodes = list(corpus.range(0, 20))
+    convert_text_corpus(io.BytesIO(text), tmp_path / 'geodes.bin')
+
+    with open_corpus(tmp_path / 'geodes.bin') as binary:
+        assert isinstance(binary, BinaryGeodeCorpus)
+        assert len(binary) == len(geodes)
+        for geode, converted in zip(geodes, binary):
+            assert np.array_equal(converted.block_grid, geode.block_grid)
+            geode.heuristic_placement()
+            converted.heuristic_placement()
+            assert np.array_equal(converted.group_grid, geode.group_grid)
+
+
+def test_grids_of_any_shape_survive_the_round_trip():
+    rng = np.random.default_rng(6)
+    # Cell counts that don't fill the last byte, and a single cell
+    block_grids = [rng.integers(0, 4, size=shape, dtype=np.int8) for shape in [(1, 1), (3, 5), (7, 2), (16, 17)]]
+    stream = io.BytesIO()
+    write_binary_corpus(iter(block_grids), stream)
+
+    with BinaryGeodeCorpus(io.BytesIO(stream.getvalue())) as corpus:
+        assert [corpus.shape(index) for index in range(len(corpus))] == [grid.shape for grid in block_grids]
+        for index in random.Random(6).sample(range(len(corpus)), len(corpus)):
+            assert np.array_equal(corpus.blocks(index), block_grids[index])
+
+
+def test_a_text_file_is_not_read_as_a_binary_corpus():
+    with pytest.raises(ValueError):
+        BinaryGeodeCorpus(io.BytesIO(GEODE_FILE.read_bytes()[:100]))
@@ -0,0 +1,39 @@
+import random
+
+import numpy as np
+
+from src.Analyzers.bitboard import bitboard_layout, popcount
+from src.Analyzers.grid_topology import grid_topology
+
+
+def test_boards_match_the_neighbour_table():
+    rng = random.Random(24)
+    for _ in range(50):
+        rows, cols = rng.randint(1, 12), rng.randint(1, 12)
+        layout = bitboard_layout(rows, cols)
+        neighbours = grid_topology(rows, cols).neighbours
+        mask = np.array([rng.random() < 0.5 for _ in range(rows * cols)])
+        passable = np.array([rng.random() < 0.6 for _ in range(rows * cols)])
+        board = layout.from_mask(mask)
+
+        assert np.array_equal(layout.to_mask(board), mask)
+        assert layout.from_flags(mask.tolist()) == board
+        assert list(layout.indices(board)) == np.flatnonzero(mask).tolist()
+        assert popcount(board) == np.count_nonzero(mask)
+
+        expanded = {neighbour for idx in np.flatnonzero(mask) for neighbour in (idx, *neighbours[idx])}
+        assert set(layout.indices(layout.expand(board))) == expanded
+        two_neighbours = {idx for idx in range(rows * cols)
+                          if sum(mask[neighbour] for neighbour in neighbours[idx]) >= 2}
+        assert set(layout.indices(layout.at_least_two_neighbours(board))) == two_neighbours
+
+        # Breadth first search over the passable cells from the cells of the mask that are passable
+        seeds = np.flatnonzero(mask & passable).tolist()
+        reached = set(seeds)
+        for idx in seeds:
+            for neighbour in neighbours[idx]:
+                if passable[neighbour] and neighbour not in reached:
+                    reached.add(neighbour)
+                    seeds.append(neighbour)
+        flooded = layout.flood(layout.from_mask(mask & passable), layout.from_mask(passable))
+        assert set(layout.indices(flooded)) == reached
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.Analyzers.geode import NO_GROUP, PUMPKIN
+from src.cluster_decomposition import split_clusters
+from src.grid_reader import GeodeCorpus
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+
+def test_every_cluster_owns_its_pumpkins_and_its_blankets_touch_no_other_cluster():
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        geodes = [corpus[index] for index in range(0, len(corpus), 50)]
+    for geode in geodes:
+        clusters = geode.clusters
+        geode.heuristic_placement()
+        problems = split_clusters(geode, clusters)
+        # The problems are in the order of the first cell of their cluster
+        ordered = sorted(clusters, key=min)
+        assert [problem.index for problem in problems] == list(range(len(ordered)))
+
+        # The cluster that may put a blanket on every cell
+        usable = np.full((geode.rows, geode.cols), -1)
+        for problem, cluster in zip(problems, ordered):
+            input_ = np.array([list(row) for row in problem.input_.splitlines()])
+            window = usable[problem.rows, problem.cols]
+            assert np.all(window[input_ != 'o'] == -1)
+            window[input_ != 'o'] = problem.index
+
+            # Exactly the pumpkins of its own cluster, with the heuristic's groups as the hint
+            pumpkins = np.zeros(geode.rows * geode.cols, dtype=bool)
+            pumpkins[sorted(cluster)] = geode.block_grid.ravel()[sorted(cluster)] == PUMPKIN
+            assert np.array_equal(pumpkins.reshape(geode.rows, geode.cols)[problem.rows, problem.cols],
+                                  input_ == 'p')
+            assert np.count_nonzero(pumpkins) == np.count_nonzero(input_ == 'p')
+            heuristic = geode.group_grid[problem.rows, problem.cols]
+            assert np.array_equal(problem.hint_grid != NO_GROUP, (input_ != 'o') & (heuristic != NO_GROUP))
+            assert problem.heuristic_groups == len(np.unique(heuristic[problem.hint_grid != NO_GROUP]))
+
+        # Blankets of different clusters can never touch
+        for first, second in [(usable[:-1, :], usable[1:, :]), (usable[:, :-1], usable[:, 1:])]:
+            assert not np.any((first != -1) & (second != -1) & (first != second))
@@ -0,0 +1,56 @@
+import random
+
+from src.Analyzers.bitboard import bitboard_layout
+from src.Analyzers.cluster_tracker import ClusterTracker
+from src.Analyzers.grid_topology import grid_topology
+
+
+def _clusters(pumpkins: list[bool], passable: list[bool], neighbours) -> set[frozenset[int]]:
+    # The components of the passable cells that hold a pumpkin, with a breadth first search from every cell
+    clusters = set()
+    seen = set()
+    for start in range(len(passable)):
+        if not passable[start] or start in seen:
+            continue
+        component = [start]
+        seen.add(start)
+        for idx in component:
+            for neighbour in neighbours[idx]:
+                if passable[neighbour] and neighbour not in seen:
+                    seen.add(neighbour)
+                    component.append(neighbour)
+        if any(pumpkins[idx] for idx in component):
+            clusters.add(frozenset(component))
+    return clusters
+
+
+def test_clusters_follow_cells_that_are_removed_and_given_back():
+    rng = random.Random(3)
+    for _ in range(40):
+        rows, cols = rng.randint(1, 9), rng.randint(1, 9)
+        neighbours = grid_topology(rows, cols).neighbours
+        pumpkins = [rng.random() < 0.4 for _ in range(rows * cols)]
+        passable = [pumpkin or rng.random() < 0.3 for pumpkin in pumpkins]
+        tracker = ClusterTracker(bitboard_layout(rows, cols), pumpkins, passable, neighbours)
+        removed = []
+        for _ in range(25):
+            if removed and rng.random() < 0.3:
+                idx = removed.pop(rng.randrange(len(removed)))
+                passable[idx] = True
+                cluster_id = tracker.add_cell(idx)
+                assert idx in tracker.cells(cluster_id)
+            elif free := [idx for idx in range(rows * cols) if passable[idx]]:
+                idx = rng.choice(free)
+                passable[idx] = False
+                removed.append(idx)
+                parts = tracker.remove_cell(idx)
+                expected = _clusters(pumpkins, passable, neighbours)
+                if len(parts) > 1:
+                    # The parts are the clusters around the removed cell
+                    assert {frozenset(tracker.cells(part)) for part in parts} \
+                        == {cluster for cluster in expected if any(n in cluster for n in neighbours[idx])}
+
+            clusters = tracker.clusters()
+            assert set(map(frozenset, clusters.values())) == _clusters(pumpkins, passable, neighbours)
+            for cluster_id, cells in clusters.items():
+                assert tracker.pumpkin_count(cluster_id) == sum(pumpkins[idx] for idx in cells)
@@ -0,0 +1,72 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from src.Analyzers.geode import AIR, OBSIDIAN, PUMPKIN
+from src.geode_volume import AXES, BUDDING, SOLID, VOLUME_AIR, projections, read_volumes, solve_volumes
+
+
+def _random_volume(rng: np.random.Generator, shape) -> np.ndarray:
+    return rng.choice(np.array([VOLUME_AIR, BUDDING, SOLID], dtype=np.int8), size=shape, p=[0.6, 0.1, 0.3])
+
+
+def _projection(volume: np.ndarray, axis_idx: int) -> np.ndarray:
+    # Cell by cell: a line with budding amethyst is obsidian, and a line with air next to budding amethyst a pumpkin
+    shape = volume.shape
+
+    def site(cell) -> bool:
+        return volume[cell] == VOLUME_AIR and any(
+            all(0 <= coordinate + delta < size for coordinate, delta, size in zip(cell, offset, shape))
+            and volume[tuple(coordinate + delta for coordinate, delta in zip(cell, offset))] == BUDDING
+            for offset in [(-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1)])
+
+    other = [size for idx, size in enumerate(shape) if idx != axis_idx]
+    grid = np.full(other, AIR, dtype=np.int8)
+    for first, second in product(range(other[0]), range(other[1])):
+        line = [(*(first, second)[:axis_idx], depth, *(first, second)[axis_idx:]) for depth in range(shape[axis_idx])]
+        if any(volume[cell] == BUDDING for cell in line):
+            grid[first, second] = OBSIDIAN
+        elif any(site(cell) for cell in line):
+            grid[first, second] = PUMPKIN
+
+    # Cropped to the blocks, with a border of air
+    if not np.any(grid != AIR):
+        return np.zeros((1, 1), dtype=np.int8)
+    rows, cols = np.nonzero(grid != AIR)
+    return np.pad(grid[rows.min():rows.max() + 1, cols.min():cols.max() + 1], 1, constant_values=AIR)
+
+
+def test_projections_match_a_cell_by_cell_projection():
+    rng = np.random.default_rng(25)
+    for _ in range(20):
+        volume = _random_volume(rng, tuple(int(size) for size in rng.integers(1, 7, size=3)))
+        grids = projections(volume)
+        assert list(grids) == list(AXES)
+        for axis_idx, axis in enumerate(AXES):
+            assert np.array_equal(grids[axis], _projection(volume, axis_idx))
+
+    with pytest.raises(ValueError):
+        projections(np.zeros((3, 3), dtype=np.int8))
+
+
+def test_volumes_are_read_and_solved_along_every_axis(tmp_path):
+    rng = np.random.default_rng(25)
+    volumes = [_random_volume(rng, (6, 7, 8)) for _ in range(2)]
+    np.save(tmp_path / 'stack.npy', np.stack(volumes))
+    np.savez(tmp_path / 'volumes.npz', first=volumes[0], second=volumes[1])
+    assert [name for name, _ in read_volumes(str(tmp_path / 'volumes.npz'))] == ['first', 'second']
+    for path in ['stack.npy', 'volumes.npz']:
+        read = [volume for _, volume in read_volumes(str(tmp_path / path))]
+        assert len(read) == len(volumes) and all(map(np.array_equal, volumes, read))
+
+    for volume, axis_results in zip(volumes, solve_volumes(volumes, workers=1)):
+        # Every axis once, from the best result to the worst
+        assert sorted(result.axis for result in axis_results) == sorted(AXES)
+        assert [result.rank for result in axis_results] == sorted(result.rank for result in axis_results)
+        for result in axis_results:
+            assert result.error is None
+            assert np.array_equal(result.block_grid, projections(volume)[result.axis])
+            assert result.pumpkins == np.count_nonzero(result.block_grid == PUMPKIN)
+            assert result.covered == result.pumpkins
+            assert result.groups == len(np.unique(result.group_grid[result.group_grid >= 0]))
@@ -0,0 +1,35 @@
+import io
+from pathlib import Path
+
+import numpy as np
+
+from src.grid_reader import GeodeCorpus
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+
+def _geodes(count: int) -> list[list[str]]:
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        return list(corpus.raw_range(0, count))
+
+
+def test_crlf_line_endings_and_extra_blank_lines_give_the_same_geodes(tmp_path):
+    geodes = _geodes(3)
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        block_grids = [geode.block_grid for geode in corpus.range(0, 3)]
+    # Windows line endings, several blank lines between geodes and trailing blank lines at the end
+    text = '\r\n\r\n\r\n'.join('\r\n'.join(lines) for lines in geodes) + '\r\n\r\n\r\n'
+    (tmp_path / 'crlf.txt').write_bytes(text.encode())
+
+    for source in [tmp_path / 'crlf.txt', io.BytesIO(text.encode()), io.StringIO(text, newline='')]:
+        with GeodeCorpus(source) as corpus:
+            assert len(corpus) == len(geodes)
+            assert list(corpus.raw_range()) == geodes
+            for geode, block_grid in zip(corpus, block_grids):
+                assert np.array_equal(geode.block_grid, block_grid)
+
+
+def test_a_file_without_a_final_newline_keeps_its_last_geode():
+    geodes = _geodes(2)
+    with GeodeCorpus(io.BytesIO('\n\n'.join('\n'.join(lines) for lines in geodes).encode())) as corpus:
+        assert list(corpus.raw_range()) == geodes
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.Analyzers.geode import MAX_GROUP_SIZE, NO_GROUP, PUMPKIN
+from src.grid_reader import GeodeCorpus
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+
+def test_source_that_is_rolled_back_gets_a_group_of_its_own():
+    # On geode 389 every way of growing the group of pumpkin 235 splits off clusters it can't absorb, so the source
+    # itself was rolled back and chosen again, until the group numbers overflowed
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        geode = corpus[389]
+    geode.heuristic_placement()
+
+    assert not np.any((geode.block_grid == PUMPKIN) & (geode.group_grid == NO_GROUP))
+    assert geode.group_grid.ravel()[235] != NO_GROUP
+    assert all(0 < len(group) <= MAX_GROUP_SIZE for group in geode.groups.values())
+    assert sorted(geode.groups) == list(range(len(geode.groups)))
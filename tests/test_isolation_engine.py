@@ -0,0 +1,44 @@
+import random
+
+from src.Analyzers.bitboard import bitboard_layout
+from src.Analyzers.grid_topology import grid_topology
+from src.Analyzers.isolation_engine import IsolationEngine
+
+
+def _distance_sum(source: int, pumpkins: list[bool], passable: list[bool], neighbours) -> tuple[int, int]:
+    # Breadth first search over the passable cells, the source itself counts at distance 0
+    distances = {source: 0}
+    queue = [source]
+    for idx in queue:
+        for neighbour in neighbours[idx]:
+            if passable[neighbour] and neighbour not in distances:
+                distances[neighbour] = distances[idx] + 1
+                queue.append(neighbour)
+    reached = [idx for idx in distances if pumpkins[idx]]
+    return sum(distances[idx] for idx in reached), len(reached)
+
+
+def test_distance_sums_follow_cells_that_join_and_leave_groups():
+    rng = random.Random(2)
+    for _ in range(30):
+        rows, cols = rng.randint(1, 9), rng.randint(1, 9)
+        neighbours = grid_topology(rows, cols).neighbours
+        pumpkins = [rng.random() < 0.4 for _ in range(rows * cols)]
+        passable = [pumpkin or rng.random() < 0.3 for pumpkin in pumpkins]
+        engine = IsolationEngine(bitboard_layout(rows, cols), pumpkins, passable)
+        grouped = []
+        for _ in range(20):
+            if grouped and rng.random() < 0.3:
+                idx = grouped.pop(rng.randrange(len(grouped)))
+                passable[idx] = True
+                engine.block_ungrouped(idx)
+            elif free := [idx for idx in range(rows * cols) if passable[idx]]:
+                idx = rng.choice(free)
+                passable[idx] = False
+                grouped.append(idx)
+                engine.block_grouped(idx)
+
+            sources = [idx for idx in range(rows * cols) if passable[idx] and rng.random() < 0.5]
+            expected = [_distance_sum(source, pumpkins, passable, neighbours) for source in sources]
+            totals, counts = engine.distance_sums(sources)
+            assert list(zip(totals, counts)) == expected
@@ -0,0 +1,60 @@
+from itertools import product
+
+import numpy as np
+
+from src.Analyzers.geode import AIR, NO_GROUP, OBSIDIAN, PUMPKIN
+from src.machine_assignment import MachineAssigner, block_cost
+from src.machine_catalog import machine_fits
+
+
+def _cells(option) -> set[tuple[int, int]]:
+    return {(option.row + row, option.col + col) for row, col in option.variant.cells}
+
+
+def _compatible(first, second) -> bool:
+    # Machines can't overlap, and a machine that isn't tileable can't touch another one
+    first_cells, second_cells = _cells(first), _cells(second)
+    if first_cells & second_cells:
+        return False
+    touching = any((row + row_, col + col_) in second_cells
+                   for row, col in first_cells
+                   for row_, col_ in ((-1, 0), (1, 0), (0, -1), (0, 1)))
+    return not touching or first.tileable and second.tileable
+
+
+def _best(options: dict) -> tuple[int, int]:
+    # The fewest groups without a machine, and then the lowest cost, over every combination of candidates
+    best = None
+    for choices in product(*([*group_options, None] for group_options in options.values())):
+        chosen = [option for option in choices if option is not None]
+        if all(_compatible(first, second) for i, first in enumerate(chosen) for second in chosen[i + 1:]):
+            score = (len(choices) - len(chosen), sum(option.cost for option in chosen))
+            best = score if best is None else min(best, score)
+    return best
+
+
+def test_the_assignment_is_valid_and_as_cheap_as_a_brute_force_search():
+    rng = np.random.default_rng(23)
+    checked = 0
+    while checked < 25:
+        rows, cols = int(rng.integers(2, 6)), int(rng.integers(2, 6))
+        block_grid = rng.choice(np.array([AIR, PUMPKIN, OBSIDIAN], dtype=np.int8), size=(rows, cols), p=[.4, .45, .15])
+        group_grid = np.where(block_grid == PUMPKIN, rng.integers(0, 3, size=(rows, cols)), NO_GROUP).astype(np.int16)
+        # The machines are 8 to 10 blocks long, a limit of 9 leaves some of them out
+        max_length = [None, 9][int(rng.integers(0, 2))]
+        assigner = MachineAssigner(max_length=max_length)
+        assignment = assigner.assign(block_grid, group_grid)
+        options = assigner.options(machine_fits(block_grid, group_grid), cols)
+        if np.prod([len(group_options) + 1 for group_options in options.values()]) > 20_000:
+            continue
+        checked += 1
+
+        chosen = [option for option in assignment.placements.values() if option is not None]
+        for option in chosen:
+            assert option in options[option.group_nr]
+            assert max_length is None or option.variant.machine.machine.length <= max_length
+        assert all(_compatible(first, second) for i, first in enumerate(chosen) for second in chosen[i + 1:])
+        assert assignment.blocks == sum(block_cost(option.variant.machine.machine) for option in chosen)
+        assert assignment.optimal
+        assert (len(assignment.unassigned), sum(option.cost for option in chosen)) == _best(options)
+
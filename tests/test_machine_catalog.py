@@ -0,0 +1,51 @@
+import numpy as np
+
+from src.Analyzers.geode import AIR, NO_GROUP, OBSIDIAN, PUMPKIN
+from src.machine_catalog import default_catalog, machine_fits
+
+
+def _random_geode(rng: np.random.Generator, rows: int, cols: int) -> tuple[np.ndarray, np.ndarray]:
+    block_grid = rng.choice(np.array([AIR, PUMPKIN, OBSIDIAN], dtype=np.int8), size=(rows, cols), p=[0.4, 0.4, 0.2])
+    group_grid = np.where(block_grid == PUMPKIN, rng.integers(0, 3, size=(rows, cols)), NO_GROUP).astype(np.int16)
+    return block_grid, group_grid
+
+
+def _fits(block_grid: np.ndarray, group_grid: np.ndarray, group_nr: int, cells, row: int, col: int) -> bool:
+    # Inside the grid, on at least one cell of the group, and not on obsidian or a cell of another group
+    rows, cols = block_grid.shape
+    covered = [(row + cell_row, col + cell_col) for cell_row, cell_col in cells]
+    if any(not (0 <= r < rows and 0 <= c < cols) for r, c in covered):
+        return False
+    return (any(group_grid[cell] == group_nr for cell in covered)
+            and not any(block_grid[cell] == OBSIDIAN or group_grid[cell] not in (NO_GROUP, group_nr)
+                        for cell in covered))
+
+
+def test_machine_fits_finds_every_anchor_of_a_brute_force_search():
+    rng = np.random.default_rng(22)
+    catalog = default_catalog()
+    for _ in range(30):
+        rows, cols = int(rng.integers(1, 9)), int(rng.integers(1, 9))
+        block_grid, group_grid = _random_geode(rng, rows, cols)
+        fits = machine_fits(block_grid, group_grid)
+        assert fits.group_nrs.tolist() == sorted(set(group_grid[group_grid != NO_GROUP].tolist()))
+
+        for group_idx, group_nr in enumerate(fits.group_nrs.tolist()):
+            expected = {(variant_idx, row, col)
+                        for variant_idx, variant in enumerate(catalog.variants)
+                        for row in range(rows)
+                        for col in range(cols)
+                        if _fits(block_grid, group_grid, group_nr, variant.cells, row, col)}
+            found = {(catalog.variants.index(variant), row, col) for variant, row, col in fits.placements(group_nr)}
+            assert found == expected
+            assert fits.counts()[group_idx].sum() == len(expected)
+            assert (group_nr in fits.fitting_groups()) == bool(expected)
+
+
+def test_every_variant_is_a_distinct_footprint():
+    catalog = default_catalog()
+    for variant in catalog.variants:
+        assert len(variant.rows) == variant.height
+        assert {(row, col) for row, mask in enumerate(variant.rows) for col in range(variant.width)
+                if mask >> col & 1} == set(variant.cells)
+    assert len({(variant.machine, variant.rows) for variant in catalog.variants}) == len(catalog)
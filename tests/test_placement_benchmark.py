@@ -0,0 +1,21 @@
+from benchmarks.placement_benchmark import compare
+
+
+def _results(repeats: int, seconds: float, spread_seconds: float = 0.0, peak_bytes: int = 1000) -> dict:
+    return {'repeats': repeats,
+            'phases': {'parse': {'seconds': seconds, 'spread_seconds': spread_seconds, 'allocated_bytes': 0,
+                                 'peak_bytes': peak_bytes}}}
+
+
+def test_wall_times_of_a_single_run_are_not_compared():
+    assert compare(_results(1, 0.2), _results(3, 0.1), 0.25, 0.10) == []
+    assert compare(_results(3, 0.2), _results(3, 0.1), 0.25, 0.10)
+
+
+def test_a_slowdown_within_the_spread_of_the_runs_is_noise():
+    assert compare(_results(3, 0.2, spread_seconds=0.15), _results(3, 0.1), 0.25, 0.10) == []
+    assert compare(_results(3, 0.2), _results(3, 0.1, spread_seconds=0.15), 0.25, 0.10) == []
+
+
+def test_memory_is_compared_whatever_the_repeats():
+    assert compare(_results(1, 0.1, peak_bytes=2000), _results(3, 0.1), 0.25, 0.10)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.Analyzers.geode import AIR, NO_GROUP, PUMPKIN, Geode
+from src.portfolio_solver import GREEDY, SAT, lower_bound, solve_portfolio
+
+# The heuristic needs 3 groups for these 12 pumpkins. The SAT model finds 2 and proves that 1 is impossible, which the
+# lower bound of 1 can't tell
+IMPROVABLE = np.array([[1, 0, 0, 0, 1, 1],
+                       [0, 1, 0, 0, 1, 0],
+                       [1, 0, 0, 1, 1, 0],
+                       [0, 0, 1, 0, 0, 0],
+                       [0, 0, 0, 0, 0, 0],
+                       [1, 1, 0, 0, 1, 0]], dtype=np.int8) * PUMPKIN
+
+# 4 pumpkins in a row, one group at the lower bound
+LINE = np.array([[AIR, PUMPKIN, PUMPKIN, PUMPKIN, PUMPKIN, AIR]], dtype=np.int8)
+
+
+def _groups(group_grid: np.ndarray) -> int:
+    return len(np.unique(group_grid[group_grid != NO_GROUP]))
+
+
+def test_a_proof_comes_with_the_solution_it_was_found_for():
+    geode = Geode.from_blocks(IMPROVABLE)
+    # Only the SAT worker, so no greedy worker can find the 2 groups first and leave the proof without a solution
+    solution = solve_portfolio(geode, time_budget=30, workers=1)
+
+    assert solution.source == SAT
+    assert solution.optimal
+    assert solution.groups == _groups(solution.group_grid) == 2 > lower_bound(IMPROVABLE)
+    assert np.array_equal(geode.group_grid, solution.group_grid)
+    assert solution.covered_pumpkins == np.count_nonzero(IMPROVABLE == PUMPKIN)
+
+
+def test_a_greedy_solution_at_the_lower_bound_is_not_proven():
+    geode = Geode.from_blocks(LINE)
+    solution = solve_portfolio(geode, time_budget=30, workers=2)
+
+    assert solution.groups == lower_bound(LINE) == _groups(solution.group_grid) == 1
+    assert solution.source.startswith(GREEDY)
+    assert not solution.optimal
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from src.Utils.collections.queue_extensions import IndexedPriorityQueue
+
+
+def test_updates_and_removals_keep_the_lowest_priority_first():
+    rng = random.Random(7)
+    queue = IndexedPriorityQueue()
+    # The priority of every queued item
+    expected = {}
+    for _ in range(3000):
+        operation = rng.random()
+        if operation < 0.4:
+            item = rng.randrange(200)
+            expected[item] = rng.randrange(50)
+            queue.add(item, expected[item])
+        elif operation < 0.6 and expected:
+            item = rng.choice(list(expected))
+            expected[item] = rng.randrange(50)
+            queue.update(item, expected[item])
+        elif operation < 0.8 and expected:
+            item = rng.choice(list(expected))
+            del expected[item]
+            queue.remove(item)
+        elif expected:
+            # Items with the same priority may come in any order
+            lowest = min(expected.values())
+            assert expected.pop(queue.get()) == lowest
+
+        assert len(queue) == len(expected)
+        assert all(item in queue and queue.priority(item) == priority for item, priority in expected.items())
+
+
+def test_an_empty_queue_has_nothing_to_get():
+    queue = IndexedPriorityQueue()
+    queue.add('a', 1)
+    queue.remove('a')
+    assert 'a' not in queue
+    with pytest.raises(IndexError):
+        queue.get()
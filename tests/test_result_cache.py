@@ -0,0 +1,49 @@
+import numpy as np
+
+import src.result_cache
+from src.Analyzers.geode import AIR, NO_GROUP, Geode
+from src.cli import _tutorial_blocks
+from src.result_cache import ResultCache, sat_mode
+
+
+def _solved_geode() -> Geode:
+    geode = Geode.from_blocks(_tutorial_blocks())
+    geode.heuristic_placement()
+    return geode
+
+
+def test_groups_of_one_solve_mode_are_not_returned_for_another(tmp_path):
+    geode = _solved_geode()
+    with ResultCache(tmp_path / 'cache.db') as heuristic, ResultCache(tmp_path / 'cache.db',
+                                                                      mode=sat_mode(10)) as sat:
+        heuristic.put_geode(geode)
+        assert np.array_equal(heuristic.get(geode.block_grid), geode.group_grid)
+        assert sat.get(geode.block_grid) is None
+        assert ResultCache(tmp_path / 'cache.db', mode=sat_mode(30)).get(geode.block_grid) is None
+
+
+def test_entries_of_an_older_solver_are_not_returned(tmp_path, monkeypatch):
+    geode = _solved_geode()
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        cache.put_geode(geode)
+        monkeypatch.setattr(src.result_cache, 'SOLVER_VERSION', src.result_cache.SOLVER_VERSION + 1)
+        assert cache.get(geode.block_grid) is None
+
+
+def test_a_rotated_reflected_and_moved_geode_gets_the_groups_mapped_onto_it(tmp_path):
+    geode = _solved_geode()
+    with ResultCache(tmp_path / 'cache.db') as cache:
+        cache.put_geode(geode)
+        for mirrored in (False, True):
+            for quarter_turns in range(4):
+                blocks = np.rot90(np.fliplr(geode.block_grid) if mirrored else geode.block_grid, quarter_turns)
+                groups = np.rot90(np.fliplr(geode.group_grid) if mirrored else geode.group_grid, quarter_turns)
+                # A border of air on two sides moves the geode inside its grid
+                blocks = np.pad(blocks, ((2, 0), (0, 3)), constant_values=AIR)
+                groups = np.pad(groups, ((2, 0), (0, 3)), constant_values=NO_GROUP)
+                assert np.array_equal(cache.get(blocks), groups)
+
+                moved = Geode.from_blocks(blocks)
+                assert cache.get_geode(moved)
+                assert np.array_equal(moved.group_grid, groups)
+        assert len(cache) == 1
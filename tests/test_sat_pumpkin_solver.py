@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.cli import TUTORIAL_GRID
+from src.grid_reader import GeodeCorpus
+from src.sat_pumpkin_solver import EMPTY, MAX_GROUP_SIZE, MIN_GROUP_SIZE, BooleanPumpkinModel, estimated_build_seconds
+from src.seeded_sat_solver import input_from_blocks, solve_seeded
+
+GEODE_FILE = Path(__file__).resolve().parents[1] / 'geodes.txt'
+
+GRID = ('0pp0pp\n'
+        '0pp0pp\n'
+        '00o000\n'
+        'pp0pp0\n'
+        'pp0pp0')
+
+
+def _check_solution(input_: str, blanket_grid: list[list[int]], group_grid: list[list[int]]):
+    blankets = np.array(blanket_grid)
+    groups = np.array(group_grid)
+    assert np.all(blankets[np.array([list(row) for row in input_.splitlines()]) == 'p'] != EMPTY)
+    assert np.all((blankets == EMPTY) == (groups == -1))
+    for k in range(groups.max() + 1):
+        cells = set(zip(*np.nonzero(groups == k)))
+        assert MIN_GROUP_SIZE <= len(cells) <= MAX_GROUP_SIZE
+        assert len({blankets[cell] for cell in cells}) == 1
+        # The group is connected
+        start = min(cells)
+        reached, frontier = {start}, [start]
+        while frontier:
+            row, col = frontier.pop()
+            for neighbour in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if neighbour in cells and neighbour not in reached:
+                    reached.add(neighbour)
+                    frontier.append(neighbour)
+        assert reached == cells
+    # Neighbours of the same kind stick together, so they are in the same group
+    for first, second in [(np.s_[:-1, :], np.s_[1:, :]), (np.s_[:, :-1], np.s_[:, 1:])]:
+        same_kind = (blankets[first] == blankets[second]) & (blankets[first] != EMPTY)
+        assert np.all(groups[first][same_kind] == groups[second][same_kind])
+
+
+def test_groups_are_numbered_in_the_order_of_their_first_cell():
+    solution = BooleanPumpkinModel(GRID).solve(timeout_ms=30_000)
+    assert solution is not None
+    _check_solution(GRID, *solution)
+
+    group_grid = np.array(solution[1])
+    first_cells = [int(np.flatnonzero(group_grid.ravel() == k)[0]) for k in range(group_grid.max() + 1)]
+    assert first_cells == sorted(first_cells)
+
+
+def test_the_number_of_groups_is_bounded():
+    # 16 pumpkins need at least two groups of at most 12 blocks
+    assert BooleanPumpkinModel(GRID, max_groups=1).solve(timeout_ms=30_000) is None
+    solution = BooleanPumpkinModel(GRID, max_groups=2).solve(timeout_ms=30_000)
+    assert solution is not None
+    _check_solution(GRID, *solution)
+    assert max(map(max, solution[1])) == 1
+
+
+def test_the_number_of_groups_defaults_to_a_bound_of_the_input():
+    model = BooleanPumpkinModel(GRID)
+    assert model.max_groups == len(model.cells) // MIN_GROUP_SIZE
+
+
+def test_the_tutorial_grid_has_a_solution():
+    solution = BooleanPumpkinModel(TUTORIAL_GRID).solve(timeout_ms=45_000)
+    assert solution is not None
+    _check_solution(TUTORIAL_GRID, *solution)
+
+
+def test_a_budget_that_cannot_cover_the_build_keeps_the_heuristic():
+    with GeodeCorpus(GEODE_FILE) as corpus:
+        geode = corpus[0]
+    assert estimated_build_seconds(input_from_blocks(geode.block_grid)) > 0.01
+
+    solution = solve_seeded(geode, time_budget=0.01)
+    assert solution.source == 'heuristic'
+    assert not solution.optimal